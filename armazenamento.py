@@ -0,0 +1,608 @@
+import os
+import re
+import sqlite3
+import argparse
+
+import config
+import metricas
+import perfis
+from duplicados import IndiceDuplicados, chave_nfe, chaves_da_linha, normalizar_cnpj, normalizar_data, normalizar_numero
+
+# LIVRO DE FATURAS LIDAS
+# As faturas são gravadas apenas por inserção (append-only) em um banco SQLite.
+# A planilha Excel deixou de ser o caminho de escrita: ela é gerada sob demanda
+# com 'python armazenamento.py exportar'.
+# Com uma URL do SQLAlchemy no lugar do caminho (ex.: 'postgresql+psycopg://...' ou 'sqlite:///faturas.db'),
+# as faturas vão para o BancoFaturas, onde o próprio banco recusa os duplicados.
+#
+# DIÁRIO DE MOVIMENTOS
+# Junto com cada lote, na mesma transação, fica gravado para onde cada arquivo gravado vai ser
+# movido (tabela 'movimentos'). O lote.py move os arquivos depois do commit e só então apaga as
+# entradas do diário. Se a execução cair no meio, a próxima retoma os movimentos pendentes
+# (ou 'python lote.py --desfazer' tira os registros do livro), sem ler as faturas de novo.
+
+COLUNAS = {
+    'CNPJ': 'cnpj',
+    'Valor Total': 'valor_total',
+    'Volume Total': 'volume_total',
+    'Data Emissão': 'data_emissao',
+    'Data Início': 'data_inicio',
+    'Data Fim': 'data_fim',
+    'Número Fatura': 'numero_fatura',
+    'Valor ICMS': 'valor_icms',
+    'Correção PCS': 'correcao_pcs',
+    'Distribuidora': 'distribuidora',
+    'Nome do Arquivo': 'nome_arquivo',
+}
+
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS faturas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cnpj TEXT,
+    valor_total REAL,
+    volume_total REAL,
+    data_emissao TEXT,
+    data_inicio TEXT,
+    data_fim TEXT,
+    numero_fatura TEXT,
+    valor_icms REAL,
+    correcao_pcs REAL,
+    distribuidora TEXT,
+    nome_arquivo TEXT,
+    gravado_em TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS chaves (
+    chave TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS agregados (
+    cnpj TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    faturas INTEGER NOT NULL,
+    volume_total REAL NOT NULL,
+    valor_total REAL NOT NULL,
+    valor_icms REAL NOT NULL,
+    soma_pcs REAL NOT NULL,
+    faturas_pcs INTEGER NOT NULL,
+    PRIMARY KEY (cnpj, periodo)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS movimentos (
+    fatura_id INTEGER PRIMARY KEY,
+    origem TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    chaves TEXT NOT NULL
+);
+'''
+
+# AGREGADOS POR CNPJ E PERÍODO
+# Atualizados na mesma transação em que as faturas são gravadas; os relatórios (relatorios.py)
+# leem só esta tabela, sem reabrir as faturas. O período é o mês da data fim ('aaaa-mm').
+# Todos os campos são somas (o PCS médio é soma_pcs / faturas_pcs), então cada lote só acrescenta.
+# Linhas com o CNPJ de uma distribuidora conhecida ficam de fora: são NF-e do histórico (CEGAS.xlsx),
+# gravadas quando a coluna CNPJ ainda era a do emitente, e não dizem de qual cliente é a fatura.
+CAMPOS_AGREGADOS = ('faturas', 'volume_total', 'valor_total', 'valor_icms', 'soma_pcs', 'faturas_pcs')
+COLUNAS_SOMADAS = {'volume_total': 'Volume Total', 'valor_total': 'Valor Total', 'valor_icms': 'Valor ICMS'}
+
+SQL_SOMAR_AGREGADOS = (
+    f"INSERT INTO agregados (cnpj, periodo, {', '.join(CAMPOS_AGREGADOS)}) VALUES ({', '.join('?' * (len(CAMPOS_AGREGADOS) + 2))}) "
+    f"ON CONFLICT (cnpj, periodo) DO UPDATE SET {', '.join(f'{campo} = {campo} + excluded.{campo}' for campo in CAMPOS_AGREGADOS)}"
+)
+
+
+def agregar_linhas(linhas):
+    # Soma as linhas por (cnpj, período) antes de ir ao banco: uma linha de agregado por grupo do lote
+    grupos = {}
+    for linha in linhas:
+        periodo = normalizar_data(linha.get('Data Fim'))[:7]
+        if not re.fullmatch(r'\d{4}-\d{2}', periodo):
+            continue
+        cnpj = normalizar_cnpj(linha.get('CNPJ'))
+        if perfis.do_cnpj(cnpj) is not None:
+            continue
+        soma = grupos.setdefault((cnpj, periodo), dict.fromkeys(CAMPOS_AGREGADOS, 0))
+        soma['faturas'] += 1
+        for campo, coluna in COLUNAS_SOMADAS.items():
+            soma[campo] += _numero(linha.get(coluna)) or 0
+        pcs = _numero(linha.get('Correção PCS'))
+        if pcs is not None:
+            soma['soma_pcs'] += pcs
+            soma['faturas_pcs'] += 1
+    return [dict(soma, cnpj=cnpj, periodo=periodo) for (cnpj, periodo), soma in grupos.items()]
+
+
+def _subtrair(agregados):
+    # Agregados negativos: o mesmo UPSERT que soma um lote desconta as faturas desfeitas
+    return [dict(soma, **{campo: -soma[campo] for campo in CAMPOS_AGREGADOS}) for soma in agregados]
+
+
+def _numero(valor):
+    valor = _valor_sql(valor)
+    return float(valor) if isinstance(valor, (int, float)) else None
+
+
+def _avisar_cnpj_de_distribuidora(linhas):
+    # Histórico importado com o CNPJ do emitente: as linhas entram no livro, mas não nos agregados
+    total = sum(perfis.do_cnpj(normalizar_cnpj(linha.get('CNPJ'))) is not None for linha in linhas)
+    if total:
+        print(f"Aviso: {total} linhas da planilha têm o CNPJ de uma distribuidora (NF-e gravadas com o CNPJ "
+              f"do emitente); ficam no livro, mas fora dos relatórios por cliente.")
+    return total
+
+
+def _linhas_para_agregar(registros):
+    # (cnpj, volume, valor, icms, pcs, data fim) lidos do banco -> linhas no formato da planilha
+    return [
+        {'CNPJ': cnpj, 'Volume Total': volume, 'Valor Total': valor, 'Valor ICMS': icms, 'Correção PCS': pcs, 'Data Fim': fim}
+        for cnpj, volume, valor, icms, pcs, fim in registros
+    ]
+
+
+class LivroFaturas:
+    def __init__(self, caminho_banco):
+        self.caminho_banco = caminho_banco
+        self.conexao = sqlite3.connect(caminho_banco)
+        self.conexao.executescript(ESQUEMA)
+        self.indice = None  # carregado na primeira gravação e mantido enquanto o livro estiver aberto
+        self._reconstruir_agregados()
+
+    def fechar(self):
+        self.conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def adicionar_lote(self, linhas, movimentos=None):
+        # Grava várias linhas (dicionários com as colunas da planilha) em uma única transação;
+        # 'movimentos' traz (origem, destino) de cada linha, anotados no diário na mesma transação
+        # (None: o arquivo da linha fica onde está)
+        if not linhas:
+            return 0
+        campos = list(COLUNAS.values())
+        sql = f"INSERT INTO faturas ({', '.join(campos)}) VALUES ({', '.join('?' * len(campos))})"
+        valores = [[_valor_sql(linha.get(coluna)) for coluna in COLUNAS] for linha in linhas]
+        chaves = [(chave,) for linha in linhas for chave in chaves_da_linha(linha)]
+        agregados = [[soma['cnpj'], soma['periodo']] + [soma[campo] for campo in CAMPOS_AGREGADOS] for soma in agregar_linhas(linhas)]
+        with self.conexao:
+            self.conexao.executemany(sql, valores)
+            if movimentos:
+                # A transação segura o banco desde o primeiro INSERT: os ids do lote são consecutivos
+                ultimo = self.conexao.execute('SELECT last_insert_rowid()').fetchone()[0]
+                diario = [(ultimo - len(linhas) + 1 + posicao, *movimento, ' '.join(chaves_da_linha(linha)))
+                          for posicao, (linha, movimento) in enumerate(zip(linhas, movimentos)) if movimento]
+                self.conexao.executemany('INSERT INTO movimentos (fatura_id, origem, destino, chaves) VALUES (?, ?, ?, ?)', diario)
+            self.conexao.executemany('INSERT OR IGNORE INTO chaves (chave) VALUES (?)', chaves)
+            self.conexao.executemany(SQL_SOMAR_AGREGADOS, agregados)
+        return len(valores)
+
+    def inserir_novas(self, linhas, movimentos=None):
+        # Grava só as linhas que ainda não estão no livro (nem repetidas no próprio lote);
+        # devolve, para cada linha, se ela foi gravada
+        if self.indice is None:
+            self.indice = IndiceDuplicados(self)
+        novas = []
+        novos_movimentos = []
+        gravadas = []
+        for posicao, linha in enumerate(linhas):
+            nova = not self.indice.existe(linha)
+            if nova:
+                self.indice.adicionar(linha)
+                novas.append(linha)
+                if movimentos:
+                    novos_movimentos.append(movimentos[posicao])
+            gravadas.append(nova)
+        try:
+            self.adicionar_lote(novas, novos_movimentos)
+        except Exception:
+            self.indice = None  # as chaves do lote não foram gravadas: o índice é recarregado do livro
+            raise
+        return gravadas
+
+    def movimentos_pendentes(self):
+        # [(fatura_id, origem, destino)] anotados no diário e ainda não concluídos
+        return self.conexao.execute('SELECT fatura_id, origem, destino FROM movimentos ORDER BY fatura_id').fetchall()
+
+    def concluir_movimentos(self, ids):
+        with self.conexao:
+            self.conexao.executemany('DELETE FROM movimentos WHERE fatura_id = ?', [(fatura_id,) for fatura_id in ids])
+
+    def desfazer_movimentos(self, ids):
+        # Tira do livro as faturas do diário (registro, chaves e agregados) e apaga as entradas
+        if not ids:
+            return 0
+        marcadores = ', '.join('?' * len(ids))
+        registros = self.conexao.execute(
+            f'SELECT cnpj, volume_total, valor_total, valor_icms, correcao_pcs, data_fim FROM faturas WHERE id IN ({marcadores})', ids).fetchall()
+        chaves = [(chave,) for (texto,) in self.conexao.execute(f'SELECT chaves FROM movimentos WHERE fatura_id IN ({marcadores})', ids)
+                  for chave in texto.split(' ')]
+        agregados = [[soma['cnpj'], soma['periodo']] + [soma[campo] for campo in CAMPOS_AGREGADOS]
+                     for soma in _subtrair(agregar_linhas(_linhas_para_agregar(registros)))]
+        with self.conexao:
+            self.conexao.execute(f'DELETE FROM faturas WHERE id IN ({marcadores})', ids)
+            self.conexao.executemany('DELETE FROM chaves WHERE chave = ?', chaves)
+            self.conexao.executemany(SQL_SOMAR_AGREGADOS, agregados)
+            self.conexao.execute('DELETE FROM agregados WHERE faturas <= 0')
+            self.conexao.execute(f'DELETE FROM movimentos WHERE fatura_id IN ({marcadores})', ids)
+        self.indice = None
+        return len(registros)
+
+    def carregar_chaves(self):
+        # Livros gravados antes do índice existir têm a tabela de chaves reconstruída a partir das faturas
+        if self.total() and not self.conexao.execute('SELECT 1 FROM chaves LIMIT 1').fetchone():
+            linhas = self.conexao.execute('SELECT cnpj, data_inicio, data_fim, valor_total FROM faturas')
+            chaves = [(chave,) for cnpj, inicio, fim, valor in linhas
+                      for chave in chaves_da_linha({'CNPJ': cnpj, 'Data Início': inicio, 'Data Fim': fim, 'Valor Total': valor})]
+            with self.conexao:
+                self.conexao.executemany('INSERT OR IGNORE INTO chaves (chave) VALUES (?)', chaves)
+        return {chave for (chave,) in self.conexao.execute('SELECT chave FROM chaves')}
+
+    def _reconstruir_agregados(self):
+        # Livros gravados antes dos agregados existirem têm a tabela montada uma vez a partir das faturas
+        if not self.total() or self.conexao.execute('SELECT 1 FROM agregados LIMIT 1').fetchone():
+            return
+        registros = self.conexao.execute('SELECT cnpj, volume_total, valor_total, valor_icms, correcao_pcs, data_fim FROM faturas')
+        agregados = [[soma['cnpj'], soma['periodo']] + [soma[campo] for campo in CAMPOS_AGREGADOS]
+                     for soma in agregar_linhas(_linhas_para_agregar(registros))]
+        with self.conexao:
+            self.conexao.executemany(SQL_SOMAR_AGREGADOS, agregados)
+
+    def consultar_agregados(self, cnpj=None, de=None, ate=None):
+        # de/ate: períodos 'aaaa-mm', inclusive
+        sql = f"SELECT cnpj, periodo, {', '.join(CAMPOS_AGREGADOS)} FROM agregados WHERE 1 = 1"
+        parametros = []
+        if cnpj:
+            sql += ' AND cnpj = ?'
+            parametros.append(normalizar_cnpj(cnpj))
+        if de:
+            sql += ' AND periodo >= ?'
+            parametros.append(de)
+        if ate:
+            sql += ' AND periodo <= ?'
+            parametros.append(ate)
+        cursor = self.conexao.execute(sql + ' ORDER BY cnpj, periodo', parametros)
+        return [dict(zip(('cnpj', 'periodo') + CAMPOS_AGREGADOS, linha)) for linha in cursor]
+
+    def total(self):
+        return self.conexao.execute('SELECT COUNT(*) FROM faturas').fetchone()[0]
+
+    @metricas.cronometrar('ler_excel')
+    def importar_planilha(self, caminho_planilha):
+        # Carrega o histórico de uma planilha já existente (migração do CEGAS.xlsx); passa pelo índice
+        # de duplicados como o lote, então importar a mesma planilha de novo não repete nada
+        import pandas as pd
+
+        df = pd.read_excel(caminho_planilha)
+        df = df[[coluna for coluna in COLUNAS if coluna in df.columns]]
+        linhas = df.astype(object).where(df.notna(), None).to_dict('records')
+        _avisar_cnpj_de_distribuidora(linhas)
+        return sum(self.inserir_novas(linhas))
+
+    @metricas.cronometrar('escrever_excel')
+    def exportar_excel(self, caminho_planilha):
+        campos = ', '.join(COLUNAS.values())
+        cursor = self.conexao.execute(f'SELECT {campos} FROM faturas ORDER BY id')
+        return _gravar_planilha(_em_partes(cursor.fetchmany), caminho_planilha)
+
+
+# BANCO DE FATURAS VIA SQLALCHEMY
+# Duplicado é a mesma fatura: o mesmo (cnpj, numero_fatura, data_inicio, data_fim), gravados
+# normalizados (o CNPJ só com os dígitos e o número como inteiro, iguais no PDF e no XML), ou a mesma
+# chave de acesso da NF-e (chave_nfe, a mesma chave 'nfe:' do duplicados.py). Cada um tem a sua
+# restrição única. Diferente do livro SQLite, o valor não entra na chave: uma fatura refaturada com
+# outro valor continua sendo a mesma, e duas faturas do mesmo período com o mesmo valor não se
+# confundem. Linha sem número de fatura só é barrada no banco pela chave_nfe (NULL não conflita);
+# dentro do mesmo lote, a repetida sem número também é descartada.
+# Cada lote vai em um único INSERT ... ON CONFLICT DO NOTHING ... RETURNING, e as chaves devolvidas
+# dizem quais linhas entraram. Os engines ficam guardados por URL, com pool de conexões.
+
+CHAVE_FATURA = ('cnpj', 'numero_fatura', 'data_inicio', 'data_fim')
+_ENGINES = {}
+
+
+def _chave_fatura(cnpj, numero_fatura, data_inicio, data_fim):
+    # Datas como 'aaaa-mm-dd', do registro (date ou texto) e do RETURNING (date)
+    return cnpj, numero_fatura, normalizar_data(data_inicio), normalizar_data(data_fim)
+
+
+def _engine(url):
+    from sqlalchemy import create_engine
+
+    if url not in _ENGINES:
+        _ENGINES[url] = create_engine(url, pool_size=config.pool_banco, max_overflow=config.pool_banco_extra, pool_pre_ping=True)
+    return _ENGINES[url]
+
+
+def _tabela_faturas(metadata):
+    from sqlalchemy import BigInteger, Column, Date, DateTime, Float, Integer, Table, Text, UniqueConstraint, func
+
+    return Table(
+        'faturas', metadata,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('cnpj', Text, nullable=False),
+        Column('valor_total', Float),
+        Column('volume_total', Float),
+        Column('data_emissao', Date),
+        Column('data_inicio', Date, nullable=False),
+        Column('data_fim', Date, nullable=False),
+        Column('numero_fatura', BigInteger),
+        Column('valor_icms', Float),
+        Column('correcao_pcs', Float),
+        Column('distribuidora', Text),
+        Column('nome_arquivo', Text),
+        Column('gravado_em', DateTime, server_default=func.now()),
+        Column('chave_nfe', Text),  # NULL quando a fatura não tem chave de acesso (não conflita)
+        UniqueConstraint(*CHAVE_FATURA, name='uq_faturas_fatura'),
+        UniqueConstraint('chave_nfe', name='uq_faturas_chave_nfe'),
+    )
+
+
+def _tabela_movimentos(metadata):
+    from sqlalchemy import Column, Integer, Table, Text
+
+    return Table(
+        'movimentos', metadata,
+        Column('fatura_id', Integer, primary_key=True, autoincrement=False),
+        Column('origem', Text, nullable=False),
+        Column('destino', Text, nullable=False),
+    )
+
+
+def _tabela_agregados(metadata):
+    from sqlalchemy import Column, Float, Integer, Table, Text
+
+    return Table(
+        'agregados', metadata,
+        Column('cnpj', Text, primary_key=True),
+        Column('periodo', Text, primary_key=True),
+        Column('faturas', Integer, nullable=False),
+        Column('volume_total', Float, nullable=False),
+        Column('valor_total', Float, nullable=False),
+        Column('valor_icms', Float, nullable=False),
+        Column('soma_pcs', Float, nullable=False),
+        Column('faturas_pcs', Integer, nullable=False),
+    )
+
+
+class BancoFaturas:
+    def __init__(self, url):
+        from sqlalchemy import MetaData
+
+        self.caminho_banco = url
+        self.engine = _engine(url)
+        metadata = MetaData()
+        self.tabela = _tabela_faturas(metadata)
+        self.agregados = _tabela_agregados(metadata)
+        self.movimentos = _tabela_movimentos(metadata)
+        metadata.create_all(self.engine, checkfirst=True)
+        if self.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise ValueError(f"Banco '{self.engine.dialect.name}' sem suporte a INSERT ... ON CONFLICT")
+        # Sem alvo no ON CONFLICT: a linha é descartada se qualquer uma das chaves já existir
+        self.comando_inserir = insert(self.tabela).on_conflict_do_nothing().returning(
+            self.tabela.c.id, *[self.tabela.c[campo] for campo in CHAVE_FATURA])
+        somar = insert(self.agregados)
+        self.comando_agregar = somar.on_conflict_do_update(
+            index_elements=['cnpj', 'periodo'],
+            set_={campo: self.agregados.c[campo] + somar.excluded[campo] for campo in CAMPOS_AGREGADOS},
+        )
+        self._reconstruir_agregados()
+
+    def fechar(self):
+        # As conexões voltam para o pool do engine, que é reaproveitado na próxima abertura
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def inserir_novas(self, linhas, movimentos=None):
+        # Mesmo contrato do LivroFaturas.inserir_novas, com um único comando por lote
+        registros = []
+        chaves = []
+        vistas = set()
+        for linha in linhas:
+            registro = {campo: _valor_banco(linha.get(coluna)) for coluna, campo in COLUNAS.items()}
+            registro['cnpj'] = normalizar_cnpj(registro['cnpj'])
+            registro['numero_fatura'] = normalizar_numero(registro['numero_fatura'])
+            registro['chave_nfe'] = chave_nfe(linha.get('Chave de Acesso'))
+            chave = _chave_fatura(*[registro[campo] for campo in CHAVE_FATURA])
+            chaves_linha = {chave, registro['chave_nfe']} - {None}
+            if chaves_linha & vistas:
+                chaves.append(None)  # repetida dentro do próprio lote
+                continue
+            vistas.update(chaves_linha)
+            registros.append(registro)
+            chaves.append(chave)
+        if not registros:
+            return [False] * len(linhas)
+
+        with self.engine.begin() as conexao:
+            gravadas = {_chave_fatura(*campos): fatura_id for fatura_id, *campos in conexao.execute(self.comando_inserir, registros)}
+            resultado = [chave is not None and chave in gravadas for chave in chaves]
+            agregados = agregar_linhas([linha for linha, gravada in zip(linhas, resultado) if gravada])
+            if agregados:
+                conexao.execute(self.comando_agregar, agregados)
+            if movimentos:
+                diario = [{'fatura_id': gravadas[chave], 'origem': movimento[0], 'destino': movimento[1]}
+                          for chave, gravada, movimento in zip(chaves, resultado, movimentos) if gravada and movimento]
+                if diario:
+                    conexao.execute(self.movimentos.insert(), diario)
+        return resultado
+
+    def movimentos_pendentes(self):
+        from sqlalchemy import select
+
+        consulta = select(self.movimentos.c.fatura_id, self.movimentos.c.origem, self.movimentos.c.destino).order_by(self.movimentos.c.fatura_id)
+        with self.engine.connect() as conexao:
+            return [tuple(linha) for linha in conexao.execute(consulta)]
+
+    def concluir_movimentos(self, ids):
+        if not ids:
+            return
+        with self.engine.begin() as conexao:
+            conexao.execute(self.movimentos.delete().where(self.movimentos.c.fatura_id.in_(ids)))
+
+    def desfazer_movimentos(self, ids):
+        # Tira do banco as faturas do diário (registro e agregados) e apaga as entradas
+        if not ids:
+            return 0
+        campos = ['cnpj', 'volume_total', 'valor_total', 'valor_icms', 'correcao_pcs', 'data_fim']
+        with self.engine.begin() as conexao:
+            apagar = self.tabela.delete().where(self.tabela.c.id.in_(ids)).returning(*[self.tabela.c[campo] for campo in campos])
+            registros = conexao.execute(apagar).fetchall()
+            agregados = _subtrair(agregar_linhas(_linhas_para_agregar(registros)))
+            if agregados:
+                conexao.execute(self.comando_agregar, agregados)
+            conexao.execute(self.agregados.delete().where(self.agregados.c.faturas <= 0))
+            conexao.execute(self.movimentos.delete().where(self.movimentos.c.fatura_id.in_(ids)))
+        return len(registros)
+
+    def _reconstruir_agregados(self):
+        from sqlalchemy import select
+
+        with self.engine.begin() as conexao:
+            if conexao.execute(select(self.agregados.c.cnpj).limit(1)).first() is not None:
+                return
+            campos = ['cnpj', 'volume_total', 'valor_total', 'valor_icms', 'correcao_pcs', 'data_fim']
+            registros = conexao.execute(select(*[self.tabela.c[campo] for campo in campos]))
+            agregados = agregar_linhas(_linhas_para_agregar(registros))
+            if agregados:
+                conexao.execute(self.comando_agregar, agregados)
+
+    def consultar_agregados(self, cnpj=None, de=None, ate=None):
+        from sqlalchemy import select
+
+        consulta = select(self.agregados).order_by(self.agregados.c.cnpj, self.agregados.c.periodo)
+        if cnpj:
+            consulta = consulta.where(self.agregados.c.cnpj == normalizar_cnpj(cnpj))
+        if de:
+            consulta = consulta.where(self.agregados.c.periodo >= de)
+        if ate:
+            consulta = consulta.where(self.agregados.c.periodo <= ate)
+        with self.engine.connect() as conexao:
+            return [dict(linha._mapping) for linha in conexao.execute(consulta)]
+
+    @metricas.cronometrar('ler_excel')
+    def importar_planilha(self, caminho_planilha):
+        import pandas as pd
+
+        df = pd.read_excel(caminho_planilha)
+        df = df[[coluna for coluna in COLUNAS if coluna in df.columns]]
+        for coluna in ('Data Emissão', 'Data Início', 'Data Fim'):
+            if coluna in df.columns:
+                df[coluna] = pd.to_datetime(df[coluna], format='mixed', dayfirst=True, errors='coerce').dt.date
+        linhas = df.astype(object).where(df.notna(), None).to_dict('records')
+        _avisar_cnpj_de_distribuidora(linhas)
+        return sum(self.inserir_novas(linhas))
+
+    def total(self):
+        from sqlalchemy import func, select
+
+        with self.engine.connect() as conexao:
+            return conexao.execute(select(func.count()).select_from(self.tabela)).scalar_one()
+
+    @metricas.cronometrar('escrever_excel')
+    def exportar_excel(self, caminho_planilha):
+        from sqlalchemy import select
+
+        colunas = [self.tabela.c[campo] for campo in COLUNAS.values()]
+        with self.engine.connect() as conexao:
+            # stream_results: o driver entrega as linhas aos poucos, em vez da tabela inteira de uma vez
+            resultado = conexao.execution_options(stream_results=True).execute(select(*colunas).order_by(self.tabela.c.id))
+            return _gravar_planilha(_em_partes(resultado.fetchmany), caminho_planilha)
+
+
+# EXPORTAÇÃO EM PARTES
+# As linhas vão do banco para a planilha _LINHAS_POR_PARTE de cada vez, por uma pasta de trabalho
+# write_only do openpyxl (cada linha vai direto para o arquivo): a memória da exportação não
+# cresce com o histórico, ao contrário de montar um DataFrame com todas as faturas.
+_LINHAS_POR_PARTE = 1000
+
+
+def _em_partes(buscar):
+    # buscar(n) -> até n linhas (fetchmany do sqlite3 ou do SQLAlchemy); lista vazia no fim
+    while True:
+        linhas = buscar(_LINHAS_POR_PARTE)
+        if not linhas:
+            return
+        yield from linhas
+
+
+def _gravar_planilha(linhas, caminho_planilha):
+    # Grava em um arquivo temporário ao lado e troca de uma vez: quem abre a planilha
+    # (ou uma queda no meio da gravação) nunca vê um .xlsx pela metade
+    from openpyxl import Workbook
+
+    base, extensao = os.path.splitext(caminho_planilha)
+    temporario = f'{base}.tmp{extensao}'
+    total = 0
+    try:
+        planilha = Workbook(write_only=True)
+        aba = planilha.create_sheet('Sheet1')
+        aba.append(list(COLUNAS))
+        for linha in linhas:
+            aba.append(list(linha))
+            total += 1
+        planilha.save(temporario)
+        os.replace(temporario, caminho_planilha)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return total
+
+
+def abrir_livro(caminho_banco=None):
+    # Caminho de arquivo -> livro SQLite; URL do SQLAlchemy -> BancoFaturas
+    caminho_banco = caminho_banco or config.caminho_banco
+    if '://' in caminho_banco:
+        return BancoFaturas(caminho_banco)
+    return LivroFaturas(caminho_banco)
+
+
+def _valor_banco(valor):
+    # Como _valor_sql, mas as datas seguem como date (colunas Date do SQLAlchemy)
+    if hasattr(valor, 'strftime'):
+        return valor
+    return _valor_sql(valor)
+
+
+def _valor_sql(valor):
+    # NaN e strings vazias viram NULL no banco
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, float) and valor != valor:
+        return None
+    if hasattr(valor, 'strftime'):
+        return valor.strftime('%d/%m/%Y')
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return valor
+
+
+def principal(argv=None):
+    parser = argparse.ArgumentParser(description='Livro de faturas lidas')
+    parser.add_argument('acao', choices=['exportar', 'importar'])
+    parser.add_argument('--banco', default=config.caminho_banco, help='caminho do livro SQLite ou URL do SQLAlchemy')
+    parser.add_argument('--planilha', default=config.caminho_planilha)
+    args = parser.parse_args(argv)
+
+    with abrir_livro(args.banco) as livro:
+        if args.acao == 'exportar':
+            total = livro.exportar_excel(args.planilha)
+            print(f"{total} registros exportados para '{args.planilha}'")
+        else:
+            if not os.path.exists(args.planilha):
+                print(f"O arquivo '{args.planilha}' não foi encontrado.")
+            else:
+                total = livro.importar_planilha(args.planilha)
+                print(f"{total} registros importados de '{args.planilha}'")
+
+
+if __name__ == '__main__':
+    principal()
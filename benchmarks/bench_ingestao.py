@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Benchmark da ingestão com faturas sintéticas (benchmarks/gerador.py), etapa por etapa:
+#   extração   extratores.extrair_fatura por arquivo (sem cache), latência por arquivo
+#   duplicados IndiceDuplicados.existe/adicionar por linha, latência por linha
+#   gravação   livro.inserir_novas a cada config.tamanho_lote, latência por lote
+#   lote       lote.processar_lote de ponta a ponta (extração + gravação + mover arquivos)
+# Cada etapa roda em um processo novo, para que o pico de memória (RSS) seja só dela.
+# Uso: python benchmarks/bench_ingestao.py [--xml N] [--pdf N] [--duplicados fração] [--workers N] [--banco URL] [--json]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+
+
+def pico_rss_mb():
+    # Maior RSS do processo e dos seus filhos (pool de extração), em MB; None se não houver como medir
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20
+        except (ImportError, AttributeError):
+            return None
+    pico = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return pico / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+
+
+def _extrair_medindo(caminho):
+    import extratores
+
+    inicio = time.perf_counter()
+    fatura = extratores.extrair_fatura(caminho)
+    return time.perf_counter() - inicio, fatura
+
+
+def etapa_extracao(arquivos, workers):
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultados = list(executor.map(_extrair_medindo, arquivos, chunksize=max(1, len(arquivos) // (workers * 4))))
+    else:
+        resultados = [_extrair_medindo(caminho) for caminho in arquivos]
+    return [tempo for tempo, _ in resultados], [fatura for _, fatura in resultados if fatura is not None]
+
+
+def etapa_duplicados(linhas, pasta):
+    from armazenamento import LivroFaturas
+    from duplicados import IndiceDuplicados
+
+    with LivroFaturas(os.path.join(pasta, 'indice.sqlite3')) as livro:
+        indice = IndiceDuplicados(livro)
+    tempos = []
+    for linha in linhas:
+        inicio = time.perf_counter()
+        if not indice.existe(linha):
+            indice.adicionar(linha)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def etapa_gravacao(linhas, banco):
+    from armazenamento import abrir_livro
+
+    tempos = []
+    with abrir_livro(banco) as livro:
+        for inicio_lote in range(0, len(linhas), config.tamanho_lote):
+            inicio = time.perf_counter()
+            livro.inserir_novas(linhas[inicio_lote:inicio_lote + config.tamanho_lote])
+            tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def etapa_lote(pasta_faturas, pasta, banco, workers):
+    import lote
+
+    destino = os.path.join(pasta, 'Lidos')
+    os.makedirs(destino, exist_ok=True)
+    lote.processar_lote(pasta_faturas, workers=workers, diretorio_destino=destino, caminho_banco=banco, caminho_cache='')
+    return []
+
+
+def _rodar(etapa, *argumentos):
+    # Executado no processo novo: devolve (duração total, resultado da etapa, pico de RSS).
+    # A saída padrão vai para o nulo já no descritor, para calar também os processos filhos
+    # (os prints de cada arquivo distorceriam a medição)
+    nulo = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(nulo, 1)
+    sys.stdout = open(os.devnull, 'w')
+    inicio = time.perf_counter()
+    resultado = etapa(*argumentos)
+    return time.perf_counter() - inicio, resultado, pico_rss_mb()
+
+
+def medir(nome, unidade, quantidade, etapa, *argumentos):
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+        duracao, resultado, pico = executor.submit(_rodar, etapa, *argumentos).result()
+    tempos = resultado[0] if isinstance(resultado, tuple) else resultado
+    medicao = {
+        'etapa': nome,
+        'quantidade': quantidade,
+        'segundos': duracao,
+        'por_segundo': quantidade / duracao if duracao else None,
+        'unidade_latencia': unidade,
+        'p50_ms': percentil(tempos, 50) * 1000 if tempos else None,
+        'p99_ms': percentil(tempos, 99) * 1000 if tempos else None,
+        'pico_rss_mb': pico,
+    }
+    return medicao, resultado
+
+
+def _celula(valor, formato):
+    largura = formato.split('.')[0]
+    return format('-', f'>{largura}') if valor is None else format(valor, formato)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mede extração, duplicados e gravação com faturas sintéticas')
+    parser.add_argument('--xml', type=int, default=1000)
+    parser.add_argument('--pdf', type=int, default=100)
+    parser.add_argument('--duplicados', type=float, default=0.05, help='fração de arquivos repetidos')
+    parser.add_argument('--workers', type=int, default=1, help='processos na extração e no lote')
+    parser.add_argument('--banco', default=None, help='URL do SQLAlchemy de um banco vazio, usado na gravação e no lote (padrão: livros SQLite temporários)')
+    parser.add_argument('--pasta', default=None, help='pasta de trabalho (padrão: temporária, apagada no fim)')
+    parser.add_argument('--json', action='store_true', help='imprime as medições em JSON')
+    args = parser.parse_args()
+
+    import gerador
+    from extratores import faturas_para_linhas
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix='bench_ingestao_')
+    pasta_faturas = os.path.join(pasta, 'Faturas')
+    try:
+        arquivos = gerador.gerar(pasta_faturas, args.xml, args.pdf, args.duplicados)
+        total = len(arquivos)
+
+        medicoes = []
+        medicao, (_, faturas) = medir('extração', 'arquivo', total, etapa_extracao, arquivos, args.workers)
+        medicoes.append(medicao)
+        linhas = faturas_para_linhas(faturas)
+        medicoes.append(medir('duplicados', 'linha', len(linhas), etapa_duplicados, linhas, pasta)[0])
+        banco = args.banco or os.path.join(pasta, 'gravacao.sqlite3')
+        medicoes.append(medir('gravação', 'lote', len(linhas), etapa_gravacao, linhas, banco)[0])
+        banco_lote = args.banco or os.path.join(pasta, 'lote.sqlite3')
+        medicoes.append(medir('lote', '-', total, etapa_lote, pasta_faturas, pasta, banco_lote, args.workers)[0])
+    finally:
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({'xml': args.xml, 'pdf': args.pdf, 'duplicados': args.duplicados, 'workers': args.workers, 'medicoes': medicoes}, ensure_ascii=False, indent=2))
+    else:
+        print(f"{total} arquivos ({args.xml} XML, {args.pdf} PDF, {args.duplicados:.0%} duplicados), {args.workers} processo(s)")
+        print(f"{'etapa':11} {'itens':>7} {'itens/s':>10} {'latência':>9} {'p50 ms':>9} {'p99 ms':>9} {'pico RSS MB':>12}")
+        for medicao in medicoes:
+            print(f"{medicao['etapa']:11} {medicao['quantidade']:7d} {_celula(medicao['por_segundo'], '10.1f')} "
+                  f"{medicao['unidade_latencia']:>9} {_celula(medicao['p50_ms'], '9.3f')} {_celula(medicao['p99_ms'], '9.3f')} "
+                  f"{_celula(medicao['pico_rss_mb'], '12.1f')}")
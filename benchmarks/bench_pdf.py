@@ -0,0 +1,46 @@
+import os
+import sys
+import glob
+import time
+import contextlib
+import io
+
+# Compara os leitores de texto de PDF (main.BACKENDS_PDF), lendo todas as páginas ou parando
+# assim que os campos forem achados, nos PDFs de exemplo de Lidos/.
+# A coluna 'campos' indica se o resultado das regex é igual ao do PyPDF2 lendo o PDF inteiro.
+# Uso: python benchmarks/bench_pdf.py [repeticoes]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import main
+
+
+def medir(arquivos, backend, parar_quando, repeticoes):
+    resultados = []
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeticoes):
+            resultados = [
+                main.ExtratorFaturas().extrair_informacoes(main.extrair_texto(arquivo, parar_quando=parar_quando, backend=backend))
+                for arquivo in arquivos
+            ]
+    return (time.perf_counter() - inicio) / repeticoes / len(arquivos), resultados
+
+
+if __name__ == '__main__':
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    arquivos = sorted(glob.glob(os.path.join(RAIZ, 'Lidos', '*.pdf')))
+    _, referencia = medir(arquivos, 'pypdf2', None, 1)
+
+    print(f"{len(arquivos)} PDFs, {repeticoes} repetições")
+    print(f"{'backend':10} {'modo':18} {'ms/PDF':>8}  campos")
+    for backend in main.BACKENDS_PDF:
+        for modo, parar_quando in (('todas as páginas', None), ('parada antecipada', main.campos_definidos)):
+            try:
+                tempo, resultados = medir(arquivos, backend, parar_quando, repeticoes)
+            except ImportError as e:
+                print(f"{backend:10} {modo:18} {'-':>8}  indisponível ({e})")
+                break
+            iguais = sum(resultado == esperado for resultado, esperado in zip(resultados, referencia))
+            print(f"{backend:10} {modo:18} {tempo * 1000:8.2f}  {iguais}/{len(arquivos)} iguais")
@@ -0,0 +1,51 @@
+import os
+import re
+import sys
+import glob
+import timeit
+import contextlib
+import io
+
+# Micro-benchmark da extração por regex do main.py (custo por fatura, sem a leitura do PDF).
+# Uso: python benchmarks/bench_regex.py [repeticoes]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import main
+
+
+# Implementação anterior: um ExtratorFaturas por chamada e re.search sem compilar, padrão a padrão
+REGEXES_ANTERIORES = dict(main.REGEXES, valor_total=[r'-?(\d+\.?\d+\,\d{2})\s\d{2}\/\d{2}\/\d{4}'])
+
+def extrair_anterior(texto):
+    informacoes = {}
+    for chave, regex_list in REGEXES_ANTERIORES.items():
+        for regex in regex_list:
+            match = re.search(regex, texto)
+            if match:
+                valor = match.group(1) if match.groups() else match.group(0)
+                if chave == 'correcao_pcs':
+                    try:
+                        valor = f"{float(valor) / 9400:.4f}"
+                    except ValueError:
+                        valor = ''
+                informacoes[chave] = valor
+                break
+    return informacoes
+
+def extrair_atual(texto):
+    return main.ExtratorFaturas().extrair_informacoes(texto)
+
+
+if __name__ == '__main__':
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with contextlib.redirect_stdout(io.StringIO()):
+        textos = [main.extrair_texto(caminho) for caminho in sorted(glob.glob(os.path.join(RAIZ, 'Lidos', '*.pdf')))]
+
+    for texto in textos:
+        assert extrair_anterior(texto) == extrair_atual(texto)
+
+    for nome, funcao in (('anterior', extrair_anterior), ('atual', extrair_atual)):
+        tempo = timeit.timeit(lambda: [funcao(texto) for texto in textos], number=repeticoes)
+        print(f"{nome:10} {tempo / repeticoes / len(textos) * 1e6:8.1f} µs por fatura ({len(textos)} textos, {repeticoes} repetições)")
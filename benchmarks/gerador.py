@@ -0,0 +1,184 @@
+import os
+import re
+import sys
+import glob
+import random
+import argparse
+import contextlib
+import io
+from collections import deque
+from datetime import date, timedelta
+
+# Gerador de faturas sintéticas com o formato das amostras da Cegás, para medir a leitura em
+# volumes que a pasta real não tem (10 mil, 100 mil arquivos).
+# - NF-e: cópias dos XMLs de Faturas/ com número, chave de acesso, destinatário, volume, valores
+#   e período trocados.
+# - PDF: o texto (já normalizado) dos PDFs de Lidos/, com os trechos que as regex do main.py
+#   capturam trocados por valores novos, gravado em um PDF mínimo com camada de texto.
+# Cada arquivo gerado é uma fatura diferente (nenhum duplicado), a menos que 'duplicados' > 0.
+# Uso: python benchmarks/gerador.py destino [--xml N] [--pdf N] [--duplicados fração] [--semente S]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import main
+
+
+def _cnpj(gerador):
+    numero = f'{gerador.randrange(10 ** 14):014d}'
+    return f'{numero[:2]}.{numero[2:5]}.{numero[5:8]}/{numero[8:12]}-{numero[12:]}'
+
+def _valor_pdf(valor):
+    # Como no DANFE da Cegás, só o último grupo de milhar tem ponto: 1234567.8 -> '1234.567,80'
+    inteiro, centavos = divmod(round(valor * 100), 100)
+    if inteiro < 1000:
+        return f'{inteiro},{centavos:02d}'
+    return f'{inteiro // 1000}.{inteiro % 1000:03d},{centavos:02d}'
+
+
+# NF-e
+def modelos_xml(pasta=None):
+    return [open(caminho, encoding='utf-8').read() for caminho in sorted(glob.glob(os.path.join(pasta or os.path.join(RAIZ, 'Faturas'), '*.xml')))]
+
+def gerar_xml(modelo, numero, gerador):
+    inicio = date(2024, 1, 1) + timedelta(days=gerador.randrange(730))
+    fim = inicio + timedelta(days=6)
+    volume = gerador.randrange(1000, 300000)
+    valor = round(volume * gerador.uniform(3.8, 4.6), 2)
+    icms = round(valor * 0.2, 2)
+    chave = f'{gerador.randrange(10 ** 44):044d}'
+
+    texto = re.sub(r'<nNF>\d+</nNF>', f'<nNF>{numero}</nNF>', modelo)
+    texto = re.sub(r'Id="NFe\d+"', f'Id="NFe{chave}"', texto)
+    texto = re.sub(r'<chNFe>\d+</chNFe>', f'<chNFe>{chave}</chNFe>', texto)
+    texto = re.sub(r'<dhEmi>[^<T]+', f'<dhEmi>{fim.isoformat()}', texto)
+    texto = re.sub(r'(<dest><CNPJ>)\d+', lambda m: m.group(1) + re.sub(r'\D', '', _cnpj(gerador)), texto)
+    texto = re.sub(r'<qCom>[^<]+', f'<qCom>{volume}.0000', texto)
+    texto = re.sub(r'<vNF>[^<]+', f'<vNF>{valor:.2f}', texto)
+    texto = re.sub(r'<vICMS>[^<]+', f'<vICMS>{icms:.2f}', texto)
+    return re.sub(r'DE \d{2}/\d{2}/\d{4} A \d{2}/\d{2}/\d{4}', f'DE {inicio:%d/%m/%Y} A {fim:%d/%m/%Y}', texto)
+
+
+# PDF
+def modelos_pdf(pasta=None):
+    # (texto normalizado, {campo: (início, fim) do trecho capturado pela regex})
+    modelos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for caminho in sorted(glob.glob(os.path.join(pasta or os.path.join(RAIZ, 'Lidos'), '*.pdf'))):
+            texto = main.extrair_texto(caminho, backend='pypdf2')
+            trechos = {}
+            for campo, padroes in main.PADROES.items():
+                for padrao in padroes:
+                    encontrado = padrao.search(texto)
+                    if encontrado:
+                        trechos[campo] = encontrado.span(1)
+                        break
+            if texto and len(trechos) == len(main.PADROES):
+                chave = main.PADRAO_CHAVE_ACESSO.search(texto)
+                if chave:
+                    trechos['chave_acesso'] = chave.span(1)
+                modelos.append((texto, trechos))
+    return modelos
+
+def gerar_texto_pdf(modelo, numero, gerador):
+    texto, trechos = modelo
+    volume = gerador.randrange(1000, 300000)
+    valor = round(volume * gerador.uniform(3.8, 4.6), 2)
+    novos = {
+        'cnpj': _cnpj(gerador),
+        'valor_total': _valor_pdf(valor),
+        'numero_fatura': re.sub(r'(\d{3})(?=\d)', r'\1.', f'{numero % 10 ** 9:09d}'),
+        'valor_icms': f'{valor * 0.2:.2f}'.replace('.', ','),
+        # Chave de acesso nova (modelo 55 na posição certa), nos grupos de 4 dígitos do DANFE
+        'chave_acesso': ' '.join(re.findall(r'\d{4}', f'23{gerador.randrange(10 ** 18):018d}55{gerador.randrange(10 ** 22):022d}')),
+    }
+    if '.' not in texto[slice(*trechos['volume_total'])]:
+        novos['volume_total'] = str(volume)
+    # Troca do fim para o começo, para que as posições dos trechos anteriores não mudem
+    for campo, (inicio, fim) in sorted(trechos.items(), key=lambda item: item[1], reverse=True):
+        if campo in novos:
+            texto = texto[:inicio] + novos[campo] + texto[fim:]
+    return texto
+
+def _escapar(linha):
+    return linha.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def escrever_pdf(caminho, texto, largura_linha=100):
+    # PDF de uma página com o texto em linhas (Helvetica/WinAnsi): o PyPDF2 devolve as linhas
+    # separadas por '\n', que o main.extrair_texto volta a transformar em espaço
+    linhas, atual = [], ''
+    for palavra in texto.split(' '):
+        if atual and len(atual) + len(palavra) + 1 > largura_linha:
+            linhas.append(atual)
+            atual = palavra
+        else:
+            atual = f'{atual} {palavra}' if atual else palavra
+    linhas.append(atual)
+
+    conteudo = ['BT', '/F1 7 Tf', '8 TL', '20 820 Td'] + [f'({_escapar(linha)}) Tj T*' for linha in linhas] + ['ET']
+    stream = '\n'.join(conteudo).encode('cp1252', 'replace')
+    objetos = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream',
+    ]
+    saida = bytearray(b'%PDF-1.4\n')
+    posicoes = []
+    for numero, objeto in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b'%d 0 obj\n' % numero + objeto + b'\nendobj\n'
+    inicio_xref = len(saida)
+    saida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b'%010d 00000 n \n' % posicao
+    saida += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, inicio_xref)
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(saida)
+
+
+def gerar(destino, quantidade_xml=0, quantidade_pdf=0, duplicados=0.0, semente=0):
+    # Devolve a lista de arquivos gerados. Uma fração 'duplicados' dos arquivos é cópia de um anterior.
+    os.makedirs(destino, exist_ok=True)
+    gerador = random.Random(semente)
+    arquivos = []
+    xmls = modelos_xml() if quantidade_xml else []
+    pdfs = modelos_pdf() if quantidade_pdf else []
+    if quantidade_xml and not xmls:
+        raise FileNotFoundError("Nenhum XML de exemplo em Faturas/")
+    if quantidade_pdf and not pdfs:
+        raise FileNotFoundError("Nenhum PDF de exemplo em Lidos/")
+
+    # Os duplicados repetem um dos últimos arquivos do mesmo tipo (a memória não cresce com a quantidade)
+    recentes = {True: deque(maxlen=100), False: deque(maxlen=100)}
+    for numero in range(quantidade_xml + quantidade_pdf):
+        eh_xml = numero < quantidade_xml
+        caminho = os.path.join(destino, f'SINTETICA_GN_{numero:06d}.{"xml" if eh_xml else "pdf"}')
+        if recentes[eh_xml] and gerador.random() < duplicados:
+            conteudo = gerador.choice(recentes[eh_xml])
+        elif eh_xml:
+            conteudo = gerar_xml(gerador.choice(xmls), 500000 + numero, gerador)
+        else:
+            conteudo = gerar_texto_pdf(gerador.choice(pdfs), 500000 + numero, gerador)
+        recentes[eh_xml].append(conteudo)
+        if eh_xml:
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(conteudo)
+        else:
+            escrever_pdf(caminho, conteudo)
+        arquivos.append(caminho)
+    return arquivos
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera faturas sintéticas (NF-e e PDF) no formato da Cegás')
+    parser.add_argument('destino')
+    parser.add_argument('--xml', type=int, default=1000)
+    parser.add_argument('--pdf', type=int, default=0)
+    parser.add_argument('--duplicados', type=float, default=0.0, help='fração de arquivos repetidos')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    arquivos = gerar(args.destino, args.xml, args.pdf, args.duplicados, args.semente)
+    print(f"{len(arquivos)} faturas geradas em {args.destino}")
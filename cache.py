@@ -0,0 +1,102 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+import metricas
+
+# CACHE DE EXTRAÇÃO ENDEREÇADO POR CONTEÚDO
+# A chave é o SHA-256 do arquivo mais a versão do extrator; o valor é o dicionário 'informacoes'.
+# Um arquivo que não mudou (ex.: ficou em Faturas por campo faltante ou duplicado) não é lido
+# de novo pelo PyPDF2/ElementTree na execução seguinte. Quando o total guardado passa do limite,
+# as entradas usadas há mais tempo são descartadas (LRU).
+
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS extracoes (
+    chave TEXT PRIMARY KEY,
+    informacoes TEXT NOT NULL,
+    tamanho INTEGER NOT NULL,
+    acessado_em REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_extracoes_acesso ON extracoes (acessado_em);
+'''
+
+
+@metricas.cronometrar('hash')
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+@metricas.cronometrar('hash')
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+class CacheExtracao:
+    def __init__(self, caminho_cache, limite_bytes):
+        self.limite_bytes = limite_bytes
+        # timeout e WAL permitem que os processos do lote leiam e gravem ao mesmo tempo
+        self.conexao = sqlite3.connect(caminho_cache, timeout=30)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.executescript(ESQUEMA)
+
+    def fechar(self):
+        self.conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def obter(self, chave):
+        linha = self.conexao.execute('SELECT informacoes FROM extracoes WHERE chave = ?', (chave,)).fetchone()
+        if linha is None:
+            return None
+        with self.conexao:
+            self.conexao.execute('UPDATE extracoes SET acessado_em = ? WHERE chave = ?', (time.time(), chave))
+        return json.loads(linha[0])
+
+    def guardar(self, chave, informacoes):
+        valor = json.dumps(informacoes, ensure_ascii=False)
+        with self.conexao:
+            self.conexao.execute(
+                'INSERT OR REPLACE INTO extracoes (chave, informacoes, tamanho, acessado_em) VALUES (?, ?, ?, ?)',
+                (chave, valor, len(valor), time.time()),
+            )
+
+    def extrair(self, caminho, versao, funcao, assinatura=None, guardar_vazio=True):
+        # Devolve o resultado guardado para este conteúdo, ou chama 'funcao(caminho)' e guarda o resultado
+        # ('caminho' pode ser um leitura.ArquivoEmMemoria, e então 'assinatura' é obrigatória).
+        # 'assinatura' é o SHA-256 já calculado (hash_arquivo/hash_conteudo), para quem tenta mais de
+        # um extrator no mesmo arquivo; não são os bytes do arquivo.
+        # guardar_vazio=False: um resultado vazio não é guardado e o arquivo é lido de novo na próxima vez
+        chave = f'{assinatura or hash_arquivo(caminho)}:{versao}'
+        informacoes = self.obter(chave)
+        if informacoes is None:
+            metricas.contar('cache_faltas')
+            informacoes = funcao(caminho)
+            if informacoes or guardar_vazio:
+                self.guardar(chave, informacoes)
+        else:
+            metricas.contar('cache_acertos')
+        return informacoes
+
+    def podar(self):
+        # Remove as entradas menos usadas até o total caber no limite
+        total = self.conexao.execute('SELECT COALESCE(SUM(tamanho), 0) FROM extracoes').fetchone()[0]
+        if total <= self.limite_bytes:
+            return 0
+        removidas = []
+        for chave, tamanho in self.conexao.execute('SELECT chave, tamanho FROM extracoes ORDER BY acessado_em'):
+            if total <= self.limite_bytes:
+                break
+            removidas.append((chave,))
+            total -= tamanho
+        with self.conexao:
+            self.conexao.executemany('DELETE FROM extracoes WHERE chave = ?', removidas)
+        return len(removidas)
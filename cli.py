@@ -0,0 +1,170 @@
+import io
+import os
+import sys
+import secrets
+import importlib
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import config
+
+# PONTO DE ENTRADA DA LINHA DE COMANDO
+# python cli.py <comando> [opções do comando]
+# Cada comando é o principal() de um dos scripts, importado só quando é chamado: 'xml' e 'relatorio'
+# não carregam pandas nem leitor de PDF, e nenhum comando importa o que não usa.
+# Com 'python cli.py servidor' rodando, as outras chamadas são atendidas por ele: os módulos já
+# estão carregados e a chamada custa só a partida do interpretador e a conexão local. Sem servidor
+# (ou com --local), o comando roda no próprio processo. O servidor atende um comando de cada vez,
+# então continua havendo um único escritor no livro.
+
+COMANDOS = {
+    # comando -> (módulo, argumentos fixos antes dos da linha de comando)
+    'lote': ('lote', []),
+    'xml': ('lote', ['--formatos', 'nfe', '--workers', '1']),  # só NF-e, no próprio processo, sem pool
+    'async': ('lote_async', []),
+    'monitor': ('monitor', []),
+    'livro': ('armazenamento', []),
+    'relatorio': ('relatorios', []),
+}
+_SEMPRE_LOCAL = {'monitor'}  # de longa duração: prenderia o servidor
+
+USO = '''uso: python cli.py [--local] <comando> [opções]
+
+comandos:
+  lote       processa a pasta de faturas (lote.py)
+  xml        processa só as NF-e da pasta, sem pool de processos nem pandas
+  async      processa buscando os arquivos da rede em paralelo (lote_async.py)
+  monitor    monitora a pasta (monitor.py)
+  livro      exportar/importar a planilha (armazenamento.py)
+  relatorio  totais por CNPJ e mês (relatorios.py)
+  servidor   mantém os módulos carregados e atende as chamadas seguintes
+  parar      encerra o servidor
+
+'python cli.py <comando> --help' mostra as opções de cada comando.'''
+
+
+def executar(argv):
+    # Roda o comando no processo atual e devolve o código de saída
+    comando, *resto = argv
+    modulo, fixos = COMANDOS[comando]
+    try:
+        return importlib.import_module(modulo).principal(fixos + resto) or 0
+    except SystemExit as e:  # argparse (--help ou opção inválida)
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+
+
+def _atender(argv, pasta):
+    # Um comando do servidor: roda na pasta de quem chamou e devolve (código, tudo o que foi impresso)
+    saida = io.StringIO()
+    anterior = os.getcwd()
+    try:
+        os.chdir(pasta)
+        with redirect_stdout(saida), redirect_stderr(saida):
+            try:
+                codigo = executar(argv)
+            except Exception:
+                traceback.print_exc()
+                codigo = 1
+    finally:
+        os.chdir(anterior)
+        if 'metricas' in sys.modules:
+            sys.modules['metricas'].zerar()
+    return codigo, saida.getvalue()
+
+
+def chave_servidor(criar=False):
+    # A chave das conexões com o servidor: CEGAS_CHAVE_SERVIDOR ou o arquivo config.caminho_chave_servidor.
+    # Sem nenhum dos dois, criar=True (o servidor) gera uma chave aleatória e grava o arquivo com
+    # permissão só para o usuário; o cliente (criar=False) recebe None, pois nenhum servidor foi iniciado
+    chave = os.environ.get('CEGAS_CHAVE_SERVIDOR')
+    if chave:
+        return chave.encode()
+    caminho = config.caminho_chave_servidor
+    while True:
+        try:
+            with open(caminho, 'rb') as arquivo:
+                if os.name == 'posix' and os.fstat(arquivo.fileno()).st_mode & 0o077:
+                    raise PermissionError(f"A chave do servidor em '{caminho}' pode ser lida por outros usuários (use chmod 600)")
+                return arquivo.read().strip()
+        except FileNotFoundError:
+            if not criar:
+                return None
+        try:
+            descritor = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            continue  # outro servidor criou o arquivo ao mesmo tempo: vale a chave dele
+        chave = secrets.token_hex(32).encode()
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(chave)
+        return chave
+
+
+def servir(endereco=None, chave=None):
+    endereco = endereco or config.endereco_servidor
+    with Listener(endereco, authkey=chave or chave_servidor(criar=True)) as ouvinte:
+        print(f"Servidor atendendo em {endereco[0]}:{endereco[1]} (Ctrl+C ou 'python cli.py parar' para encerrar)")
+        while True:
+            try:
+                conexao = ouvinte.accept()
+            except KeyboardInterrupt:
+                break
+            except Exception as e:  # chave errada ou conexão interrompida: o servidor continua
+                print(f"Conexão recusada: {e}")
+                continue
+            with conexao:
+                try:
+                    argv, pasta = conexao.recv()
+                except EOFError:
+                    continue
+                if argv == ['parar']:
+                    conexao.send((0, 'Servidor encerrado.\n'))
+                    break
+                print(' '.join(argv))
+                conexao.send(_atender(argv, pasta))
+    print("Servidor encerrado.")
+
+
+def _pelo_servidor(argv):
+    # (código, saída) do servidor, ou None se não houver servidor rodando
+    chave = chave_servidor()
+    if chave is None:
+        return None
+    try:
+        conexao = Client(config.endereco_servidor, authkey=chave)
+    except OSError:
+        return None
+    except AuthenticationError:
+        return 1, f"O servidor em {config.endereco_servidor[0]}:{config.endereco_servidor[1]} recusou a chave de '{config.caminho_chave_servidor}'.\n"
+    with conexao:
+        conexao.send((argv, os.getcwd()))
+        return conexao.recv()
+
+
+def principal(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    local = argv[:1] == ['--local']
+    if local:
+        argv = argv[1:]
+    if not argv or argv[0] not in (*COMANDOS, 'servidor', 'parar'):
+        print(USO)
+        return 0 if argv[:1] in ([], ['-h'], ['--help']) else 2
+
+    if argv[0] == 'servidor':
+        servir()
+        return 0
+    if not local and argv[0] not in _SEMPRE_LOCAL:
+        resposta = _pelo_servidor(argv)
+        if resposta is not None:
+            codigo, saida = resposta
+            sys.stdout.write(saida)
+            return codigo
+    if argv[0] == 'parar':
+        print("Nenhum servidor rodando.")
+        return 1
+    return executar(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(principal())
@@ -1,3 +1,5 @@
+import os
+
 # COORDENADAS PARA EXTRAÇÃO DE DADOS USANDO OCR
                     # A PRIMEIRA COORDENADA DE CADA VALOR, FOI FEITA ATRAVÉZ DA FATURA PADRÃO
 def corte_comgas():
@@ -51,3 +53,69 @@ caminho_excel = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\dados.x
             brilhar(branco)'''
 
 
+
+# CAMINHOS DA LEITURA DA CEGÁS
+
+diretorio_faturas = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Faturas'
+diretorio_destino = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Lidos'
+caminho_planilha = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\00 Faturas Lidas\CEGAS.xlsx'
+
+# LIVRO DE FATURAS (SQLITE) - A PLANILHA É GERADA A PARTIR DELE COM 'python armazenamento.py exportar'
+
+caminho_banco = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\00 Faturas Lidas\CEGAS.sqlite3'
+tamanho_lote = 50                                          # FATURAS GRAVADAS POR TRANSAÇÃO
+caminho_resumo = None                                      # JSON COM TEMPOS POR ETAPA E CONTADORES DE CADA EXECUÇÃO DO LOTE (None = NÃO GRAVA)
+
+# BANCO VIA SQLALCHEMY - USADO QUANDO caminho_banco (OU --banco) É UMA URL, EX.: 'postgresql+psycopg://usuario@servidor/faturas'
+
+pool_banco = 5                                             # CONEXÕES MANTIDAS NO POOL
+pool_banco_extra = 10                                      # CONEXÕES ALÉM DO POOL EM PICOS
+
+# CACHE DE EXTRAÇÃO (LOCAL, FORA DO G:) - PULA ARQUIVOS QUE NÃO MUDARAM DESDE A ÚLTIMA LEITURA
+
+caminho_cache = os.path.join(os.path.expanduser('~'), '.cegas_cache.sqlite3')
+cache_limite_bytes = 64 * 1024 * 1024
+
+# PERFIS DE DISTRIBUIDORA (perfis.py) - ESCOLHIDOS PELO NOME DO ARQUIVO OU PELO CNPJ DO EMITENTE
+
+perfil_padrao = 'CEGAS'                                    # USADO QUANDO NEM O NOME NEM O CNPJ IDENTIFICAM A DISTRIBUIDORA
+
+# LEITURA DO TEXTO DOS PDFs
+# backend_pdf: 'pypdf2' (padrão), 'pypdfium2' ou 'pymupdf' (compare com benchmarks/bench_pdf.py antes de trocar,
+# as regex foram escritas para o texto do PyPDF2)
+# paginas_pdf: índices das páginas a ler, na ordem (None = todas; a leitura para quando os campos forem achados)
+# varias_faturas_por_pdf: True continua a leitura depois da primeira fatura e grava uma linha por fatura
+# (PDFs com o faturamento de vários meses ou vários pontos de entrega); lê todas as páginas de cada PDF
+
+backend_pdf = 'pypdf2'
+paginas_pdf = None
+varias_faturas_por_pdf = False
+
+# OCR DE PDFs ESCANEADOS (pdf2image + pytesseract)
+# As coordenadas de corte_comgas estão em pixels da página rasterizada em dpi_ocr.
+
+usar_ocr = True
+dpi_ocr = 450
+idioma_ocr = 'por'
+ocr_workers = None                                         # None = um por núcleo
+caminho_tesseract = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+caminho_poppler = None                                     # pasta 'bin' do Poppler no Windows, se não estiver no PATH
+
+# MONITOR DA PASTA DE FATURAS ('python monitor.py')
+
+caminho_estado_monitor = os.path.join(os.path.expanduser('~'), '.cegas_monitor.json')
+monitor_intervalo = 10                                     # SEGUNDOS ENTRE VERIFICAÇÕES (SEM WATCHDOG)
+monitor_estabilidade = 5                                   # SEGUNDOS SEM MUDANÇA ANTES DE LER UM ARQUIVO
+
+# MODO ASSÍNCRONO ('python lote_async.py') - PASTAS EM COMPARTILHAMENTO DE REDE (G:)
+
+leituras_simultaneas = 16                                  # ARQUIVOS BUSCADOS DA REDE AO MESMO TEMPO
+movimentos_simultaneos = 8                                 # ARQUIVOS MOVIDOS PARA LIDOS AO MESMO TEMPO
+
+# SERVIDOR DA LINHA DE COMANDO ('python cli.py servidor') - MÓDULOS CARREGADOS ENTRE AS CHAMADAS DO AGENDADOR
+# Só aceita conexões desta máquina e de quem tem a chave: a variável de ambiente CEGAS_CHAVE_SERVIDOR,
+# ou a chave aleatória que o servidor cria na primeira partida em caminho_chave_servidor (legível só
+# pelo usuário). O cliente lê a chave do mesmo lugar.
+
+endereco_servidor = ('127.0.0.1', 47650)
+caminho_chave_servidor = os.path.join(os.path.expanduser('~'), '.cegas_servidor.chave')
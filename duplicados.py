@@ -0,0 +1,66 @@
+import re
+
+# ÍNDICE DE DUPLICADOS
+# Cada fatura gravada no livro gera chaves normalizadas (tabela 'chaves' do SQLite):
+#   campos:<cnpj do cliente>|<data início>|<data fim>|<valor total em centavos>
+#   nfe:<chave de acesso da NF-e (infNFe/@Id no XML, impressa no DANFE do PDF)>
+# O índice é carregado uma vez por execução em um set, e é o mesmo para PDF e XML: o PDF e o XML
+# da mesma nota têm a mesma chave de acesso e o mesmo CNPJ (o do cliente) nos dois formatos.
+
+
+def normalizar_data(data):
+    data = str(data or '').strip()
+    encontrado = re.match(r'(\d{2})[/.](\d{2})[/.](\d{4})', data)
+    if encontrado:
+        dia, mes, ano = encontrado.groups()
+        return f'{ano}-{mes}-{dia}'
+    return data.split('T')[0].split(' ')[0]
+
+
+def _normalizar_valor(valor):
+    try:
+        centavos = round(float(valor) * 100)
+    except (TypeError, ValueError):
+        return ''
+    return str(centavos)
+
+
+def normalizar_cnpj(cnpj):
+    # '07.206.816/0028-35' (PDF) e '07206816002835' (NF-e) -> '07206816002835'
+    return re.sub(r'\D', '', str(cnpj or ''))
+
+
+def normalizar_numero(numero_fatura):
+    # '000.408.210' (PDF) e '408210' (NF-e) -> 408210; None se não houver dígitos
+    digitos = re.sub(r'\D', '', str(numero_fatura or ''))
+    return int(digitos) if digitos else None
+
+
+def chave_registro(cnpj, data_inicio, data_fim, valor_total):
+    return f'campos:{normalizar_cnpj(cnpj)}|{normalizar_data(data_inicio)}|{normalizar_data(data_fim)}|{_normalizar_valor(valor_total)}'
+
+
+def chave_nfe(chave_acesso):
+    chave_acesso = re.sub(r'\D', '', str(chave_acesso or ''))
+    return f'nfe:{chave_acesso}' if chave_acesso else None
+
+
+def chaves_da_linha(linha):
+    # 'linha' é o dicionário com as colunas da planilha; 'Chave de Acesso' é opcional
+    chaves = [chave_registro(linha.get('CNPJ'), linha.get('Data Início'), linha.get('Data Fim'), linha.get('Valor Total'))]
+    nfe = chave_nfe(linha.get('Chave de Acesso'))
+    if nfe:
+        chaves.append(nfe)
+    return chaves
+
+
+class IndiceDuplicados:
+    def __init__(self, livro):
+        self.chaves = livro.carregar_chaves()
+
+    def existe(self, linha):
+        return any(chave in self.chaves for chave in chaves_da_linha(linha))
+
+    def adicionar(self, linha):
+        # Registra a linha assim que ela entra no lote, para barrar duplicados dentro da mesma execução
+        self.chaves.update(chaves_da_linha(linha))
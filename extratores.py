@@ -0,0 +1,251 @@
+import os
+import re
+from functools import partial
+from dataclasses import dataclass
+from datetime import date
+
+import config
+import metricas
+import main
+import mainxml
+import perfis
+from armazenamento import COLUNAS
+from cache import hash_arquivo, hash_conteudo
+from leitura import ArquivoEmMemoria, caminho_de
+from ocr import VERSAO_OCR, OcrIndisponivel, extrair_informacoes_ocr
+
+# REGISTRO DE EXTRATORES
+# Todo arquivo passa pelo mesmo caminho: o formato é identificado pelo conteúdo (não pela extensão),
+# os extratores registrados para aquele formato são tentados em ordem e o resultado vira uma Fatura.
+# As Faturas vão em lote para o escritor (lote.EscritorLote).
+
+CAMPOS_TEXTO = ['cnpj', 'valor_total', 'volume_total', 'data_emissao', 'data_inicio', 'data_fim', 'numero_fatura', 'valor_icms', 'correcao_pcs']
+CAMPOS_NFE = ['cnpj', 'valor_total', 'volume_total', 'data_emissao', 'data_inicio', 'data_fim', 'numero_fatura', 'valor_icms']
+
+
+# Conversões feitas uma única vez, quando a Fatura é criada
+_DATA_BR = re.compile(r'(\d{2})[/.](\d{2})[/.](\d{4})')
+_DATA_ISO = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+def ler_decimal(texto, separador_decimal=','):
+    # '1.234,56' -> 1234.56 (separador ','); '1234.56' -> 1234.56 (separador '.'); None se não for número
+    texto = str(texto or '').strip()
+    if separador_decimal == ',':
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+def ler_data(texto):
+    # 'dd/mm/aaaa', 'dd.mm.aaaa' ou 'aaaa-mm-dd[Thh:mm...]' -> date; None se não for data
+    texto = str(texto or '')
+    encontrado = _DATA_BR.search(texto)
+    if encontrado:
+        dia, mes, ano = encontrado.groups()
+    else:
+        encontrado = _DATA_ISO.search(texto)
+        if not encontrado:
+            return None
+        ano, mes, dia = encontrado.groups()
+    try:
+        return date(int(ano), int(mes), int(dia))
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
+class Fatura:
+    # Números e datas já convertidos; sem __dict__, cada Fatura ocupa só os seus campos
+    cnpj: str
+    valor_total: float | None
+    volume_total: float | None
+    data_emissao: date | None
+    data_inicio: date | None
+    data_fim: date | None
+    numero_fatura: str
+    valor_icms: float | None
+    correcao_pcs: float | None
+    distribuidora: str
+    nome_arquivo: str
+    formato: str
+    chave_acesso: str = ''
+
+    @classmethod
+    def de_informacoes(cls, informacoes, extrator, nome_arquivo):
+        # 'informacoes' é o dicionário de texto dos extratores (o mesmo guardado no cache)
+        separador = extrator.separador_decimal
+        return cls(
+            cnpj=informacoes.get('cnpj', ''),
+            valor_total=ler_decimal(informacoes.get('valor_total'), separador),
+            volume_total=ler_decimal(informacoes.get('volume_total'), separador),
+            data_emissao=ler_data(informacoes.get('data_emissao')),
+            data_inicio=ler_data(informacoes.get('data_inicio')),
+            data_fim=ler_data(informacoes.get('data_fim')),
+            numero_fatura=informacoes.get('numero_fatura', ''),
+            valor_icms=ler_decimal(informacoes.get('valor_icms'), separador),
+            # O PCS vem como '0.9488' (calculado no PDF) ou '1,000' (padrão da NF-e): só a vírgula muda
+            correcao_pcs=ler_decimal(str(informacoes.get('correcao_pcs') or '').replace(',', '.'), '.'),
+            distribuidora=informacoes.get('distribuidora', ''),
+            nome_arquivo=nome_arquivo,
+            formato=extrator.nome,
+            chave_acesso=informacoes.get('chave_acesso', ''),
+        )
+
+    def linha(self):
+        # Dicionário com as colunas da planilha/livro
+        linha = {coluna: getattr(self, campo) for coluna, campo in COLUNAS.items()}
+        linha['Chave de Acesso'] = self.chave_acesso
+        return linha
+
+
+@dataclass(frozen=True)
+class Extrator:
+    nome: str
+    detectar: object             # função(cabeçalho em bytes) -> bool
+    extrair: object              # função(caminho ou ArquivoEmMemoria, perfil) -> dicionário 'informacoes' ({} se não leu nada)
+                                 # ou lista deles, um por fatura, quando o arquivo traz várias
+    campos_obrigatorios: tuple
+    versao: str                  # entra na chave do cache de extração
+    separador_decimal: str = ','
+    guardar_vazio: bool = True   # False: um resultado vazio não vai para o cache (depende do ambiente, não do arquivo)
+
+
+EXTRATORES = []
+
+
+def registrar_extrator(nome, detectar, campos_obrigatorios, versao, separador_decimal=',', guardar_vazio=True):
+    # Os extratores são tentados na ordem de registro; o primeiro que devolver algo é usado.
+    # Cada um recebe o perfil da distribuidora tirado do nome do arquivo, ou None para escolher pelo conteúdo,
+    # e devolve a distribuidora em informacoes['distribuidora']
+    def decorador(funcao):
+        EXTRATORES.append(Extrator(nome, detectar, funcao, tuple(campos_obrigatorios), versao, separador_decimal, guardar_vazio))
+        return funcao
+    return decorador
+
+
+# Identificação pelo conteúdo
+TAMANHO_CABECALHO = 2048
+
+def ler_cabecalho(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return arquivo.read(TAMANHO_CABECALHO)
+
+def eh_pdf(cabecalho):
+    return b'%PDF-' in cabecalho[:1024]
+
+def eh_xml(cabecalho):
+    return cabecalho.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<')
+
+def eh_nfe(cabecalho):
+    return eh_xml(cabecalho) and b'portalfiscal.inf.br/nfe' in cabecalho
+
+
+@registrar_extrator('nfe', eh_nfe, CAMPOS_NFE, mainxml.VERSAO_EXTRATOR, separador_decimal='.')
+def extrair_nfe(caminho, perfil=None):
+    return mainxml.ler_faturas_xml(caminho, perfil)
+
+@registrar_extrator('pdf', eh_pdf, CAMPOS_TEXTO, f'{main.VERSAO_EXTRATOR}:{config.backend_pdf}:{int(config.varias_faturas_por_pdf)}')
+def extrair_pdf(caminho, perfil=None):
+    return main.ler_faturas(caminho, perfil)
+
+@registrar_extrator('ocr', eh_pdf, CAMPOS_TEXTO, f'{main.VERSAO_EXTRATOR}:{VERSAO_OCR}', guardar_vazio=False)
+def extrair_ocr(caminho, perfil=None):
+    # Só é tentado quando o PDF não tem camada de texto (o extrator 'pdf' não devolveu nada).
+    # Sem texto não há CNPJ para escolher o perfil: vale o do nome do arquivo ou o padrão.
+    # O resultado vazio (OCR desligado ou sem nada lido) não vai para o cache: o PDF é tentado
+    # de novo quando o OCR for ligado ou instalado
+    if not config.usar_ocr:
+        return {}
+    perfil = perfil or perfis.padrao()
+    # O OCR rasteriza a partir do arquivo no disco, mesmo quando o conteúdo já está em memória
+    print(f"PDF sem texto, tentando OCR: {caminho}")
+    corte = perfil.corte_ocr() if perfil.corte_ocr else {}
+    informacoes = extrair_informacoes_ocr(caminho_de(caminho), corte, extrator=main.ExtratorFaturas(perfil))
+    if informacoes:
+        informacoes['distribuidora'] = perfil.distribuidora
+    return informacoes
+
+@registrar_extrator('xml', eh_xml, CAMPOS_TEXTO, main.VERSAO_EXTRATOR)
+def extrair_xml_texto(caminho, perfil=None):
+    # XML que não é NF-e: regex sobre o texto, como no PDF
+    texto = main.extrair_texto_xml(caminho)
+    if not texto:
+        return {}
+    perfil = perfil or perfis.do_texto(texto) or perfis.padrao()
+    informacoes = main.ExtratorFaturas(perfil).extrair_informacoes(texto)
+    informacoes['distribuidora'] = perfil.distribuidora
+    return informacoes
+
+
+def extrair_faturas(caminho, cache=None, formatos=None, conteudo=None):
+    # Devolve (faturas, recusadas): as Faturas do arquivo (uma por página de fatura do PDF ou por NF-e
+    # do XML) e quantas ficaram de fora por algum campo faltando. ([], 0) se o formato não for suportado.
+    # O escritor só move o arquivo para Lidos se nenhuma fatura dele foi recusada.
+    # 'conteudo': bytes do arquivo já lidos (lote_async.py); os extratores leem da memória, não do disco
+    fonte = caminho if conteudo is None else ArquivoEmMemoria(caminho, conteudo)
+    try:
+        cabecalho = ler_cabecalho(caminho) if conteudo is None else conteudo[:TAMANHO_CABECALHO]
+    except OSError as e:
+        print(f"Erro ao abrir o arquivo: {caminho}, erro: {e}")
+        metricas.contar('erro_leitura')
+        return [], 0
+    candidatos = [extrator for extrator in EXTRATORES
+                  if extrator.detectar(cabecalho) and (formatos is None or extrator.nome in formatos)]
+    if not candidatos:
+        print(f"Tipo de arquivo não suportado: {caminho}")
+        metricas.contar('formato_nao_suportado')
+        return [], 0
+
+    # O perfil tirado do nome entra na chave do cache: o mesmo conteúdo com outro nome pode ser lido com outro perfil
+    perfil = perfis.do_arquivo(os.path.basename(caminho))
+    versao_perfil = f"{perfis.VERSAO_PERFIS}:{perfil.nome if perfil else 'auto'}"
+    assinatura = None  # SHA-256 do conteúdo, calculado uma vez para todos os extratores tentados
+    for extrator in candidatos:
+        try:
+            if cache is not None:
+                assinatura = assinatura or (hash_arquivo(caminho) if conteudo is None else hash_conteudo(conteudo))
+                versao = f'{extrator.nome}:{extrator.versao}:{versao_perfil}'
+                informacoes = cache.extrair(fonte, versao, partial(extrator.extrair, perfil=perfil), assinatura, extrator.guardar_vazio)
+            else:
+                informacoes = extrator.extrair(fonte, perfil)
+        except OcrIndisponivel as e:
+            # Tesseract/Poppler ausentes: o arquivo fica em Faturas e nada é guardado no cache
+            print(f"OCR indisponível para {caminho}: {e}")
+            metricas.contar('ocr_indisponivel')
+            informacoes = {}
+        except OSError as e:
+            # Falha passageira de leitura (compartilhamento, arquivo bloqueado): o arquivo fica em Faturas,
+            # nada vai para o cache e ele é lido de novo na próxima execução
+            print(f"Erro ao ler o arquivo: {caminho}, erro: {e}")
+            metricas.contar('erro_leitura')
+            return [], 0
+        if informacoes:
+            break
+
+    # Verifica se todos os campos foram extraídos, fatura a fatura, já convertidos: uma data ou um
+    # número que não se converte (ex.: '31/02/2024') também conta como campo faltante
+    faturas = []
+    recusadas = 0
+    for informacoes in (informacoes if isinstance(informacoes, list) else [informacoes]):
+        fatura = Fatura.de_informacoes(informacoes, extrator, os.path.basename(caminho))
+        campos_faltantes = [campo for campo in extrator.campos_obrigatorios if getattr(fatura, campo) in (None, '')]
+        if campos_faltantes:
+            print(f"Campos faltantes no arquivo {caminho}: {', '.join(campos_faltantes)}")
+            metricas.contar('campos_faltantes')
+            recusadas += 1
+            continue
+        metricas.contar(f'extraidos_{extrator.nome}')
+        faturas.append(fatura)
+    return faturas, recusadas
+
+
+def extrair_fatura(caminho, cache=None, formatos=None, conteudo=None):
+    # A primeira Fatura do arquivo, ou None
+    faturas, _ = extrair_faturas(caminho, cache, formatos, conteudo)
+    return faturas[0] if faturas else None
+
+
+def faturas_para_linhas(faturas):
+    # Lote de Faturas -> linhas com as colunas da planilha/livro (os valores já estão convertidos)
+    return [fatura.linha() for fatura in faturas]
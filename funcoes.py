@@ -1,12 +1,8 @@
-from pdf2image import convert_from_path
-import pandas as pd
-import numpy as np
 import os
 import re
-from sqlalchemy import create_engine, select, MetaData, Table
-from sqlalchemy.orm import sessionmaker
-import shutil
-import PyPDF2
+
+# pandas e SQLAlchemy são importados dentro das funções que os usam: importar este módulo
+# não carrega nenhum dos dois
 
 #in/out 3100, 1300, 3800, 1450
 usuario_conectado = 'samuel.santos'
@@ -14,7 +10,8 @@ usuario_conectado = 'samuel.santos'
 
       
 def dados_excel(cnpj, valor_total,volume_total, data_emissao, data_inicio, data_fim, numero_fatura, valor_icms, correcao_pcs, dist):
-   
+    import pandas as pd
+
     dados = {
            'CNPJ': [cnpj],
            'VALOR TOTAL': valor_total,
@@ -50,6 +47,8 @@ def dados_excel(cnpj, valor_total,volume_total, data_emissao, data_inicio, data_
     return df
           
 def adicionar_dados_excel(dados, novos_dados):
+    import pandas as pd
+
     try:
         df_existente = pd.read_excel(dados)
         
@@ -79,11 +78,15 @@ def listar_pdfs_com_referencia_na_pasta(pasta, referencia):
     return arquivos_pdf
 
 def verificar_fatura_existe(session, tabela_faturas, numero_fatura):
-    stmt = select([tabela_faturas.c.numero_fatura]).where(tabela_faturas.c.numero_fatura == numero_fatura)
+    from sqlalchemy import select
+
+    stmt = select(tabela_faturas.c.numero_fatura).where(tabela_faturas.c.numero_fatura == numero_fatura)
     result = session.execute(stmt).fetchone()
     return result is not None
 
 def verificar_download(cnpj, data_inicio, data_fim, excel_path):
+    import pandas as pd
+
     # Carregar o arquivo Excel
     df = pd.read_excel(excel_path, sheet_name='Sheet1')
     
@@ -95,82 +98,4 @@ def verificar_download(cnpj, data_inicio, data_fim, excel_path):
         (df['DATA INICIO'] == data_inicio) &
         (df['DATA FIM'] == data_fim)
     ]
-    
-    class ExtratorFaturas:
-        def __init__(self):
-            self.regexes = {
-                'cnpj': r'\d{2}\.\d{3}\.?\d{3}\/?\d{4}\-?\s?\d{2}',
-                'valor_total': r'R\$\s(\d+\.?\d+\,\d{2})\s',
-                'volume_total': r'Total\s\d+\.?\,?\d+\.?\,?\d+?\.?\,?\s',
-                'data_emissao': r'apresentação\s(\d{2}\.\d{2}\.\d{4})',
-                'data_inicio': r'\d{2}\.\d{2}\.\d{4}\d{2}\.\d{2}\.\d{4}(\d{2}\.\d{2}\.\d{4})\d{2}\.\d{2}\.\d{4}', #revisar essa merda de regex
-                'data_fim': r'\d{2}\.\d{2}\.\d{4}(\d{2}\.\d{2}\.\d{4})\d{2}\.\d{2}\.\d{4}',            
-                'numero_fatura': r'\s(\d{3}\.\d{3}\.\d{3})\s',
-                'valor_icms': r'ICMS\s?R\$\s(\d+\.?\d+\,\d{2})\s',     
-                'correcao_pcs': r'[A-Z]\d{9}(\d{4})\d+',
-            }
-    
-        def extrair_informacoes(self, texto):
-            informacoes = {}
-            for chave, regex in self.regexes.items():
-                match = re.search(regex, texto)
-                if match:
-                    informacoes[chave] = match.group(1) if match.groups() else match.group(0)
-                else:
-                    informacoes[chave] = ''  # Adiciona uma string vazia se não houver correspondência
-            return informacoes
-    
-    def extrair_texto(caminho_do_pdf):
-        texto = ''
-        with open(caminho_do_pdf, 'rb') as arquivo:
-            leitor_pdf = PyPDF2.PdfReader(arquivo)
-            for pagina in leitor_pdf.pages:
-                texto_pagina = pagina.extract_text()
-                if texto_pagina:
-                    texto += texto_pagina + ' '  # Substitui '\n' por ' ' para evitar linhas extras
-        return texto.strip()  # Remove espaços extras no início e no fim
-    
-    def adicionar_na_planilha(informacoes, caminho_planilha, nome_arquivo):
-        df = pd.read_excel(caminho_planilha)
-        nova_linha = pd.DataFrame([{
-            'CNPJ': informacoes.get('cnpj', ''),
-            'Valor Total': informacoes.get('valor_total', ''),
-            'Volume Total': informacoes.get('volume_total', ''),
-            'Data Emissão': informacoes.get('data_emissao', ''),
-            'Data Início': informacoes.get('data_inicio', ''),
-            'Data Fim': informacoes.get('data_fim', ''),
-            'Número Fatura': informacoes.get('numero_fatura', ''),
-            'Valor ICMS': informacoes.get('valor_icms', ''),
-            'Correção PCS': informacoes.get('correcao_pcs', ''),
-            'Nome Arquivo': nome_arquivo  # Adiciona o nome do arquivo
-        }])
-        df = pd.concat([df, nova_linha], ignore_index=True)
-        df.to_excel(caminho_planilha, index=False)
-    
-    def main(file_path, pdf_file, caminho_planilha):
-        texto_pypdf = extrair_texto(pdf_file)
-        if not texto_pypdf:
-            print(f"Erro ao extrair texto do PDF: {pdf_file}")
-            return
-    
-        extrator = ExtratorFaturas()
-        informacoes = extrator.extrair_informacoes(texto_pypdf)
-        if not any(informacoes.values()):
-            print(f"Nenhuma informação extraída do PDF: {pdf_file}")
-            return
-    
-        adicionar_na_planilha(informacoes, caminho_planilha, os.path.basename(pdf_file))
-        #print(informacoes)
-    
-    # Exemplo de uso
-    file_path = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Faturas'
-    diretorio_destino = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Lidos'
-    caminho_planilha = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\informacoes_faturas.xlsx'
-    
-    for arquivo in os.listdir(file_path):
-        if arquivo.endswith('.pdf') or arquivo.endswith('.PDF'):
-            arquivo_full = rf'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Faturas\{arquivo}' 
-            main(arquivo, arquivo_full, caminho_planilha)
-
-
-
+    return not df_filtrado.empty
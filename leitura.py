@@ -0,0 +1,29 @@
+import io
+import contextlib
+
+# ORIGEM DOS BYTES DE UMA FATURA
+# Os leitores (main.py, mainxml.py) recebem o caminho do arquivo ou um ArquivoEmMemoria,
+# com o conteúdo já lido por inteiro (modo assíncrono, lote_async.py): com a pasta em um
+# compartilhamento de rede, o arquivo é buscado uma vez só e lido da memória por todos os extratores.
+
+
+class ArquivoEmMemoria(io.BytesIO):
+    def __init__(self, caminho, conteudo):
+        super().__init__(conteudo)
+        self.caminho = caminho
+
+    def __str__(self):
+        # As mensagens dos leitores continuam mostrando o caminho
+        return self.caminho
+
+
+def abrir_binario(fonte):
+    # Caminho -> arquivo aberto; ArquivoEmMemoria -> o próprio buffer, do início (e sem fechar ao sair do 'with')
+    if isinstance(fonte, ArquivoEmMemoria):
+        fonte.seek(0)
+        return contextlib.nullcontext(fonte)
+    return open(fonte, 'rb')
+
+
+def caminho_de(fonte):
+    return fonte.caminho if isinstance(fonte, ArquivoEmMemoria) else fonte
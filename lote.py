@@ -0,0 +1,283 @@
+import os
+import time
+import shutil
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+import metricas
+from armazenamento import abrir_livro
+from cache import CacheExtracao
+from extratores import extrair_faturas, faturas_para_linhas
+
+# PROCESSAMENTO EM LOTE DA PASTA DE FATURAS
+# A extração e a validação rodam em paralelo em um pool de processos (um bloco de arquivos por tarefa).
+# O processo principal é o único escritor: recebe as Faturas na ordem dos arquivos e, a cada
+# config.tamanho_lote, converte o lote de uma vez, checa duplicados, grava no livro e só então
+# move os arquivos para Lidos. PDF, NF-e e OCR passam todos por este mesmo escritor.
+# Os movimentos de cada lote ficam no diário do livro, gravado na mesma transação das faturas:
+# uma execução interrompida entre o commit e os movimentos é retomada na próxima (ou desfeita
+# com --desfazer), sem ler os arquivos de novo.
+# A memória não cresce com o tamanho da pasta: só alguns blocos ficam em extração à frente do
+# escritor, e as faturas saem de cada arquivo (PDF com várias faturas, lote de NF-e) uma a uma.
+
+# Arquivos que nunca são faturas (temporários de cópia, atalhos do Windows); o formato dos
+# demais é identificado pelo conteúdo em extratores.py
+_IGNORADOS = ('.tmp', '.part', '.crdownload', '.ini', '.db', '.lnk')
+
+_cache = None     # cache de extração do processo de trabalho (um por processo)
+_dono_cache = None  # thread que abriu o _cache: só ela pode fechar a conexão SQLite
+_formatos = None  # extratores aceitos (None aceita todos)
+_pasta_cprofile = None  # pasta dos .prof (cProfile) por arquivo, com --profile
+
+
+def iniciar_processo(caminho_cache, formatos=None, pasta_cprofile=None):
+    global _cache, _dono_cache, _formatos, _pasta_cprofile
+    if multiprocessing.parent_process() is not None:
+        metricas.coletar()  # com fork, o processo de trabalho herda o que o principal já tinha medido
+    elif _cache is not None and _dono_cache == threading.get_ident():
+        # Processo que atende vários comandos (cli.py servidor): o cache do comando anterior é fechado.
+        # No processo de trabalho a conexão herdada pelo fork é do principal e não é fechada aqui.
+        # Um cache aberto por outra thread (a de extração do lote_async.py com workers=1) só é
+        # descartado: o sqlite3 não deixa fechá-lo daqui, e a conexão fecha quando for coletada
+        _cache.fechar()
+    _cache = CacheExtracao(caminho_cache, config.cache_limite_bytes) if caminho_cache else None
+    _dono_cache = threading.get_ident()
+    _formatos = formatos
+    _pasta_cprofile = pasta_cprofile
+
+
+def extrair_arquivo(caminho, conteudo=None):
+    # Roda no processo de trabalho: devolve as Faturas do arquivo, quantas foram recusadas
+    # e as métricas medidas durante a leitura, para o processo principal juntar.
+    # Com workers=1 (ou na thread do lote_async.py) roda no próprio processo principal: as medições
+    # já estão onde devem ficar e não há nada a juntar (coletar() aqui levaria tudo o que o processo
+    # mediu até agora, a cada arquivo).
+    # 'conteudo': bytes já lidos pelo modo assíncrono (lote_async.py)
+    inicio = time.perf_counter()
+    with metricas.medir_cprofile(metricas.caminho_cprofile(_pasta_cprofile, caminho)):
+        faturas, recusadas = extrair_faturas(caminho, _cache, _formatos, conteudo)
+    medido = metricas.coletar() if multiprocessing.parent_process() is not None else metricas.vazio()
+    medido['segundos'] = time.perf_counter() - inicio
+    return caminho, faturas, recusadas, medido
+
+
+def extrair_bloco(caminhos):
+    return [extrair_arquivo(caminho) for caminho in caminhos]
+
+
+def extrair_em_janela(executor, arquivos, workers):
+    # Como executor.map (resultados na ordem dos arquivos, em blocos para reduzir o custo de IPC),
+    # mas com no máximo dois blocos por processo submetidos de cada vez: executor.map submete a pasta
+    # inteira e os resultados prontos se acumulam à frente do escritor
+    tamanho_bloco = max(1, min(config.tamanho_lote, len(arquivos) // (workers * 4)))
+    janela = deque()
+    for inicio in range(0, len(arquivos), tamanho_bloco):
+        janela.append(executor.submit(extrair_bloco, arquivos[inicio:inicio + tamanho_bloco]))
+        if len(janela) >= workers * 2:
+            yield from janela.popleft().result()
+    while janela:
+        yield from janela.popleft().result()
+
+
+def eh_candidato(nome):
+    return not nome.startswith(('.', '~$')) and not nome.lower().endswith(_IGNORADOS)
+
+
+def listar_faturas(pasta):
+    return sorted(
+        os.path.join(pasta, arquivo) for arquivo in os.listdir(pasta)
+        if eh_candidato(arquivo) and os.path.isfile(os.path.join(pasta, arquivo))
+    )
+
+
+def listar_novas(livro, pasta):
+    # Arquivos da pasta menos os que já estão gravados, esperando no diário o movimento para Lidos
+    # (um movimento que falhou): não são lidos de novo nem contados como duplicados
+    pendentes = {origem for _, origem, _ in livro.movimentos_pendentes()}
+    return [caminho for caminho in listar_faturas(pasta) if caminho not in pendentes]
+
+
+@metricas.cronometrar('mover')
+def mover_arquivo(origem, destino):
+    shutil.move(origem, destino)
+    print(f"Arquivo movido para {destino}")
+
+
+def mover_pendente(origem, destino):
+    # Um movimento do diário: se a origem já não existe, ele foi feito antes da interrupção.
+    # Devolve False se o movimento falhou (PDF aberto por alguém, compartilhamento fora do ar):
+    # a entrada fica no diário e é tentada de novo no próximo lote ou na próxima execução
+    try:
+        if os.path.exists(origem):
+            mover_arquivo(origem, destino)
+        elif not os.path.exists(destino):
+            print(f"Arquivo {origem} não encontrado para mover; o registro continua no livro")
+    except OSError as e:
+        print(f"Não foi possível mover {origem} para {destino}: {e}. O movimento fica pendente.")
+        metricas.contar('movimentos_adiados')
+        return False
+    return True
+
+
+def aplicar_movimentos(livro):
+    # Move os arquivos anotados no diário (do lote recém-gravado ou de uma execução interrompida)
+    # e só então dá baixa nas entradas que foram movidas
+    concluidos = [fatura_id for fatura_id, origem, destino in livro.movimentos_pendentes() if mover_pendente(origem, destino)]
+    livro.concluir_movimentos(concluidos)
+    return len(concluidos)
+
+
+def desfazer_pendentes(livro):
+    # Desfaz os lotes interrompidos: os arquivos já movidos voltam para a pasta de origem
+    # e as faturas saem do livro, para serem lidas de novo na próxima execução
+    pendentes = livro.movimentos_pendentes()
+    for _, origem, destino in pendentes:
+        if os.path.exists(destino) and not os.path.exists(origem):
+            mover_arquivo(destino, origem)
+    return livro.desfazer_movimentos([fatura_id for fatura_id, _, _ in pendentes])
+
+
+class EscritorLote:
+    # Acumula as Faturas e grava a cada 'tamanho_lote'; 'resumo' conta o que aconteceu com cada arquivo.
+    # Com mover=False os movimentos ficam no diário para quem chamou (lote_async.py os faz em paralelo)
+    def __init__(self, livro, diretorio_destino, tamanho_lote=None, mover=True):
+        self.livro = livro
+        self.diretorio_destino = diretorio_destino
+        self.tamanho_lote = tamanho_lote or config.tamanho_lote
+        self.mover = mover
+        self.resumo = {'inseridos': 0, 'duplicados': 0, 'falhas': 0}
+        self.pendentes = []  # (fatura, caminho de origem, se o arquivo vai para Lidos)
+        self.lotes = 0       # lotes já gravados
+
+    def adicionar_arquivo(self, faturas, origem, recusadas=0):
+        # Um arquivo pode trazer várias Faturas. Sem nenhuma, ou com alguma recusada por campo faltando,
+        # o arquivo conta como falha e fica em Faturas: as válidas são gravadas sem movimento no diário,
+        # e a recusada não some junto com o arquivo
+        if not faturas or recusadas:
+            self.adicionar(None, origem)
+        for fatura in faturas:
+            self.adicionar(fatura, origem, mover=not recusadas)
+
+    def adicionar(self, fatura, origem, mover=True):
+        if fatura is None:
+            self.resumo['falhas'] += 1
+            metricas.contar('falhas')
+            return
+        self.pendentes.append((fatura, origem, mover))
+        if len(self.pendentes) >= self.tamanho_lote:
+            self.gravar()
+
+    def gravar(self):
+        # Converte o lote inteiro e grava em uma transação, junto com o diário dos movimentos;
+        # o livro recusa os duplicados e só os arquivos gravados são movidos, depois do commit
+        if not self.pendentes:
+            return
+        with metricas.medir('conversao'):
+            linhas = faturas_para_linhas([fatura for fatura, _, _ in self.pendentes])
+        movimentos = [(origem, os.path.join(self.diretorio_destino, linha['Nome do Arquivo'])) if mover else None
+                      for linha, (_, origem, mover) in zip(linhas, self.pendentes)]
+        with metricas.medir('gravacao'):
+            gravadas = self.livro.inserir_novas(linhas, movimentos)
+        for (_, origem, _), gravada in zip(self.pendentes, gravadas):
+            if not gravada:
+                print(f"Registro duplicado encontrado para o arquivo {os.path.basename(origem)}. Não será inserido.")
+                self.resumo['duplicados'] += 1
+                metricas.contar('duplicados')
+        self.pendentes.clear()
+        self.lotes += 1
+        movidas = sum(gravadas)
+        if movidas:
+            print(f"{movidas} registros gravados no livro '{self.livro.caminho_banco}'")
+            if self.mover:
+                aplicar_movimentos(self.livro)
+        self.resumo['inseridos'] += movidas
+        metricas.contar('inseridos', movidas)
+
+
+def gravar_resultados(resultados, livro, diretorio_destino, tamanho_lote=None):
+    # Escritor único: consome os resultados de extrair_arquivo em ordem e grava em lotes
+    escritor = EscritorLote(livro, diretorio_destino, tamanho_lote)
+    for caminho, faturas, recusadas, medido in resultados:
+        metricas.juntar(medido)
+        metricas.registrar_arquivo(caminho, medido['segundos'])
+        escritor.adicionar_arquivo(faturas, caminho, recusadas)
+    escritor.gravar()
+    return escritor.resumo
+
+
+def podar_cache(caminho_cache):
+    # Mantém o cache de extração dentro de config.cache_limite_bytes (no fim de cada lote e,
+    # no monitor, depois de cada rodada com arquivos lidos)
+    if not caminho_cache:
+        return 0
+    with CacheExtracao(caminho_cache, config.cache_limite_bytes) as cache:
+        return cache.podar()
+
+
+def processar_lote(pasta, workers=None, diretorio_destino=None, caminho_banco=None, caminho_cache=None, formatos=None, pasta_cprofile=None):
+    diretorio_destino = diretorio_destino or config.diretorio_destino
+    caminho_banco = caminho_banco or config.caminho_banco
+    caminho_cache = config.caminho_cache if caminho_cache is None else caminho_cache
+    workers = workers or os.cpu_count() or 1
+    if pasta_cprofile:
+        os.makedirs(pasta_cprofile, exist_ok=True)
+
+    with abrir_livro(caminho_banco) as livro:
+        retomados = aplicar_movimentos(livro)
+        if retomados:
+            print(f"{retomados} movimentos pendentes de uma execução interrompida foram concluídos")
+        arquivos = listar_novas(livro, pasta)
+        if workers == 1 or len(arquivos) <= 1:
+            iniciar_processo(caminho_cache, formatos, pasta_cprofile)
+            resumo = gravar_resultados(map(extrair_arquivo, arquivos), livro, diretorio_destino)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=iniciar_processo, initargs=(caminho_cache, formatos, pasta_cprofile)) as executor:
+                resultados = extrair_em_janela(executor, arquivos, workers)
+                resumo = gravar_resultados(resultados, livro, diretorio_destino)
+
+    podar_cache(caminho_cache)
+    if pasta_cprofile:
+        metricas.manter_cprofile_dos_mais_lentos(pasta_cprofile)
+    return resumo
+
+
+def principal(argv=None):
+    parser = argparse.ArgumentParser(description='Processa em paralelo a pasta de faturas')
+    parser.add_argument('pasta', nargs='?', default=config.diretorio_faturas)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--destino', default=config.diretorio_destino)
+    parser.add_argument('--banco', default=config.caminho_banco, help='caminho do livro SQLite ou URL do SQLAlchemy')
+    parser.add_argument('--cache', default=config.caminho_cache, help="caminho do cache de extração ('' desativa)")
+    parser.add_argument('--formatos', nargs='+', default=None, metavar='FORMATO', help="só os extratores citados (ex.: 'nfe'); os outros arquivos contam como falha")
+    parser.add_argument('--resumo', default=config.caminho_resumo, help='grava o resumo da execução (tempos por etapa e contadores) neste JSON')
+    parser.add_argument('--profile', nargs='?', const='cprofile', default=None, metavar='PASTA',
+                        help='mede cada arquivo com cProfile e guarda os .prof dos mais lentos na PASTA')
+    parser.add_argument('--desfazer', action='store_true',
+                        help='desfaz os lotes de uma execução interrompida (tira as faturas do livro e devolve os arquivos) e sai')
+    args = parser.parse_args(argv)
+
+    if args.desfazer:
+        with abrir_livro(args.banco) as livro:
+            desfeitas = desfazer_pendentes(livro)
+        print(f"{desfeitas} faturas de lotes interrompidos foram retiradas do livro")
+        return
+
+    inicio = time.perf_counter()
+    resumo = processar_lote(args.pasta, workers=args.workers, diretorio_destino=args.destino, caminho_banco=args.banco,
+                            caminho_cache=args.cache, formatos=args.formatos, pasta_cprofile=args.profile)
+    duracao = time.perf_counter() - inicio
+    print(f"Lote concluído: {resumo['inseridos']} inseridos, {resumo['duplicados']} duplicados, {resumo['falhas']} com falha")
+    metricas.imprimir()
+    if args.resumo:
+        metricas.salvar_resumo(args.resumo, pasta=args.pasta, workers=args.workers, duracao_s=round(duracao, 3), **resumo)
+        print(f"Resumo da execução gravado em {args.resumo}")
+    if args.profile:
+        print(f"cProfile dos arquivos mais lentos em {args.profile}")
+
+
+if __name__ == '__main__':
+    principal()
@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import config
+import lote
+import metricas
+from armazenamento import abrir_livro
+
+# PROCESSAMENTO EM LOTE ASSÍNCRONO (PASTAS NA REDE)
+# Com Faturas e Lidos no G:, cada listdir/open/move espera a latência do compartilhamento.
+# Aqui os arquivos são buscados da rede em paralelo (até config.leituras_simultaneas de uma vez),
+# extraídos da memória no pool de processos (lote.extrair_arquivo com o conteúdo já lido) e
+# gravados pelo mesmo EscritorLote do lote.py, em uma thread só dele. Os arquivos de cada lote
+# gravado vão para Lidos em paralelo, enquanto os próximos são buscados e extraídos.
+# O resultado (livro, diário de movimentos, Lidos) é o mesmo do lote.py.
+
+
+def ler_conteudo(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return arquivo.read()
+
+
+class MovimentosParalelos:
+    # Move para Lidos os arquivos anotados no diário, vários ao mesmo tempo, sem travar a leitura
+    def __init__(self, livro, no_escritor, simultaneos):
+        self.livro = livro
+        self.no_escritor = no_escritor  # o livro só é usado pela thread do escritor
+        self.semaforo = asyncio.Semaphore(simultaneos)
+        self.em_andamento = set()       # fatura_id dos movimentos já agendados
+        self.tarefas = set()
+
+    def agendar(self):
+        tarefa = asyncio.ensure_future(self._mover_pendentes())
+        self.tarefas.add(tarefa)
+        tarefa.add_done_callback(self.tarefas.discard)
+
+    async def _mover_pendentes(self):
+        pendentes = [movimento for movimento in await self.no_escritor(self.livro.movimentos_pendentes)
+                     if movimento[0] not in self.em_andamento]
+        ids = [fatura_id for fatura_id, _, _ in pendentes]
+        self.em_andamento.update(ids)
+        movidos = await asyncio.gather(*(self._mover(origem, destino) for _, origem, destino in pendentes))
+        # Os movimentos que falharam ficam no diário: são tentados de novo no próximo lote ou na próxima execução
+        await self.no_escritor(self.livro.concluir_movimentos, [fatura_id for fatura_id, movido in zip(ids, movidos) if movido])
+        self.em_andamento.difference_update(ids)
+
+    async def _mover(self, origem, destino):
+        async with self.semaforo:
+            return await asyncio.to_thread(lote.mover_pendente, origem, destino)
+
+    async def esperar(self):
+        while self.tarefas:
+            await asyncio.gather(*self.tarefas)
+
+
+async def processar_lote_async(pasta, workers=None, diretorio_destino=None, caminho_banco=None, caminho_cache=None, formatos=None, leituras=None):
+    diretorio_destino = diretorio_destino or config.diretorio_destino
+    caminho_banco = caminho_banco or config.caminho_banco
+    caminho_cache = config.caminho_cache if caminho_cache is None else caminho_cache
+    workers = workers or os.cpu_count() or 1
+    leituras = leituras or config.leituras_simultaneas
+
+    loop = asyncio.get_running_loop()
+    # Threads para as esperas pela rede (leituras e movimentos) e uma só para o livro
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=leituras + config.movimentos_simultaneos))
+    gravacao = ThreadPoolExecutor(max_workers=1)
+    if workers > 1:
+        extracao = ProcessPoolExecutor(max_workers=workers, initializer=lote.iniciar_processo, initargs=(caminho_cache, formatos))
+    else:
+        extracao = ThreadPoolExecutor(max_workers=1, initializer=lote.iniciar_processo, initargs=(caminho_cache, formatos))
+
+    def no_escritor(funcao, *argumentos):
+        return loop.run_in_executor(gravacao, funcao, *argumentos)
+
+    semaforo = asyncio.Semaphore(leituras)
+
+    async def buscar_e_extrair(caminho):
+        async with semaforo:
+            try:
+                with metricas.medir('leitura_rede'):
+                    conteudo = await asyncio.to_thread(ler_conteudo, caminho)
+            except OSError:
+                conteudo = None  # extrair_faturas tenta de novo pelo disco e registra o erro
+        return await loop.run_in_executor(extracao, lote.extrair_arquivo, caminho, conteudo)
+
+    livro = await no_escritor(abrir_livro, caminho_banco)
+    janela = deque()
+    try:
+        retomados = await no_escritor(lote.aplicar_movimentos, livro)
+        if retomados:
+            print(f"{retomados} movimentos pendentes de uma execução interrompida foram concluídos")
+        arquivos = await no_escritor(lote.listar_novas, livro, pasta)
+        escritor = lote.EscritorLote(livro, diretorio_destino, mover=False)
+        movimentos = MovimentosParalelos(livro, no_escritor, config.movimentos_simultaneos)
+
+        async def consumir(tarefa):
+            caminho, faturas, recusadas, medido = await tarefa
+            metricas.juntar(medido)
+            metricas.registrar_arquivo(caminho, medido['segundos'])
+            lotes = escritor.lotes
+            await no_escritor(escritor.adicionar_arquivo, faturas, caminho, recusadas)
+            if escritor.lotes != lotes:
+                movimentos.agendar()
+
+        # Os resultados são gravados na ordem da pasta, como no lote.py (o primeiro de dois
+        # duplicados é o que entra); a janela limita quantos arquivos ficam em memória à frente do escritor
+        for caminho in arquivos:
+            janela.append(asyncio.ensure_future(buscar_e_extrair(caminho)))
+            if len(janela) >= 2 * leituras:
+                await consumir(janela.popleft())
+        while janela:
+            await consumir(janela.popleft())
+        lotes = escritor.lotes
+        await no_escritor(escritor.gravar)
+        if escritor.lotes != lotes:
+            movimentos.agendar()
+        await movimentos.esperar()
+        resumo = escritor.resumo
+    finally:
+        for tarefa in janela:
+            tarefa.cancel()
+        extracao.shutdown(cancel_futures=True)
+        await no_escritor(livro.fechar)
+        gravacao.shutdown()
+
+    lote.podar_cache(caminho_cache)
+    return resumo
+
+
+def processar_lote_assincrono(pasta, **opcoes):
+    return asyncio.run(processar_lote_async(pasta, **opcoes))
+
+
+def principal(argv=None):
+    parser = argparse.ArgumentParser(description='Processa a pasta de faturas buscando os arquivos da rede em paralelo')
+    parser.add_argument('pasta', nargs='?', default=config.diretorio_faturas)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--leituras', type=int, default=config.leituras_simultaneas, help='arquivos buscados da rede ao mesmo tempo')
+    parser.add_argument('--destino', default=config.diretorio_destino)
+    parser.add_argument('--banco', default=config.caminho_banco, help='caminho do livro SQLite ou URL do SQLAlchemy')
+    parser.add_argument('--cache', default=config.caminho_cache, help="caminho do cache de extração ('' desativa)")
+    parser.add_argument('--resumo', default=config.caminho_resumo, help='grava o resumo da execução (tempos por etapa e contadores) neste JSON')
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    resumo = processar_lote_assincrono(args.pasta, workers=args.workers, leituras=args.leituras, diretorio_destino=args.destino,
+                                       caminho_banco=args.banco, caminho_cache=args.cache)
+    duracao = time.perf_counter() - inicio
+    print(f"Lote concluído: {resumo['inseridos']} inseridos, {resumo['duplicados']} duplicados, {resumo['falhas']} com falha")
+    metricas.imprimir()
+    if args.resumo:
+        metricas.salvar_resumo(args.resumo, pasta=args.pasta, workers=args.workers, leituras=args.leituras, duracao_s=round(duracao, 3), **resumo)
+        print(f"Resumo da execução gravado em {args.resumo}")
+
+
+if __name__ == '__main__':
+    principal()
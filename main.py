@@ -1,37 +1,52 @@
-import os
-import PyPDF2
 import re
-import pandas as pd
-from openpyxl import load_workbook
-import shutil
 import xml.etree.ElementTree as ET
 
-DIST = 'Cegás'
+import config
+import metricas
+import perfis
+from leitura import abrir_binario
+
+VERSAO_EXTRATOR = '4'  # Aumente ao mudar a leitura do texto: invalida o cache de extração
+
+# As expressões de cada campo ficam nos perfis de distribuidora (perfis.py), compiladas uma única vez;
+# estas são as do leiaute da Cegás
+REGEXES = perfis.CEGAS.regexes
+PADROES = perfis.CEGAS.padroes
+
+# Quebras de linha e sequências de espaços viram um único espaço (em uma só substituição)
+_ESPACOS = re.compile(r'\s{2,}|\n')
+
+# Chave de acesso impressa no DANFE: 44 dígitos em grupos de 4 (ex.: '2324 1173 7591 ... 4387').
+# É a mesma do infNFe/@Id do XML, então o PDF e o XML da mesma nota caem na mesma chave 'nfe:'
+# do índice de duplicados. O leiaute é nacional: não depende do perfil da distribuidora
+PADRAO_CHAVE_ACESSO = re.compile(r'(?<!\d)(\d{4}(?: \d{4}){10})(?!\d)')
+_MODELOS_NFE = ('55', '65')
+
+def chave_acesso(texto):
+    # Primeira chave de acesso de NF-e no texto (só dígitos), ou ''
+    for encontrado in PADRAO_CHAVE_ACESSO.finditer(texto):
+        chave = encontrado.group(1).replace(' ', '')
+        if chave[20:22] in _MODELOS_NFE:  # posição do modelo do documento na chave
+            return chave
+    return ''
 
 class ExtratorFaturas:
-    def __init__(self):
-        self.regexes = {
-            'cnpj': [r'(\d{2}\.\d{3}\.?\d{3}\/?\d{4}\-?\s?\d{2})\s+\d{2}\/\d{2}\/\d{4}'], #26/09
-            'valor_total': [r'-?(\d+\.?\d+\,\d{2})\s\d{2}\/\d{2}\/\d{4}'], #26/09
-            'volume_total': [r'M3\s(\d+\.?\,?\d+\.?\,?\d+)\s?'], #26/09
-            'data_emissao': [r'[A]\s(\d{2}\/\d{2}\/\d{4})'], #05/11
-            'data_inicio': [r'DE\s(\d{2}\/\d{2}\/\d{4})\s'], #26/09
-            'data_fim': [r'[A-a]\s(\d{2}\/\d{2}\/\d{4})'], #26/09            
-            'numero_fatura': [r'Nº\s(\d+\.?\d+\.?\d+)\s'], #26/09
-            'valor_icms': [r'\,\d+\s(\d+\d+\,\.?\d+)\s[0]'], #05/12    
-            'correcao_pcs': [r'R\d+\s(\d+)\s*', r'T\d+\s(\d+)\s*'] # DIVIDIR ESSA MERDA POR 9400 E PEGAR 4 CASAS DECIMAIS APÓS O 0.
-        }
+    def __init__(self, perfil=None):
+        perfil = perfil or perfis.padrao()
+        self.regexes = perfil.padroes
+        self.divisor_pcs = perfil.divisor_pcs
 
+    @metricas.cronometrar('regex')
     def extrair_informacoes(self, texto):
         informacoes = {}
-        for chave, regex_list in self.regexes.items():
-            for regex in regex_list:
-                match = re.search(regex, texto)
+        for chave, padroes in self.regexes.items():
+            for padrao in padroes:
+                match = padrao.search(texto)
                 if match:
                     valor = match.group(1) if match.groups() else match.group(0)
-                    if chave == 'correcao_pcs':
+                    if chave == 'correcao_pcs' and self.divisor_pcs:
                         try:
-                            valor = float(valor) / 9400
+                            valor = float(valor) / self.divisor_pcs
                             valor = f"{valor:.4f}"
                         except ValueError:
                             valor = ''
@@ -39,32 +54,90 @@ class ExtratorFaturas:
                     break  # Para de procurar assim que encontrar uma correspondência
         return informacoes
 
-def extrair_texto(caminho_do_pdf):
-    texto = ''
+def campos_definidos(texto, padroes=None):
+    # Verdadeiro quando todos os campos já casaram com o primeiro padrão da sua lista:
+    # ler mais páginas não mudaria o resultado de extrair_informacoes
+    return all(lista[0].search(texto) for lista in (padroes or PADROES).values())
+
+# Leitores de texto de PDF: cada um devolve o texto das páginas pedidas, uma a uma e sob demanda.
+# O padrão é o PyPDF2 (config.backend_pdf). Todos são importados só na primeira página lida:
+# quem só lê NF-e (ou só importa este módulo) não paga a importação de nenhum leitor de PDF.
+def _paginas_pypdf2(arquivo, paginas):
+    import PyPDF2
+
+    leitor_pdf = PyPDF2.PdfReader(arquivo)
+    total = len(leitor_pdf.pages)
+    for indice in (range(total) if paginas is None else paginas):
+        if indice < total:
+            yield leitor_pdf.pages[indice].extract_text()
+
+def _paginas_pypdfium2(arquivo, paginas):
+    import pypdfium2
+
+    documento = pypdfium2.PdfDocument(arquivo)
+    try:
+        total = len(documento)
+        for indice in (range(total) if paginas is None else paginas):
+            if indice < total:
+                yield documento[indice].get_textpage().get_text_range()
+    finally:
+        documento.close()
+
+def _paginas_pymupdf(arquivo, paginas):
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=arquivo.read(), filetype='pdf') as documento:
+        total = documento.page_count
+        for indice in (range(total) if paginas is None else paginas):
+            if indice < total:
+                yield documento[indice].get_text()
+
+BACKENDS_PDF = {
+    'pypdf2': _paginas_pypdf2,
+    'pypdfium2': _paginas_pypdfium2,
+    'pymupdf': _paginas_pymupdf,
+}
+
+def paginas_texto(caminho_do_pdf, paginas=None, backend=None):
+    # Texto normalizado de cada página com texto, sob demanda: só a página atual fica em memória
+    backend = backend or config.backend_pdf
+    with abrir_binario(caminho_do_pdf) as arquivo:
+        for texto_pagina in BACKENDS_PDF[backend](arquivo, paginas):
+            if texto_pagina:
+                yield _ESPACOS.sub(' ', texto_pagina).strip()
+
+@metricas.cronometrar('leitura_pdf')
+def extrair_texto(caminho_do_pdf, paginas=None, parar_quando=None, backend=None):
+    # paginas: índices (a partir de 0) a ler, na ordem; None lê todas.
+    # parar_quando: função chamada com o texto acumulado após cada página; se devolver True, a leitura para.
+    paginas_lidas = []
     try:
-        with open(caminho_do_pdf, 'rb') as arquivo:
-            leitor_pdf = PyPDF2.PdfReader(arquivo)
-            for pagina in leitor_pdf.pages:
-                texto_pagina = pagina.extract_text()
-                if texto_pagina:
-                    texto_pagina = texto_pagina.replace('\n', ' ')
-                    texto_pagina = re.sub(r'\s{2,}', ' ', texto_pagina).strip()
-                    texto += texto_pagina + ' '
+        for texto_pagina in paginas_texto(caminho_do_pdf, paginas, backend):
+            paginas_lidas.append(texto_pagina)
+            if parar_quando is not None and parar_quando(' '.join(paginas_lidas) + ' '):
+                break
+    except ImportError:
+        raise  # backend escolhido em config.backend_pdf não está instalado
     except Exception as e:
         print(f"Erro ao ler o PDF: {e}")
     
+    texto = ' '.join(paginas_lidas)
     if not texto:
         print(f"Erro ao extrair texto do PDF: {caminho_do_pdf}")
     else:
         print(f"Texto extraído com sucesso...")  # Mostra os primeiros 900 caracteres do texto extraído
     return texto.strip()  # Remove espaços extras no início e no fim
 
+@metricas.cronometrar('leitura_xml')
 def extrair_texto_xml(caminho_do_xml):
     texto = ''
     try:
-        tree = ET.parse(caminho_do_xml)
+        with abrir_binario(caminho_do_xml) as arquivo:
+            tree = ET.parse(arquivo)
         root = tree.getroot()
         texto = ET.tostring(root, encoding='unicode', method='text')
+    except OSError:
+        raise  # falha de leitura, não do XML: extratores.py registra e não guarda no cache
     except Exception as e:
         print(f"Erro ao ler o XML: {e}")
     
@@ -74,96 +147,66 @@ def extrair_texto_xml(caminho_do_xml):
         print(f"Texto extraído com sucesso do XML...")
     return texto.strip()
 
-def registro_existe(df, cnpj, data_inicio, data_fim, valor_total):
-    return not df[(df['CNPJ'] == cnpj) & (df['Data Início'] == data_inicio) & (df['Data Fim'] == data_fim) & (df['Valor Total'] == valor_total)].empty
-
-def adicionar_na_planilha(informacoes, caminho_planilha, nome_arquivo):
+def _informacoes_do_texto(texto, perfil):
+    informacoes = ExtratorFaturas(perfil).extrair_informacoes(texto)
+    informacoes['distribuidora'] = perfil.distribuidora
+    chave = chave_acesso(texto)
+    if chave:
+        informacoes['chave_acesso'] = chave
+    return informacoes
+
+# Campos que só aparecem em página de fatura: páginas finais sem nenhum deles não são uma fatura cortada
+_CAMPOS_DE_FATURA = ('cnpj', 'numero_fatura')
+
+@metricas.cronometrar('leitura_pdf')
+def ler_faturas(file, perfil=None, varias=None):
+    # Lê o PDF página a página e aplica as regex do perfil da distribuidora; devolve a lista de faturas
+    # (dicionários 'informacoes'), ou [] se não houver texto (o registro em extratores.py tenta então o OCR).
+    # Sem perfil (o nome do arquivo não diz a distribuidora), vale o do CNPJ do emitente encontrado no texto.
+    # A fatura fecha na página em que todos os campos estão definidos. Com 'varias'
+    # (config.varias_faturas_por_pdf) a leitura continua e as páginas seguintes formam a próxima fatura:
+    # um PDF com centenas de faturas é lido guardando só o texto da fatura em andamento.
+    # Páginas no fim que não completam uma fatura viram uma fatura incompleta (recusada depois, com o
+    # arquivo) se tiverem o CNPJ ou o número da fatura; sem nenhum dos dois (verso) ficam de fora.
+    # Se nenhuma fatura completar, as regex vão sobre o texto todo e os campos que faltarem são apontados depois.
+    varias = config.varias_faturas_por_pdf if varias is None else varias
+    faturas = []
+    atual = []  # páginas da fatura em andamento
     try:
-        df = pd.read_excel(caminho_planilha)
-    except FileNotFoundError:
-        print(f"O arquivo '{caminho_planilha}' não foi encontrado. Criando um novo.")
-        df = pd.DataFrame(columns=['CNPJ', 'Valor Total', 'Volume Total', 'Data Emissão', 'Data Início', 'Data Fim', 'Número Fatura', 'Valor ICMS', 'Correção PCS', 'Distribuidora', 'Nome do Arquivo'])
-    
-    cnpj = informacoes['cnpj']
-    data_inicio = informacoes['data_inicio']
-    data_fim = informacoes['data_fim']
-    valor_total = pd.to_numeric(informacoes['valor_total'].replace('.', '').replace(',', '.'))
-    volume_total = pd.to_numeric(informacoes['volume_total'].replace('.', '').replace(',', '.'))
-    valor_icms = pd.to_numeric(informacoes['valor_icms'].replace('.', '').replace(',', '.'))
-
-    if registro_existe(df, cnpj, data_inicio, data_fim, valor_total):
-        print(f"Registro duplicado encontrado para CNPJ: {cnpj}, Data Início: {data_inicio}, Data Fim: {data_fim}, Valor Total: {valor_total}. Não será inserido.")
-        return False 
-
-    # Converte os valores para numéricos
-    valor_total = pd.to_numeric(str(informacoes.get('valor_total', '')).replace('.', '').replace(',', '.'), errors='coerce')
-    volume_total = pd.to_numeric(str(informacoes.get('volume_total', '')).replace('.', '').replace(',', '.'), errors='coerce')
-    valor_icms = pd.to_numeric(str(informacoes.get('valor_icms', '')).replace('.', '').replace(',', '.'), errors='coerce')
-    correcao_pcs = pd.to_numeric(informacoes.get('correcao_pcs', ''), errors='coerce')
-    
-    nova_linha = pd.DataFrame([{
-        'CNPJ': cnpj,
-        'Valor Total': valor_total,
-        'Volume Total': volume_total,
-        'Data Emissão': informacoes.get('data_emissao', ''),
-        'Data Início': data_inicio,
-        'Data Fim': data_fim,
-        'Número Fatura': informacoes.get('numero_fatura', ''),
-        'Valor ICMS': valor_icms,
-        'Correção PCS': correcao_pcs,
-        'Distribuidora': DIST,
-        'Nome do Arquivo': nome_arquivo  # Adiciona o nome do arquivo
-    }])
-    df = pd.concat([df, nova_linha], ignore_index=True)
-    df.to_excel(caminho_planilha, index=False)
-    return True  # Indica que o registro foi inserido
-
-def mover_arquivo(origem, destino):
-    shutil.move(origem, destino)
-    print(f"Arquivo movido para {destino}")
-
-def main(file_path, file, caminho_planilha):
-    if file.lower().endswith('.pdf'):
-        texto = extrair_texto(file)
-    elif file.lower().endswith('.xml'):
-        texto = extrair_texto_xml(file)
-    else:
-        print(f"Tipo de arquivo não suportado: {file}")
-        return
-
-    if not texto:
-        print(f"Erro ao extrair texto do arquivo: {file}")
-        return
-
-    extrator = ExtratorFaturas()
-    informacoes = extrator.extrair_informacoes(texto)
-    
-    # Verifica se todos os campos foram extraídos
-    campos_necessarios = ['cnpj', 'valor_total', 'volume_total', 'data_emissao', 'data_inicio', 'data_fim', 'numero_fatura', 'valor_icms', 'correcao_pcs']
-    campos_faltantes = [campo for campo in campos_necessarios if not informacoes.get(campo)]
-    
-    if campos_faltantes:
-        print(f"Campos faltantes no arquivo {file}: {', '.join(campos_faltantes)}")
-        return
-
-    nome_arquivo = os.path.basename(file)  # Extrai apenas o nome do arquivo
-    inserido = adicionar_na_planilha(informacoes, caminho_planilha, nome_arquivo)
-    print(informacoes)
+        for texto_pagina in paginas_texto(file, config.paginas_pdf):
+            atual.append(texto_pagina)
+            texto = ' '.join(atual)
+            escolhido = perfil or perfis.do_texto(texto) or perfis.padrao()
+            if campos_definidos(texto + ' ', escolhido.padroes):
+                faturas.append(_informacoes_do_texto(texto, escolhido))
+                atual = []
+                if not varias:
+                    break
+    except (ImportError, OSError):
+        # Backend escolhido em config.backend_pdf não instalado, ou falha de leitura do arquivo
+        # (compartilhamento fora do ar, arquivo bloqueado): não é o resultado deste PDF e não vai para o cache
+        raise
+    except Exception as e:
+        print(f"Erro ao ler o PDF: {e}")
 
-    if inserido:
-        destino = os.path.join(diretorio_destino, nome_arquivo)
-        mover_arquivo(file, destino)
+    if atual:
+        texto = ' '.join(atual)
+        informacoes = _informacoes_do_texto(texto, perfil or perfis.do_texto(texto) or perfis.padrao())
+        if not faturas or any(informacoes.get(campo) for campo in _CAMPOS_DE_FATURA):
+            # Fatura incompleta: extratores.py aponta os campos faltantes e o arquivo fica em Faturas
+            faturas.append(informacoes)
+        else:
+            print(f"{len(atual)} página(s) no fim de {file} sem dados de fatura foram ignoradas")
+    if not faturas:
+        print(f"Erro ao extrair texto do PDF: {file}")
     else:
-        print('Arquivo já foi inserido na planilha. Não será movido.')
-    
-# Exemplo de uso
-file_path = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Faturas'
-diretorio_destino = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Lidos'
-caminho_planilha = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\00 Faturas Lidas\CEGAS.xlsx'
+        print(f"Texto extraído com sucesso ({len(faturas)} fatura(s))...")
+    return faturas
 
-for arquivo in os.listdir(file_path):
-    if arquivo.lower().endswith('.pdf') or arquivo.lower().endswith('.xml'):
-        arquivo_full = os.path.join(file_path, arquivo)
-        arquivo = os.path.basename(arquivo)
+if __name__ == '__main__':
+    import lote
 
-        main(file_path, arquivo_full, caminho_planilha)
\ No newline at end of file
+    # A extração, a validação e a gravação no livro passam pelo mesmo caminho do processamento em lote.
+    # A planilha CEGAS.xlsx é gerada a partir do livro com 'python armazenamento.py exportar'
+    resumo = lote.processar_lote(config.diretorio_faturas, workers=1)
+    print(f"{resumo['inseridos']} inseridos, {resumo['duplicados']} duplicados, {resumo['falhas']} com falha")
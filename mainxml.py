@@ -1,121 +1,170 @@
-import os
-import pandas as pd
-import shutil
+import re
+from functools import partial
 import xml.etree.ElementTree as ET
 
-DIST = 'Cegás'
+import config
+import metricas
+import perfis
+from leitura import abrir_binario
+
+VERSAO_EXTRATOR = '4'  # Aumente ao mudar a leitura do XML: invalida o cache de extração
 NAMESPACE = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
+_NFE = '{' + NAMESPACE['nfe'] + '}'
 
 
-def extrair_informacoes_xml(caminho_do_xml):
-    informacoes = {}
-    try:
-        tree = ET.parse(caminho_do_xml)
-        root = tree.getroot()
-        
-        # Extrair informações básicas do XML
-        informacoes['cnpj'] = root.find('.//nfe:emit/nfe:CNPJ', NAMESPACE).text
-        informacoes['valor_total'] = root.find('.//nfe:total/nfe:ICMSTot/nfe:vNF', NAMESPACE).text
-        informacoes['volume_total'] = root.find('.//nfe:det/nfe:prod/nfe:qCom', NAMESPACE).text
-        informacoes['data_emissao'] = root.find('.//nfe:ide/nfe:dhEmi', NAMESPACE).text.split('T')[0]
-        
-        inf_cpl_element = root.find('.//nfe:infAdic/nfe:infCpl', NAMESPACE)
-        inf_cpl = inf_cpl_element.text if inf_cpl_element is not None else ''
-        informacoes['data_inicio'] = inf_cpl.split(' ')[2] if inf_cpl else ''
-        informacoes['data_fim'] = inf_cpl.split(' ')[4] if inf_cpl else ''
-        
-        informacoes['numero_fatura'] = root.find('.//nfe:ide/nfe:nNF', NAMESPACE).text
-        informacoes['valor_icms'] = root.find('.//nfe:total/nfe:ICMSTot/nfe:vICMS', NAMESPACE).text
-
-        # Buscar PCS em várias localizações possíveis
-        pcs = None
-        
-        if not pcs:
-            det = root.find('.//nfe:det', NAMESPACE)
-            if det is not None:
-                for elem in det.iter():
-                    if 'PCS' in elem.tag or (elem.text and 'PCS' in elem.text):
-                        pcs = elem.text
-                        break
-        
+def _ler_det(elem, encontrados):
+    if 'volume_total' not in encontrados:
+        q_com = elem.find(f'{_NFE}prod/{_NFE}qCom')
+        if q_com is not None:
+            encontrados['volume_total'] = q_com.text
+    # Buscar PCS apenas no primeiro det
+    if 'pcs' not in encontrados:
+        encontrados['pcs'] = None
+        for filho in elem.iter():
+            if 'PCS' in filho.tag or (filho.text and 'PCS' in filho.text):
+                encontrados['pcs'] = filho.text
+                break
+
+def _ler_filhos(elem, encontrados, campos):
+    for tag, campo in campos.items():
+        if campo not in encontrados:
+            filho = elem.find(_NFE + tag)
+            if filho is not None:
+                encontrados[campo] = filho.text
+
+# Seções da NF-e lidas no evento 'end' do parser; cada uma é limpa logo depois de lida.
+# Os campos de cada seção vêm do perfil da distribuidora (perfil.campos_xml); os leitores
+# de cada perfil são montados uma vez por processo
+_SECOES = {}
+
+def secoes_xml(perfil):
+    secoes = _SECOES.get(perfil.nome)
+    if secoes is None:
+        secoes = {_NFE + secao: partial(_ler_filhos, campos=campos) for secao, campos in perfil.campos_xml.items()}
+        secoes[_NFE + 'det'] = _ler_det
+        _SECOES[perfil.nome] = secoes
+    return secoes
+
+
+# Marcadores usados para pular, ainda em bytes, o que não precisa ser analisado:
+# os det depois do primeiro (entre o primeiro </det> e <total>, só há outros det pelo leiaute
+# da NF-e) e tudo entre </infNFe> e o próximo <infNFe> (assinatura e protNFe). Um arquivo com
+# várias NF-e (lote enviNFe) passa pelas quatro etapas uma vez para cada infNFe.
+_FIM_DET = re.compile(rb'</(?:\w+:)?det>')
+_INICIO_TOTAL = re.compile(rb'<(?:\w+:)?total[\s>]')
+_FIM_INF_NFE = re.compile(rb'</(?:\w+:)?infNFe>')
+_INICIO_INF_NFE = re.compile(rb'<(?:\w+:)?infNFe[\s>]')
+_MARGEM = 32  # bytes guardados entre blocos para não partir um marcador ao meio
+
+
+def _blocos_relevantes(arquivo, tamanho_bloco):
+    marcadores = [(_FIM_DET, True), (_INICIO_TOTAL, False), (_FIM_INF_NFE, True), (_INICIO_INF_NFE, False)]
+    etapa = 0
+    buffer = b''
+    while True:
+        bloco = arquivo.read(tamanho_bloco)
+        buffer += bloco
+        while True:
+            padrao, manter = marcadores[etapa]
+            encontrado = padrao.search(buffer)
+            if not encontrado:
+                break
+            if manter:
+                yield buffer[:encontrado.end()]
+                buffer = buffer[encontrado.end():]
+            else:
+                buffer = buffer[encontrado.start():]
+            etapa = (etapa + 1) % len(marcadores)
+        # As etapas 1 e 3 descartam o que não é lido; nas outras o que sobrou é repassado ao parser
+        manter = marcadores[etapa][1]
+        if not bloco:
+            if manter:
+                yield buffer
+            return
+        if len(buffer) > _MARGEM:
+            if manter:
+                yield buffer[:-_MARGEM]
+            buffer = buffer[-_MARGEM:]
+
+
+def _eventos_xml(caminho_do_xml, tamanho_bloco=65536):
+    # Alimenta o XMLPullParser em blocos: a memória fica limitada ao bloco e às seções ainda abertas
+    parser = ET.XMLPullParser(events=('end',))
+    with abrir_binario(caminho_do_xml) as arquivo:
+        for bloco in _blocos_relevantes(arquivo, tamanho_bloco):
+            parser.feed(bloco)
+            yield from parser.read_events()
+    yield from parser.read_events()
+
+
+def documentos_xml(caminho_do_xml, perfil=None):
+    # Uma única passada pelo XML: cada seção é lida quando termina e depois descartada, e cada
+    # infNFe vira um dicionário 'informacoes' assim que fecha. Só a NF-e em andamento fica em memória,
+    # então um lote com milhares de NF-e é lido com a mesma memória de uma só
+    # (a assinatura e o protNFe nem chegam a ser analisados).
+    # Sem perfil (o nome do arquivo não diz a distribuidora), o CNPJ do emitente escolhe o perfil
+    # assim que a seção emit termina; ela vem antes de det, total e infAdic no leiaute da NF-e.
+    encontrados = {}
+    escolhido = perfil or perfis.padrao()
+    secoes = secoes_xml(escolhido)
+    for _, elem in _eventos_xml(caminho_do_xml):
+        leitor = secoes.get(elem.tag)
+        if leitor is not None:
+            leitor(elem, encontrados)
+            if perfil is None and elem.tag == _NFE + 'emit':
+                escolhido = perfis.do_cnpj(encontrados.get('cnpj_emitente')) or escolhido
+                secoes = secoes_xml(escolhido)
+            elem.clear()
+        elif elem.tag == _NFE + 'infNFe':
+            # Chave de acesso da NF-e (usada no índice de duplicados)
+            yield _montar_informacoes(encontrados, escolhido, elem.get('Id', ''))
+            elem.clear()
+            encontrados = {}
+            escolhido = perfil or perfis.padrao()
+            secoes = secoes_xml(escolhido)
+
+
+def _montar_informacoes(encontrados, escolhido, chave_acesso):
+    # Um campo que não está na NF-e fica vazio: extratores.py aponta os campos faltantes e recusa
+    # só esta NF-e, e o arquivo fica em Faturas (as outras NF-e do lote continuam sendo lidas)
+    periodo = escolhido.periodo.search(encontrados.get('inf_cpl') or '')
+    return {
+        'chave_acesso': chave_acesso,
+        'cnpj': encontrados.get('cnpj') or '',
+        'valor_total': encontrados.get('valor_total') or '',
+        'volume_total': encontrados.get('volume_total') or '',
+        'data_emissao': (encontrados.get('data_emissao') or '').split('T')[0],
+        'data_inicio': periodo.group(1) if periodo else '',
+        'data_fim': periodo.group(2) if periodo else '',
+        'numero_fatura': encontrados.get('numero_fatura') or '',
+        'valor_icms': encontrados.get('valor_icms') or '',
         # Se PCS não for encontrado, definir como '1,000'
-        if not pcs:
-            pcs = '1,000'
-        
-        informacoes['correcao_pcs'] = pcs
-
-        return informacoes
-        
-   
+        'correcao_pcs': encontrados.get('pcs') or '1,000',
+        'distribuidora': escolhido.distribuidora,
+    }
+
+
+@metricas.cronometrar('leitura_xml')
+def ler_faturas_xml(caminho_do_xml, perfil=None):
+    # Lista com as NF-e lidas do arquivo, uma por infNFe (com os campos faltantes vazios); [] se nenhuma for lida.
+    # Um XML que quebra depois da primeira NF-e ganha uma fatura vazia no lugar do resto, que é recusada:
+    # o arquivo fica em Faturas em vez de ir para Lidos com NF-e não lidas
+    faturas = []
+    try:
+        for informacoes in documentos_xml(caminho_do_xml, perfil):
+            faturas.append(informacoes)
+    except OSError:
+        raise  # falha de leitura, não do XML: extratores.py registra e não guarda no cache
     except Exception as e:
         print(f"Erro ao extrair informações do XML: {caminho_do_xml}, erro: {e}")
-        return {}
+        if faturas:
+            faturas.append({})
+    return faturas
 
-def adicionar_na_planilha(informacoes, caminho_planilha, nome_arquivo):
-    try:
-        df = pd.read_excel(caminho_planilha)
-    except FileNotFoundError:
-        print(f"O arquivo '{caminho_planilha}' não foi encontrado. Criando um novo.")
-        df = pd.DataFrame(columns=['CNPJ', 'Valor Total', 'Volume Total', 'Data Emissão', 'Data Início', 'Data Fim', 'Número Fatura', 'Valor ICMS', 'Correção PCS', 'Distribuidora', 'Nome do Arquivo'])
-
-    cnpj = informacoes['cnpj']
-    valor_total = pd.to_numeric(informacoes['valor_total'].replace('.', '').replace(',', '.'))
-    volume_total = pd.to_numeric(informacoes['volume_total'].replace('.', '').replace(',', '.'))
-    data_inicio = informacoes['data_inicio']
-    data_fim = informacoes['data_fim']
-    valor_icms = pd.to_numeric(informacoes['valor_icms'].replace('.', '').replace(',', '.'))
-    correcao_pcs = informacoes['correcao_pcs']
-
-    nova_linha = pd.DataFrame([{
-        'CNPJ': cnpj,
-        'Valor Total': valor_total,
-        'Volume Total': volume_total,
-        'Data Emissão': informacoes.get('data_emissao', ''),
-        'Data Início': data_inicio,
-        'Data Fim': data_fim,
-        'Número Fatura': informacoes.get('numero_fatura', ''),
-        'Valor ICMS': valor_icms,
-        'Correção PCS': correcao_pcs,
-        'Distribuidora': DIST,
-        'Nome do Arquivo': nome_arquivo
-    }])
-    
-    df = pd.concat([df, nova_linha], ignore_index=True)
-    df.to_excel(caminho_planilha, index=False)
-    return True
-
-def mover_arquivo(origem, destino):
-    shutil.move(origem, destino)
-    print(f"Arquivo movido para {destino}")
-
-def processar_xml(file, caminho_planilha, diretorio_destino):
-    informacoes = extrair_informacoes_xml(file)
-    
-    # Verifica se todos os campos obrigatórios foram extraídos
-    campos_obrigatorios = ['cnpj', 'valor_total', 'volume_total', 'data_emissao', 
-                           'data_inicio', 'data_fim', 'numero_fatura', 'valor_icms']
-    campos_faltantes = [campo for campo in campos_obrigatorios if not informacoes.get(campo)]
-    
-    if campos_faltantes:
-        print(f"Campos faltantes no arquivo {file}: {', '.join(campos_faltantes)}")
-        return
-
-    nome_arquivo = os.path.basename(file)
-    inserido = adicionar_na_planilha(informacoes, caminho_planilha, nome_arquivo)
-    print(informacoes)
-
-    if inserido:
-        destino = os.path.join(diretorio_destino, nome_arquivo)
-        mover_arquivo(file, destino)
-    else:
-        print('Arquivo não foi inserido na planilha devido a dados faltantes ou duplicados. Não será movido.')
-
-# Exemplo de uso
-file_path = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Faturas'
-diretorio_destino = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\Cegás\Lidos'
-caminho_planilha = r'G:\QUALIDADE\Códigos\Leitura de Faturas Gás\Códigos\00 Faturas Lidas\CEGAS.xlsx'
-
-for arquivo in os.listdir(file_path):
-    if arquivo.lower().endswith('.xml'):
-        arquivo_full = os.path.join(file_path, arquivo)
-        processar_xml(arquivo_full, caminho_planilha, diretorio_destino)
\ No newline at end of file
+if __name__ == '__main__':
+    import lote
+
+    # Só as NF-e da pasta; a gravação no livro é a mesma do processamento em lote.
+    # A planilha CEGAS.xlsx é gerada a partir do livro com 'python armazenamento.py exportar'
+    resumo = lote.processar_lote(config.diretorio_faturas, workers=1, formatos=('nfe',))
+    print(f"{resumo['inseridos']} inseridos, {resumo['duplicados']} duplicados, {resumo['falhas']} com falha")
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import heapq
+import random
+import pstats
+import cProfile
+from contextlib import contextmanager
+from functools import wraps
+
+# MÉTRICAS DA EXECUÇÃO
+# Tempos por etapa (leitura do PDF/XML, regex, OCR, hash, conversão, gravação, mover arquivo, Excel)
+# e contadores (extraídos, campos faltantes, duplicados, acertos do cache...), guardados por processo.
+# Os processos de trabalho do lote mandam o que mediram junto com cada fatura (coletar -> juntar).
+# Os tempos das etapas são inclusivos: a regex chamada dentro do OCR conta nas duas.
+# A memória não cresce com o tamanho da pasta: cada etapa guarda a contagem, o total, o máximo e
+# uma amostra de até AMOSTRA tempos (amostragem de reservatório) para os percentis.
+
+AMOSTRA = 10000
+
+_tempos = {}       # etapa -> [chamadas, total, máximo, amostra]
+_contadores = {}   # nome -> quantidade
+_mais_lentos = []  # heap de (segundos, arquivo) com os arquivos mais lentos
+
+
+def _registrar(etapa, segundos):
+    medida = _tempos.get(etapa)
+    if medida is None:
+        medida = _tempos[etapa] = [0, 0.0, 0.0, []]
+    medida[0] += 1
+    medida[1] += segundos
+    medida[2] = max(medida[2], segundos)
+    amostra = medida[3]
+    if len(amostra) < AMOSTRA:
+        amostra.append(segundos)
+    else:
+        posicao = random.randrange(medida[0])
+        if posicao < AMOSTRA:
+            amostra[posicao] = segundos
+
+
+@contextmanager
+def medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(etapa, time.perf_counter() - inicio)
+
+
+def cronometrar(etapa):
+    # Decorador: mede cada chamada da função como 'etapa'
+    def decorador(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
+
+
+def contar(nome, quantidade=1):
+    _contadores[nome] = _contadores.get(nome, 0) + quantidade
+
+
+def coletar():
+    # Devolve e zera o que foi medido neste processo
+    global _tempos, _contadores
+    medido = {'tempos': _tempos, 'contadores': _contadores}
+    _tempos, _contadores = {}, {}
+    return medido
+
+
+def vazio():
+    # O que coletar() devolve quando nada foi medido; juntar(vazio()) não faz nada
+    return {'tempos': {}, 'contadores': {}}
+
+
+def zerar():
+    # Processo que atende vários comandos (cli.py servidor): cada um começa sem as medições do anterior
+    coletar()
+    _mais_lentos.clear()
+
+
+def juntar(medido):
+    # 'medido' vem de coletar() em um processo de trabalho (as medições de um arquivo)
+    for etapa, (chamadas, total, maximo, amostra) in medido['tempos'].items():
+        for segundos in amostra:
+            _registrar(etapa, segundos)
+        if chamadas > len(amostra):
+            # Amostra parcial: os percentis passam a ser aproximados, a contagem e o total não
+            medida = _tempos[etapa]
+            medida[0] += chamadas - len(amostra)
+            medida[1] += total - sum(amostra)
+            medida[2] = max(medida[2], maximo)
+    for nome, quantidade in medido['contadores'].items():
+        contar(nome, quantidade)
+
+
+def registrar_arquivo(caminho, segundos, limite=10):
+    # Guarda só os 'limite' arquivos mais lentos
+    item = (segundos, os.path.basename(caminho))
+    if len(_mais_lentos) < limite:
+        heapq.heappush(_mais_lentos, item)
+    elif item > _mais_lentos[0]:
+        heapq.heapreplace(_mais_lentos, item)
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+
+
+def resumo():
+    etapas = {}
+    for etapa, (chamadas, total, maximo, amostra) in _tempos.items():
+        ordenados = sorted(amostra)
+        etapas[etapa] = {
+            'chamadas': chamadas,
+            'total_s': round(total, 4),
+            'p50_ms': round(_percentil(ordenados, 50) * 1000, 3),
+            'p99_ms': round(_percentil(ordenados, 99) * 1000, 3),
+            'max_ms': round(maximo * 1000, 3),
+        }
+    return {
+        'etapas': etapas,
+        'contadores': dict(sorted(_contadores.items())),
+        'mais_lentos': [{'arquivo': nome, 'segundos': round(segundos, 4)} for segundos, nome in sorted(_mais_lentos, reverse=True)],
+    }
+
+
+def imprimir():
+    etapas = resumo()['etapas']
+    if not etapas:
+        return
+    print(f"{'etapa':16} {'chamadas':>8} {'total s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for etapa, medida in sorted(etapas.items(), key=lambda item: item[1]['total_s'], reverse=True):
+        print(f"{etapa:16} {medida['chamadas']:8d} {medida['total_s']:9.3f} {medida['p50_ms']:9.3f} {medida['p99_ms']:9.3f}")
+    print(', '.join(f'{nome}: {quantidade}' for nome, quantidade in sorted(_contadores.items())))
+
+
+def salvar_resumo(caminho, **extras):
+    # Resumo da execução em JSON (para acompanhar de uma execução para outra)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(dict(extras, **resumo()), arquivo, ensure_ascii=False, indent=2)
+
+
+# CPROFILE POR ARQUIVO
+# Cada arquivo é medido com cProfile no processo que o lê e gravado em <pasta>/<arquivo>.prof;
+# no fim, só os .prof dos arquivos mais lentos ficam (com um .txt legível ao lado).
+# (Não confundir com os perfis de distribuidora do perfis.py.)
+
+def caminho_cprofile(pasta_cprofile, caminho):
+    return os.path.join(pasta_cprofile, os.path.basename(caminho) + '.prof') if pasta_cprofile else None
+
+
+@contextmanager
+def medir_cprofile(destino):
+    if not destino:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(destino)
+
+
+def manter_cprofile_dos_mais_lentos(pasta_cprofile, linhas=30):
+    lentos = {nome + '.prof' for _, nome in _mais_lentos}
+    for nome in os.listdir(pasta_cprofile):
+        caminho = os.path.join(pasta_cprofile, nome)
+        if not nome.endswith('.prof'):
+            continue
+        if nome not in lentos:
+            os.remove(caminho)
+            continue
+        with open(caminho[:-len('.prof')] + '.txt', 'w', encoding='utf-8') as saida:
+            pstats.Stats(caminho, stream=saida).sort_stats('cumulative').print_stats(linhas)
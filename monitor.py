@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import queue
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+import lote
+import metricas
+from armazenamento import abrir_livro
+
+# MONITOR DA PASTA DE FATURAS
+# Processo de longa duração: em vez de reprocessar a pasta inteira a cada execução, só os arquivos
+# novos ou alterados vão para a extração. Um arquivo só é lido depois que tamanho e data de
+# modificação ficam estáveis por config.monitor_estabilidade segundos (cópia pela rede terminada).
+# O arquivo de estado guarda a assinatura de cada arquivo já entregue ao lote, para que uma
+# reinicialização continue de onde parou. Com o pacote 'watchdog' instalado, as mudanças chegam
+# por eventos do sistema de arquivos e a pasta só é listada na partida; sem ele, a pasta é
+# consultada a cada config.monitor_intervalo segundos (só a listagem, sem reler os arquivos).
+
+
+def assinatura(caminho):
+    estado = os.stat(caminho)
+    return [estado.st_size, estado.st_mtime_ns]
+
+
+class EstadoMonitor:
+    def __init__(self, caminho_estado):
+        self.caminho_estado = caminho_estado
+        try:
+            with open(caminho_estado, encoding='utf-8') as arquivo:
+                self.entregues = json.load(arquivo)
+        except FileNotFoundError:
+            self.entregues = {}
+
+    def ja_entregue(self, nome, assinatura_atual):
+        return self.entregues.get(nome) == assinatura_atual
+
+    def marcar(self, nome, assinatura_atual):
+        self.entregues[nome] = assinatura_atual
+
+    def esquecer_ausentes(self, nomes_presentes):
+        # Arquivos que saíram da pasta (movidos para Lidos ou apagados) não precisam mais de estado
+        for nome in set(self.entregues) - set(nomes_presentes):
+            del self.entregues[nome]
+
+    def salvar(self):
+        temporario = self.caminho_estado + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.entregues, arquivo)
+        os.replace(temporario, self.caminho_estado)
+
+
+class _Eventos:
+    # Recebe os eventos do watchdog e guarda os nomes alterados até a próxima rodada
+    def __init__(self, pasta):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        self.alterados = queue.Queue()
+        fila = self.alterados
+
+        class Tratador(FileSystemEventHandler):
+            def on_any_event(self, evento):
+                if not evento.is_directory:
+                    fila.put(os.path.basename(getattr(evento, 'dest_path', '') or evento.src_path))
+
+        self.observador = Observer()
+        self.observador.schedule(Tratador(), pasta, recursive=False)
+        self.observador.start()
+
+    def nomes(self):
+        nomes = set()
+        while True:
+            try:
+                nomes.add(self.alterados.get_nowait())
+            except queue.Empty:
+                return nomes
+
+    def parar(self):
+        self.observador.stop()
+        self.observador.join()
+
+
+class Monitor:
+    def __init__(self, pasta, estado, estabilidade=None, usar_eventos=True):
+        self.pasta = pasta
+        self.estado = estado
+        self.estabilidade = config.monitor_estabilidade if estabilidade is None else estabilidade
+        self.observados = {}  # nome -> (assinatura, desde quando está igual)
+        self.eventos = None
+        if usar_eventos:
+            try:
+                self.eventos = _Eventos(pasta)
+            except ImportError:
+                print("Pacote 'watchdog' não instalado: a pasta será consultada periodicamente.")
+
+    def _listar(self):
+        with os.scandir(self.pasta) as entradas:
+            return [entrada.name for entrada in entradas if entrada.is_file() and lote.eh_candidato(entrada.name)]
+
+    def nomes_candidatos(self, primeira_rodada):
+        if self.eventos is None or primeira_rodada:
+            nomes = self._listar()
+            self.estado.esquecer_ausentes(nomes)
+            return set(nomes)
+        return {nome for nome in self.eventos.nomes() if lote.eh_candidato(nome)} | set(self.observados)
+
+    def prontos(self, nomes, agora):
+        # Devolve os arquivos novos/alterados cuja assinatura não muda há 'estabilidade' segundos
+        prontos = []
+        for nome in sorted(nomes):
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                assinatura_atual = assinatura(caminho)
+            except FileNotFoundError:
+                self.observados.pop(nome, None)
+                self.estado.entregues.pop(nome, None)
+                continue
+            if self.estado.ja_entregue(nome, assinatura_atual):
+                self.observados.pop(nome, None)
+                continue
+            anterior = self.observados.get(nome)
+            if anterior is None or anterior[0] != assinatura_atual:
+                self.observados[nome] = (assinatura_atual, agora)
+            elif agora - anterior[1] >= self.estabilidade:
+                del self.observados[nome]
+                prontos.append((caminho, assinatura_atual))
+        return prontos
+
+    def parar(self):
+        if self.eventos is not None:
+            self.eventos.parar()
+
+
+def monitorar(pasta=None, diretorio_destino=None, caminho_banco=None, caminho_estado=None, intervalo=None, workers=1, rodadas=None):
+    pasta = pasta or config.diretorio_faturas
+    diretorio_destino = diretorio_destino or config.diretorio_destino
+    caminho_banco = caminho_banco or config.caminho_banco
+    caminho_estado = caminho_estado or config.caminho_estado_monitor
+    intervalo = intervalo or config.monitor_intervalo
+
+    estado = EstadoMonitor(caminho_estado)
+    monitor = Monitor(pasta, estado)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=lote.iniciar_processo, initargs=(config.caminho_cache,)) if workers > 1 else None
+    if executor is None:
+        lote.iniciar_processo(config.caminho_cache)
+    print(f"Monitorando {pasta} (Ctrl+C para parar)")
+
+    rodada = 0
+    try:
+        # O livro fica aberto entre as rodadas: o índice de duplicados é carregado uma vez só
+        with abrir_livro(caminho_banco) as livro:
+            lote.aplicar_movimentos(livro)  # conclui os movimentos de uma execução interrompida
+            while rodadas is None or rodada < rodadas:
+                prontos = monitor.prontos(monitor.nomes_candidatos(rodada == 0), time.monotonic())
+                if prontos:
+                    caminhos = [caminho for caminho, _ in prontos]
+                    resultados = lote.extrair_em_janela(executor, caminhos, workers) if executor else map(lote.extrair_arquivo, caminhos)
+                    resumo = lote.gravar_resultados(resultados, livro, diretorio_destino)
+                    for caminho, assinatura_atual in prontos:
+                        # Os inseridos já foram movidos para Lidos; recusados ficam marcados até mudarem
+                        if os.path.exists(caminho):
+                            estado.marcar(os.path.basename(caminho), assinatura_atual)
+                        else:
+                            estado.entregues.pop(os.path.basename(caminho), None)
+                    estado.salvar()
+                    print(f"{len(prontos)} arquivos lidos: {resumo['inseridos']} inseridos, {resumo['duplicados']} duplicados, {resumo['falhas']} com falha")
+                    lote.podar_cache(config.caminho_cache)  # o monitor não termina: o limite do cache vale a cada rodada
+                    metricas.coletar()  # processo de longa duração: as medições não se acumulam entre rodadas
+                rodada += 1
+                # Com arquivos ainda estabilizando, a próxima verificação não espera o intervalo inteiro
+                time.sleep(min(intervalo, monitor.estabilidade) if monitor.observados else intervalo)
+    except KeyboardInterrupt:
+        print("Monitor encerrado.")
+    finally:
+        monitor.parar()
+        if executor is not None:
+            executor.shutdown()
+
+
+def principal(argv=None):
+    parser = argparse.ArgumentParser(description='Monitora a pasta de faturas e lê só os arquivos novos ou alterados')
+    parser.add_argument('pasta', nargs='?', default=config.diretorio_faturas)
+    parser.add_argument('--destino', default=config.diretorio_destino)
+    parser.add_argument('--banco', default=config.caminho_banco)
+    parser.add_argument('--estado', default=config.caminho_estado_monitor)
+    parser.add_argument('--intervalo', type=float, default=config.monitor_intervalo)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    monitorar(args.pasta, args.destino, args.banco, args.estado, args.intervalo, args.workers)
+
+
+if __name__ == '__main__':
+    principal()
@@ -0,0 +1,145 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metricas
+
+# OCR POR COORDENADAS
+# Para PDFs escaneados (sem camada de texto). Cada página é rasterizada uma única vez, em
+# config.dpi_ocr, e todos os recortes de config.corte_comgas saem da mesma imagem em memória.
+# Primeiro vai para o OCR a coordenada PADRÃO de cada campo; as ajustadas só são tentadas para
+# os campos que falharam. Os recortes são lidos em paralelo (o Tesseract roda em processo próprio,
+# então threads bastam).
+
+VERSAO_OCR = '2'  # Aumente ao mudar a leitura por OCR: invalida o cache de extração
+
+# Falta de instalação (pytesseract/pdf2image, Tesseract ou Poppler) não é um problema do PDF:
+# vira OcrIndisponivel, que sobe até extratores.py e não deixa o resultado vazio ir para o cache
+class OcrIndisponivel(Exception):
+    pass
+
+
+def _erros_de_instalacao():
+    erros = [ImportError]
+    try:
+        from pytesseract import TesseractNotFoundError
+        erros.append(TesseractNotFoundError)
+    except ImportError:
+        pass
+    try:
+        from pdf2image.exceptions import PDFInfoNotInstalledError
+        erros.append(PDFInfoNotInstalledError)
+    except ImportError:
+        pass
+    return tuple(erros)
+
+
+CAMPOS_OCR = ['cnpj', 'valor_total', 'volume_total', 'data_emissao', 'data_inicio', 'data_fim', 'numero_fatura']
+
+# O que procurar no texto de cada recorte
+_DATA = re.compile(r'\d{2}\/\d{2}\/\d{4}')
+PADROES_OCR = {
+    'cnpj': re.compile(r'\d{2}\.?\d{3}\.?\d{3}\/?\d{4}\-?\s?\d{2}'),
+    'valor_total': re.compile(r'\d+(?:\.\d{3})*\,\d{2}'),
+    'volume_total': re.compile(r'\d+(?:[.,]\d+)*'),
+    'data_emissao': _DATA,
+    'data_inicio': _DATA,
+    'data_fim': _DATA,
+    'numero_fatura': re.compile(r'\d+(?:\.\d+)*'),
+}
+
+
+def coordenadas_por_campo(corte):
+    # Agrupa as chaves de corte_comgas por campo: a coordenada PADRÃO (nome igual ao campo)
+    # vem primeiro, seguida das alternativas na ordem do config. Coordenadas vazias são ignoradas.
+    coordenadas = {}
+    for campo in CAMPOS_OCR:
+        chaves = [chave for chave in corte if chave.startswith(campo)]
+        chaves.sort(key=lambda chave: chave != campo)
+        coordenadas[campo] = [corte[chave] for chave in chaves if corte[chave]]
+    return coordenadas
+
+
+def ler_campo(campo, texto):
+    encontrados = PADROES_OCR[campo].findall(texto or '')
+    if not encontrados:
+        return ''
+    # No recorte do período, a data de início é a primeira e a de fim é a última
+    return encontrados[-1] if campo == 'data_fim' else encontrados[0]
+
+
+def _ocr(imagem, psm=6):
+    import pytesseract
+
+    if config.caminho_tesseract and os.path.exists(config.caminho_tesseract):
+        pytesseract.pytesseract.tesseract_cmd = config.caminho_tesseract
+    return pytesseract.image_to_string(imagem, lang=config.idioma_ocr, config=f'--psm {psm}')
+
+
+def _rasterizar(caminho_do_pdf, pagina):
+    from pdf2image import convert_from_path
+
+    imagens = convert_from_path(caminho_do_pdf, dpi=config.dpi_ocr, first_page=pagina, last_page=pagina,
+                                poppler_path=config.caminho_poppler)
+    return imagens[0] if imagens else None
+
+
+def _total_paginas(caminho_do_pdf):
+    from pdf2image import pdfinfo_from_path
+
+    return pdfinfo_from_path(caminho_do_pdf, poppler_path=config.caminho_poppler).get('Pages', 1)
+
+
+def ler_recortes(imagem, coordenadas, executor):
+    # Tenta as coordenadas de cada campo em rodadas: na rodada n, só os campos ainda vazios
+    # usam a sua n-ésima coordenada
+    informacoes = {}
+    tentativa = 0
+    while True:
+        pendentes = {
+            campo: caixas[tentativa] for campo, caixas in coordenadas.items()
+            if not informacoes.get(campo) and tentativa < len(caixas)
+        }
+        if not pendentes:
+            return informacoes
+        textos = executor.map(_ocr, [imagem.crop(caixa) for caixa in pendentes.values()])
+        for campo, texto in zip(pendentes, textos):
+            valor = ler_campo(campo, texto)
+            if valor:
+                informacoes[campo] = valor
+        tentativa += 1
+
+
+@metricas.cronometrar('ocr')
+def extrair_informacoes_ocr(caminho_do_pdf, corte=None, extrator=None):
+    # Devolve o mesmo dicionário de main.ExtratorFaturas.extrair_informacoes.
+    # 'extrator' (um ExtratorFaturas) é aplicado ao OCR da página inteira apenas se, depois dos
+    # recortes, ainda faltar algum campo sem coordenada (ex.: valor_icms, correcao_pcs).
+    # 'corte': caixas do perfil da distribuidora; {} lê só a página inteira (precisa do 'extrator')
+    coordenadas = coordenadas_por_campo(config.corte_comgas() if corte is None else corte)
+    informacoes = {}
+    try:
+        total = _total_paginas(caminho_do_pdf)
+        with ThreadPoolExecutor(max_workers=config.ocr_workers or os.cpu_count()) as executor:
+            for pagina in range(1, total + 1):
+                imagem = _rasterizar(caminho_do_pdf, pagina)
+                if imagem is None:
+                    continue
+                faltantes = {campo: caixas for campo, caixas in coordenadas.items() if not informacoes.get(campo)}
+                informacoes.update(ler_recortes(imagem, faltantes, executor))
+
+                if extrator is not None:
+                    restantes = [campo for campo in extrator.regexes if not informacoes.get(campo)]
+                    if restantes:
+                        do_texto = extrator.extrair_informacoes(' '.join(_ocr(imagem, psm=3).split()))
+                        informacoes.update({campo: do_texto[campo] for campo in restantes if do_texto.get(campo)})
+                    if all(informacoes.get(campo) for campo in extrator.regexes):
+                        break
+                elif all(informacoes.get(campo) for campo in coordenadas):
+                    break
+    except Exception as e:
+        if isinstance(e, _erros_de_instalacao()):
+            raise OcrIndisponivel(str(e) or type(e).__name__) from e
+        print(f"Erro no OCR do PDF: {caminho_do_pdf}, erro: {e}")
+    return informacoes
@@ -0,0 +1,134 @@
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+import config
+
+# PERFIS DE DISTRIBUIDORA
+# Cada distribuidora tem o seu leiaute: as regex do texto do PDF, os campos lidos de cada seção
+# da NF-e, a expressão do período em infCpl e as caixas do OCR. O perfil de cada arquivo vem do
+# nome (..._GN_<NOME>_... ou ..._DIST_<NOME>_...) ou, sem isso, do CNPJ do emitente; se nenhum dos
+# dois identificar a distribuidora, vale config.perfil_padrao. Assim uma única execução lê uma pasta
+# com faturas de várias distribuidoras, em vez de uma cópia dos scripts por distribuidora.
+# As expressões de cada perfil são compiladas uma vez, quando ele é registrado (na importação do
+# módulo, uma vez por processo de trabalho).
+
+VERSAO_PERFIS = '2'  # Aumente ao mudar um perfil: entra na chave do cache de extração
+
+# Campos lidos de cada seção da NF-e (filho -> campo); o leiaute é nacional, então o mapa é o mesmo
+# para todas as distribuidoras a menos que o perfil diga outra coisa.
+# A coluna CNPJ é a do cliente (destinatário), como no PDF; o do emitente só escolhe o perfil
+CAMPOS_NFE = {
+    'ide': {'dhEmi': 'data_emissao', 'nNF': 'numero_fatura'},
+    'emit': {'CNPJ': 'cnpj_emitente'},
+    'dest': {'CNPJ': 'cnpj', 'CPF': 'cnpj'},
+    'ICMSTot': {'vNF': 'valor_total', 'vICMS': 'valor_icms'},
+    'infAdic': {'infCpl': 'inf_cpl'},
+}
+# Ex.: 'PERIODO DE 08/01/2025 A 14/01/2025 VALOR APROXIMADO DOS TRIBUTOS...'
+PERIODO_NFE = r'DE\s+(\S+)\s+A\s+(\S+)'
+
+
+@dataclass(frozen=True, eq=False)
+class Perfil:
+    nome: str                         # como aparece no nome dos arquivos, sem acentos
+    distribuidora: str                # coluna Distribuidora
+    cnpjs: tuple                      # CNPJs do emitente, só dígitos
+    regexes: dict                     # campo -> [regex] do texto do PDF, na ordem de tentativa
+    divisor_pcs: float = None         # o PCS lido do PDF é dividido por este valor (None = fica como lido)
+    campos_xml: dict = field(default_factory=lambda: CAMPOS_NFE)
+    periodo_xml: str = PERIODO_NFE    # datas de início e fim em infCpl
+    corte_ocr: object = None          # função que devolve as caixas do OCR (ex.: config.corte_comgas); None = página inteira
+    padroes: dict = field(init=False, repr=False)
+    periodo: object = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'padroes', {campo: [re.compile(regex) for regex in lista] for campo, lista in self.regexes.items()})
+        object.__setattr__(self, 'periodo', re.compile(self.periodo_xml))
+
+
+PERFIS = {}
+_POR_CNPJ = {}
+
+
+def registrar_perfil(perfil):
+    PERFIS[perfil.nome] = perfil
+    for cnpj in perfil.cnpjs:
+        _POR_CNPJ[cnpj] = perfil
+    return perfil
+
+
+# Cegás: DANFE + boleto em PDF e NF-e em XML
+CEGAS = registrar_perfil(Perfil(
+    nome='CEGAS',
+    distribuidora='Cegás',
+    cnpjs=('73759185000196',),
+    regexes={
+        'cnpj': [r'(\d{2}\.\d{3}\.?\d{3}\/?\d{4}\-?\s?\d{2})\s+\d{2}\/\d{2}\/\d{4}'], #26/09
+        # Equivale a -?(\d+\.?\d+\,\d{2})... sem o retrocesso quadrático nas sequências longas de dígitos do boleto
+        'valor_total': [r'-?(\d(?:\d*\.)?\d+\,\d{2})\s\d{2}\/\d{2}\/\d{4}'], #26/09
+        'volume_total': [r'M3\s(\d+\.?\,?\d+\.?\,?\d+)\s?'], #26/09
+        'data_emissao': [r'[A]\s(\d{2}\/\d{2}\/\d{4})'], #05/11
+        'data_inicio': [r'DE\s(\d{2}\/\d{2}\/\d{4})\s'], #26/09
+        'data_fim': [r'[A-a]\s(\d{2}\/\d{2}\/\d{4})'], #26/09
+        'numero_fatura': [r'Nº\s(\d+\.?\d+\.?\d+)\s'], #26/09
+        'valor_icms': [r'\,\d+\s(\d+\d+\,\.?\d+)\s[0]'], #05/12
+        'correcao_pcs': [r'R\d+\s(\d+)\s*', r'T\d+\s(\d+)\s*'],
+    },
+    divisor_pcs=9400,  # O PCS vem inteiro no PDF: dividido por 9400, com 4 casas decimais
+))
+
+# Comgás: expressões do extrator que ficava embutido em funcoes.verificar_download
+REGEXES_COMGAS = {
+    'cnpj': r'\d{2}\.\d{3}\.?\d{3}\/?\d{4}\-?\s?\d{2}',
+    'valor_total': r'R\$\s(\d+\.?\d+\,\d{2})\s',
+    'volume_total': r'Total\s\d+\.?\,?\d+\.?\,?\d+?\.?\,?\s',
+    'data_emissao': r'apresentação\s(\d{2}\.\d{2}\.\d{4})',
+    'data_inicio': r'\d{2}\.\d{2}\.\d{4}\d{2}\.\d{2}\.\d{4}(\d{2}\.\d{2}\.\d{4})\d{2}\.\d{2}\.\d{4}', #revisar essa merda de regex
+    'data_fim': r'\d{2}\.\d{2}\.\d{4}(\d{2}\.\d{2}\.\d{4})\d{2}\.\d{2}\.\d{4}',
+    'numero_fatura': r'\s(\d{3}\.\d{3}\.\d{3})\s',
+    'valor_icms': r'ICMS\s?R\$\s(\d+\.?\d+\,\d{2})\s',
+    'correcao_pcs': r'[A-Z]\d{9}(\d{4})\d+',
+}
+COMGAS = registrar_perfil(Perfil(
+    nome='COMGAS',
+    distribuidora='Comgás',
+    cnpjs=('61856571000117',),
+    regexes={campo: [regex] for campo, regex in REGEXES_COMGAS.items()},
+    corte_ocr=config.corte_comgas,
+))
+
+
+# Escolha do perfil
+_NOME_ARQUIVO = re.compile(r'_(?:GN|DIST)_([A-ZÀ-Ü]+)_')
+_CNPJ_FORMATADO = re.compile(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}')
+
+
+def _sem_acentos(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+
+
+def padrao():
+    return PERFIS[config.perfil_padrao]
+
+
+def do_arquivo(nome_arquivo):
+    # Perfil pelo nome do arquivo (ex.: '24.00_DIST_CEGAS_GN_779_24.xml'), ou None
+    for nome in _NOME_ARQUIVO.findall(nome_arquivo):
+        perfil = PERFIS.get(_sem_acentos(nome))
+        if perfil is not None:
+            return perfil
+    return None
+
+
+def do_cnpj(cnpj):
+    return _POR_CNPJ.get(re.sub(r'\D', '', cnpj or ''))
+
+
+def do_texto(texto):
+    # Primeiro CNPJ de distribuidora conhecida no texto (no DANFE e no boleto o do emitente vem formatado)
+    for cnpj in _CNPJ_FORMATADO.findall(texto):
+        perfil = do_cnpj(cnpj)
+        if perfil is not None:
+            return perfil
+    return None
@@ -0,0 +1,71 @@
+import csv
+import sys
+import argparse
+
+import config
+from armazenamento import abrir_livro
+
+# RELATÓRIOS POR CNPJ E PERÍODO
+# Volume, valor, ICMS e PCS médio por CNPJ e mês, lidos da tabela de agregados do livro
+# (mantida a cada lote gravado), sem reabrir a planilha nem as faturas uma a uma.
+# Ex.: python relatorios.py --cnpj 07.206.816/0001-15 --de 2024-01 --ate 2024-12
+
+COLUNAS_RELATORIO = ['cnpj', 'periodo', 'faturas', 'volume_m3', 'valor_total', 'valor_icms', 'valor_por_m3', 'pcs_medio']
+
+
+def relatorio(livro, cnpj=None, de=None, ate=None):
+    linhas = []
+    for soma in livro.consultar_agregados(cnpj, de, ate):
+        linhas.append({
+            'cnpj': soma['cnpj'],
+            'periodo': soma['periodo'],
+            'faturas': soma['faturas'],
+            'volume_m3': soma['volume_total'],
+            'valor_total': soma['valor_total'],
+            'valor_icms': soma['valor_icms'],
+            'valor_por_m3': soma['valor_total'] / soma['volume_total'] if soma['volume_total'] else None,
+            'pcs_medio': soma['soma_pcs'] / soma['faturas_pcs'] if soma['faturas_pcs'] else None,
+        })
+    return linhas
+
+
+def _formatar(valor, casas=2):
+    if valor is None:
+        return '-'
+    if isinstance(valor, float):
+        return f'{valor:,.{casas}f}'.replace(',', '_').replace('.', ',').replace('_', '.')
+    return str(valor)
+
+
+def imprimir_tabela(linhas):
+    casas = {'valor_por_m3': 4, 'pcs_medio': 4}
+    tabela = [COLUNAS_RELATORIO] + [[_formatar(linha[coluna], casas.get(coluna, 2)) for coluna in COLUNAS_RELATORIO] for linha in linhas]
+    larguras = [max(len(celula) for celula in coluna) for coluna in zip(*tabela)]
+    for celulas in tabela:
+        print('  '.join(celula.rjust(largura) for celula, largura in zip(celulas, larguras)))
+
+
+def principal(argv=None):
+    parser = argparse.ArgumentParser(description='Volume, valor, ICMS e PCS médio por CNPJ e mês')
+    parser.add_argument('--banco', default=config.caminho_banco, help='caminho do livro SQLite ou URL do SQLAlchemy')
+    parser.add_argument('--cnpj')
+    parser.add_argument('--de', help="primeiro período, 'aaaa-mm'")
+    parser.add_argument('--ate', help="último período, 'aaaa-mm'")
+    parser.add_argument('--csv', action='store_true', help='imprime em CSV (separador ;) em vez da tabela')
+    args = parser.parse_args(argv)
+
+    with abrir_livro(args.banco) as livro:
+        linhas = relatorio(livro, args.cnpj, args.de, args.ate)
+
+    if args.csv:
+        escritor = csv.DictWriter(sys.stdout, fieldnames=COLUNAS_RELATORIO, delimiter=';')
+        escritor.writeheader()
+        escritor.writerows(linhas)
+    elif linhas:
+        imprimir_tabela(linhas)
+    else:
+        print('Nenhuma fatura no período.')
+
+
+if __name__ == '__main__':
+    principal()
@@ -0,0 +1,55 @@
+import os
+import sys
+import shutil
+
+import pytest
+
+# Os módulos ficam na raiz do repositório (sem pacote): os testes os importam de lá
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import lote
+import metricas
+from benchmarks.gerador import escrever_pdf
+
+
+@pytest.fixture(autouse=True)
+def _metricas_zeradas():
+    # As medições e os contadores são globais por processo: cada teste começa do zero
+    metricas.zerar()
+    yield
+    metricas.zerar()
+
+
+@pytest.fixture
+def pdf_sem_texto(tmp_path):
+    # PDF escaneado: uma página sem camada de texto
+    caminho = tmp_path / 'ESCANEADA_GN_CEGAS_1.pdf'
+    escrever_pdf(str(caminho), '')
+    return str(caminho)
+
+
+def copiar_pasta(destino, nomes=None):
+    # Faturas/ e Lidos/ em 'destino'. Sem 'nomes': todas as NF-e de exemplo (algumas repetidas),
+    # um arquivo ignorado e um que não é fatura; com 'nomes': só essas NF-e
+    (destino / 'Faturas').mkdir(parents=True)
+    (destino / 'Lidos').mkdir()
+    for nome in nomes or sorted(os.listdir(os.path.join(RAIZ, 'Faturas'))):
+        shutil.copy(os.path.join(RAIZ, 'Faturas', nome), destino / 'Faturas' / nome)
+    if nomes is None:
+        (destino / 'Faturas' / 'copiando.xml.part').write_text('<')
+        (destino / 'Faturas' / 'leia-me.txt').write_text('não é fatura')
+    return destino
+
+
+@pytest.fixture
+def pasta(request, tmp_path):
+    # copiar_pasta no tmp_path; as NF-e vêm de @pytest.mark.parametrize('pasta', [nomes], indirect=True)
+    return copiar_pasta(tmp_path, getattr(request, 'param', None))
+
+
+def processar(pasta, workers=1, **opcoes):
+    # Lote de pasta/Faturas para pasta/Lidos, no livro pasta/livro.sqlite3 e, a menos que se diga outro, sem cache
+    opcoes.setdefault('caminho_cache', '')
+    return lote.processar_lote(str(pasta / 'Faturas'), workers=workers, diretorio_destino=str(pasta / 'Lidos'),
+                               caminho_banco=str(pasta / 'livro.sqlite3'), **opcoes)
@@ -0,0 +1,106 @@
+import os
+from datetime import date
+
+import pytest
+
+import extratores
+import relatorios
+from armazenamento import LivroFaturas
+from conftest import RAIZ
+
+XML_CEGAS = os.path.join(RAIZ, 'Faturas', '24.00_DIST_CEGAS_GN_779_24.xml')
+
+
+@pytest.fixture
+def livro(tmp_path):
+    with LivroFaturas(str(tmp_path / 'livro.sqlite3')) as livro:
+        yield livro
+
+
+def linha(cnpj, fim, valor, volume, icms=0.0, pcs=None):
+    return {'CNPJ': cnpj, 'Data Início': date(fim.year, fim.month, 1), 'Data Fim': fim, 'Valor Total': valor,
+            'Volume Total': volume, 'Valor ICMS': icms, 'Correção PCS': pcs, 'Número Fatura': str(valor)}
+
+
+def test_nfe_usa_o_cnpj_do_cliente():
+    fatura = extratores.extrair_fatura(XML_CEGAS)
+    assert fatura.cnpj == '07206816000115'  # destinatário, não a Cegás (73759185000196)
+    assert fatura.distribuidora == 'Cegás'  # o emitente ainda escolhe o perfil
+
+
+def test_relatorio_do_cliente_inclui_as_nfe(livro):
+    faturas, _ = extratores.extrair_faturas(XML_CEGAS)
+    livro.inserir_novas(extratores.faturas_para_linhas(faturas))
+    linhas = relatorios.relatorio(livro, cnpj='07.206.816/0001-15')
+    assert [(linha['periodo'], linha['faturas'], linha['valor_total']) for linha in linhas] == [('2024-12', 1, 252223.10)]
+    assert livro.consultar_agregados(cnpj='73.759.185/0001-96') == []
+
+
+def test_totais_por_cnpj_e_mes(livro):
+    livro.inserir_novas([
+        linha('07.206.816/0028-35', date(2024, 11, 30), 100.0, 20.0, icms=20.0, pcs=0.95),
+        linha('07206816002835', date(2024, 11, 15), 50.0, 5.0, icms=10.0, pcs=0.97),
+        linha('07.206.816/0028-35', date(2024, 12, 31), 30.0, 3.0),
+        linha('11.111.111/0001-11', date(2024, 11, 30), 7.0, 1.0),
+    ])
+    somas = {(soma['cnpj'], soma['periodo']): soma for soma in livro.consultar_agregados()}
+    assert set(somas) == {('07206816002835', '2024-11'), ('07206816002835', '2024-12'), ('11111111000111', '2024-11')}
+
+    novembro = somas[('07206816002835', '2024-11')]
+    assert novembro['faturas'] == 2
+    assert novembro['valor_total'] == pytest.approx(150.0)
+    assert novembro['volume_total'] == pytest.approx(25.0)
+    assert novembro['valor_icms'] == pytest.approx(30.0)
+    assert novembro['faturas_pcs'] == 2
+
+    relatorio, = relatorios.relatorio(livro, cnpj='07.206.816/0028-35', de='2024-11', ate='2024-11')
+    assert relatorio['valor_por_m3'] == pytest.approx(6.0)
+    assert relatorio['pcs_medio'] == pytest.approx(0.96)
+
+
+def test_agregados_reconstruidos_de_um_livro_antigo(tmp_path):
+    caminho = str(tmp_path / 'livro.sqlite3')
+    with LivroFaturas(caminho) as livro:
+        livro.adicionar_lote([linha('07.206.816/0028-35', date(2024, 11, 30), 100.0, 20.0)])
+        livro.conexao.execute('DELETE FROM agregados')
+        livro.conexao.commit()
+    with LivroFaturas(caminho) as livro:
+        soma, = livro.consultar_agregados()
+    assert (soma['cnpj'], soma['periodo'], soma['faturas']) == ('07206816002835', '2024-11', 1)
+
+
+def test_importar_a_mesma_planilha_duas_vezes(livro, tmp_path):
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('openpyxl')
+
+    planilha = str(tmp_path / 'CEGAS.xlsx')
+    pd.DataFrame([
+        {'CNPJ': '07.206.816/0028-35', 'Valor Total': 100.0, 'Volume Total': 20.0, 'Data Início': '01/11/2024',
+         'Data Fim': '30/11/2024', 'Número Fatura': '000.408.210'},
+        {'CNPJ': '07.206.816/0028-35', 'Valor Total': 100.0, 'Volume Total': 20.0, 'Data Início': '01/11/2024',
+         'Data Fim': '30/11/2024', 'Número Fatura': '000.408.210'},
+        {'CNPJ': '11.111.111/0001-11', 'Valor Total': 7.0, 'Volume Total': 1.0, 'Data Início': '01/11/2024',
+         'Data Fim': '30/11/2024', 'Número Fatura': '1'},
+    ]).to_excel(planilha, index=False)
+
+    assert livro.importar_planilha(planilha) == 2
+    assert livro.importar_planilha(planilha) == 0
+    assert livro.total() == 2
+    assert sum(soma['faturas'] for soma in livro.consultar_agregados()) == 2
+
+
+def test_planilha_com_cnpj_da_distribuidora_fica_fora_dos_agregados(livro, tmp_path, capsys):
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('openpyxl')
+
+    planilha = str(tmp_path / 'CEGAS.xlsx')
+    pd.DataFrame([
+        {'CNPJ': '73759185000196', 'Valor Total': 252223.10, 'Volume Total': 50000.0, 'Data Início': '01/12/2024',
+         'Data Fim': '31/12/2024', 'Número Fatura': '779'},
+        {'CNPJ': '07.206.816/0001-15', 'Valor Total': 100.0, 'Volume Total': 20.0, 'Data Início': '01/11/2024',
+         'Data Fim': '30/11/2024', 'Número Fatura': '000.408.210'},
+    ]).to_excel(planilha, index=False)
+
+    assert livro.importar_planilha(planilha) == 2
+    assert 'Aviso: 1 linhas da planilha têm o CNPJ de uma distribuidora' in capsys.readouterr().out
+    assert [(soma['cnpj'], soma['periodo']) for soma in livro.consultar_agregados()] == [('07206816000115', '2024-11')]
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+from armazenamento import COLUNAS, LivroFaturas, abrir_livro
+
+
+def linha(numero, valor, fim=date(2024, 11, 30)):
+    return {'CNPJ': '07.206.816/0028-35', 'Valor Total': valor, 'Volume Total': 10.0, 'Data Emissão': fim,
+            'Data Início': date(fim.year, fim.month, 1), 'Data Fim': fim, 'Número Fatura': numero,
+            'Valor ICMS': valor * 0.2, 'Correção PCS': 0.95, 'Distribuidora': 'Cegás', 'Nome do Arquivo': f'{numero}.pdf'}
+
+
+@pytest.fixture
+def livro(tmp_path):
+    with LivroFaturas(str(tmp_path / 'livro.sqlite3')) as livro:
+        yield livro
+
+
+def test_abrir_livro_com_caminho_usa_o_sqlite(tmp_path):
+    with abrir_livro(str(tmp_path / 'livro.sqlite3')) as livro:
+        assert isinstance(livro, LivroFaturas)
+
+
+def test_lote_gravado_de_uma_vez_e_mantido_entre_aberturas(tmp_path):
+    caminho = str(tmp_path / 'livro.sqlite3')
+    with LivroFaturas(caminho) as livro:
+        assert livro.adicionar_lote([linha('1', 10.0), linha('2', 20.0)]) == 2
+        assert livro.adicionar_lote([]) == 0
+    with LivroFaturas(caminho) as livro:
+        assert livro.total() == 2
+        assert livro.inserir_novas([linha('1', 10.0), linha('3', 30.0)]) == [False, True]
+
+
+def test_valores_ausentes_viram_null(livro):
+    livro.adicionar_lote([dict(linha('1', 10.0), **{'Valor ICMS': float('nan'), 'Correção PCS': ''})])
+    assert livro.conexao.execute('SELECT valor_icms, correcao_pcs, data_fim FROM faturas').fetchone() == (None, None, '30/11/2024')
+
+
+def test_exportar_planilha_com_todas_as_faturas(livro, tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+
+    livro.inserir_novas([linha(str(numero), float(numero)) for numero in range(1, 2501)])
+    planilha = str(tmp_path / 'CEGAS.xlsx')
+    assert livro.exportar_excel(planilha) == 2500
+    aba = openpyxl.load_workbook(planilha, read_only=True)['Sheet1']
+    linhas = list(aba.values)
+    assert list(linhas[0]) == list(COLUNAS)
+    assert len(linhas) == 2501
+    assert linhas[1][6] == '1' and linhas[-1][6] == '2500'
+    assert not (tmp_path / 'CEGAS.tmp.xlsx').exists()
+
+
+def test_livro_antigo_sem_indice_tem_as_chaves_reconstruidas(tmp_path):
+    caminho = str(tmp_path / 'livro.sqlite3')
+    with LivroFaturas(caminho) as livro:
+        livro.adicionar_lote([linha('1', 10.0)])
+        livro.conexao.execute('DELETE FROM chaves')
+        livro.conexao.commit()
+    with LivroFaturas(caminho) as livro:
+        assert livro.inserir_novas([linha('1', 10.0)]) == [False]
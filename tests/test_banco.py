@@ -0,0 +1,86 @@
+import os
+import re
+from datetime import date
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+import extratores
+from armazenamento import BancoFaturas, abrir_livro
+from conftest import RAIZ
+
+PDF_CEGAS = os.path.join(RAIZ, 'Lidos', '9nyBBzvKcrEJtqFZ7RwcJndFMV3N2p.pdf')
+XML_CEGAS = os.path.join(RAIZ, 'Faturas', '24.00_DIST_CEGAS_GN_779_24.xml')
+
+
+@pytest.fixture
+def banco(tmp_path):
+    with abrir_livro(f"sqlite:///{tmp_path / 'faturas.db'}") as banco:
+        yield banco
+
+
+def linha(numero, valor, cnpj='07.206.816/0028-35', chave=''):
+    return {'CNPJ': cnpj, 'Valor Total': valor, 'Data Início': date(2024, 11, 1), 'Data Fim': date(2024, 11, 30),
+            'Número Fatura': numero, 'Chave de Acesso': chave}
+
+
+def test_abrir_livro_com_url_usa_o_banco(banco):
+    assert isinstance(banco, BancoFaturas)
+
+
+def test_mesma_fatura_nos_dois_formatos_e_duplicada(banco, tmp_path):
+    texto = open(XML_CEGAS, encoding='utf-8').read()
+    texto = re.sub(r'Id="NFe\d+"', 'Id="NFe23241173759185000196550010004082101123634387"', texto)
+    xml = tmp_path / '24.00_DIST_CEGAS_GN_408210.xml'
+    xml.write_text(texto, encoding='utf-8')
+
+    pdf = extratores.extrair_fatura(PDF_CEGAS)
+    nfe = extratores.extrair_fatura(str(xml))
+    assert banco.inserir_novas([pdf.linha()]) == [True]
+    assert banco.inserir_novas([nfe.linha()]) == [False]
+    assert banco.total() == 1
+
+
+def test_cnpj_e_numero_gravados_normalizados(banco):
+    from sqlalchemy import select
+
+    banco.inserir_novas([linha('000.408.210', 10.0)])
+    with banco.engine.connect() as conexao:
+        cnpj, numero = conexao.execute(select(banco.tabela.c.cnpj, banco.tabela.c.numero_fatura)).one()
+    assert (cnpj, numero) == ('07206816002835', 408210)
+
+
+def test_duplicado_e_o_mesmo_numero_no_mesmo_periodo(banco):
+    # Mesmo CNPJ, número e período com formatação diferente: duplicado, mesmo com outro valor
+    lote = [linha('000.408.210', 307361.67), linha('408210', 307000.00, cnpj='07206816002835'), linha('408211', 307361.67)]
+    assert banco.inserir_novas(lote) == [True, False, True]
+    assert banco.inserir_novas(lote) == [False, False, False]
+    assert banco.consultar_agregados()[0]['faturas'] == 2
+
+
+def test_livro_continua_com_a_chave_pelo_valor(banco, tmp_path):
+    # No livro SQLite o duplicado segue o índice do duplicados.py (cnpj, período e valor)
+    lote = [linha('408210', 99.0), linha('408211', 99.0)]
+    with abrir_livro(str(tmp_path / 'livro.sqlite3')) as livro:
+        assert livro.inserir_novas(lote) == [True, False]
+    assert banco.inserir_novas(lote) == [True, True]
+
+
+def test_chave_de_acesso_repetida_com_outros_campos(banco):
+    chave = '23241173759185000196550010004082101123634387'
+    assert banco.inserir_novas([linha('1', 10.0, chave=chave)]) == [True]
+    assert banco.inserir_novas([linha('2', 10.01, chave=chave)]) == [False]
+
+
+def test_restricao_unica_nos_campos_normalizados(banco):
+    restricoes = {restricao.name: [coluna.name for coluna in restricao.columns] for restricao in banco.tabela.constraints
+                  if restricao.name and restricao.name.startswith('uq_')}
+    assert restricoes == {'uq_faturas_fatura': ['cnpj', 'numero_fatura', 'data_inicio', 'data_fim'],
+                          'uq_faturas_chave_nfe': ['chave_nfe']}
+
+
+def test_linha_sem_movimento_nao_entra_no_diario(banco, tmp_path):
+    movimentos = [(str(tmp_path / 'a.xml'), str(tmp_path / 'Lidos' / 'a.xml')), None]
+    assert banco.inserir_novas([linha('1', 10.0), linha('2', 20.0)], movimentos) == [True, True]
+    assert [origem for _, origem, _ in banco.movimentos_pendentes()] == [str(tmp_path / 'a.xml')]
@@ -0,0 +1,116 @@
+import os
+import importlib
+import dataclasses
+import shutil
+
+import pytest
+
+import extratores
+import metricas
+from cache import CacheExtracao, hash_arquivo
+from conftest import RAIZ
+
+XML_CEGAS = os.path.join(RAIZ, 'Faturas', '24.00_DIST_CEGAS_GN_779_24.xml')
+PDF_CEGAS = os.path.join(RAIZ, 'Lidos', '9nyBBzvKcrEJtqFZ7RwcJndFMV3N2p.pdf')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with CacheExtracao(str(tmp_path / 'cache.sqlite3'), 1024 * 1024) as cache:
+        yield cache
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = tmp_path / 'fatura.txt'
+    caminho.write_text('primeira versão')
+    return str(caminho)
+
+
+def contador():
+    chamadas = []
+
+    def funcao(caminho):
+        chamadas.append(caminho)
+        return {'lido': len(chamadas)}
+    return funcao, chamadas
+
+
+def test_mesmo_conteudo_e_versao_nao_le_de_novo(cache, arquivo):
+    funcao, chamadas = contador()
+    assert cache.extrair(arquivo, 'v1', funcao) == {'lido': 1}
+    assert cache.extrair(arquivo, 'v1', funcao) == {'lido': 1}
+    assert len(chamadas) == 1
+    assert metricas.resumo()['contadores'] == {'cache_acertos': 1, 'cache_faltas': 1}
+
+
+def test_nova_versao_do_extrator_invalida(cache, arquivo):
+    funcao, chamadas = contador()
+    cache.extrair(arquivo, 'v1', funcao)
+    assert cache.extrair(arquivo, 'v2', funcao) == {'lido': 2}
+    assert cache.extrair(arquivo, 'v1', funcao) == {'lido': 1}  # a entrada da versão anterior continua lá
+
+
+def test_conteudo_alterado_invalida(cache, arquivo):
+    funcao, chamadas = contador()
+    cache.extrair(arquivo, 'v1', funcao)
+    with open(arquivo, 'w') as saida:
+        saida.write('segunda versão')
+    assert cache.extrair(arquivo, 'v1', funcao) == {'lido': 2}
+
+
+def test_mesmo_conteudo_com_outro_nome_reaproveita(cache, arquivo, tmp_path):
+    funcao, chamadas = contador()
+    cache.extrair(arquivo, 'v1', funcao)
+    copia = str(tmp_path / 'copia.txt')
+    shutil.copy(arquivo, copia)
+    assert cache.extrair(copia, 'v1', funcao, hash_arquivo(copia)) == {'lido': 1}
+
+
+def test_podar_remove_as_menos_usadas(tmp_path):
+    with CacheExtracao(str(tmp_path / 'cache.sqlite3'), 40) as cache:
+        for numero in range(4):
+            cache.guardar(f'chave{numero}', {'n': numero})  # 8 bytes cada
+        cache.obter('chave0')  # usada por último: fica
+        cache.limite_bytes = 16
+        assert cache.podar() == 2
+        restantes = {chave for (chave,) in cache.conexao.execute('SELECT chave FROM extracoes')}
+    assert restantes == {'chave0', 'chave3'}
+
+
+def test_versao_do_perfil_e_do_extrator_entram_na_chave(cache, monkeypatch, tmp_path):
+    extratores.extrair_faturas(XML_CEGAS, cache)
+    lidos = metricas.resumo()['contadores']['cache_faltas']
+    extratores.extrair_faturas(XML_CEGAS, cache)
+    assert metricas.resumo()['contadores']['cache_faltas'] == lidos
+
+    monkeypatch.setattr(extratores, 'EXTRATORES', [
+        dataclasses.replace(extrator, versao=extrator.versao + '.1') if extrator.nome == 'nfe' else extrator
+        for extrator in extratores.EXTRATORES])
+    extratores.extrair_faturas(XML_CEGAS, cache)
+    assert metricas.resumo()['contadores']['cache_faltas'] == lidos + 1
+
+    # O mesmo conteúdo com um nome que escolhe outro perfil também é lido de novo
+    outro_nome = str(tmp_path / '24.00_DIST_COMGAS_GN_779_24.xml')
+    shutil.copy(XML_CEGAS, outro_nome)
+    extratores.extrair_faturas(outro_nome, cache)
+    assert metricas.resumo()['contadores']['cache_faltas'] == lidos + 2
+
+
+@pytest.mark.parametrize('modulo, amostra', [('mainxml', XML_CEGAS), ('main', PDF_CEGAS)])
+def test_erro_de_leitura_nao_vai_para_o_cache(cache, monkeypatch, modulo, amostra):
+    # O hash foi calculado, mas a leitura do arquivo falha (compartilhamento fora do ar, arquivo bloqueado)
+    leitor = importlib.import_module(modulo)
+    abrir = leitor.abrir_binario
+
+    def bloqueado(fonte):
+        raise PermissionError(13, 'arquivo em uso por outro processo')
+
+    monkeypatch.setattr(leitor, 'abrir_binario', bloqueado)
+    assert extratores.extrair_faturas(amostra, cache) == ([], 0)
+    assert metricas.resumo()['contadores']['erro_leitura'] == 1
+    assert cache.conexao.execute('SELECT COUNT(*) FROM extracoes').fetchone()[0] == 0
+
+    monkeypatch.setattr(leitor, 'abrir_binario', abrir)
+    faturas, _ = extratores.extrair_faturas(amostra, cache)
+    assert len(faturas) == 1
@@ -0,0 +1,107 @@
+import os
+import socket
+import stat
+import sys
+import subprocess
+import threading
+
+import pytest
+
+import cli
+import config
+from conftest import RAIZ
+
+
+@pytest.fixture
+def chave_em(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'servidor.chave')
+    monkeypatch.setattr(config, 'caminho_chave_servidor', caminho)
+    monkeypatch.delenv('CEGAS_CHAVE_SERVIDOR', raising=False)
+    return caminho
+
+
+def test_cliente_sem_chave_nao_procura_o_servidor(chave_em):
+    assert cli.chave_servidor() is None
+    assert not os.path.exists(chave_em)
+
+
+def test_servidor_cria_chave_aleatoria_so_para_o_usuario(chave_em):
+    chave = cli.chave_servidor(criar=True)
+    assert len(chave) == 64 and chave != b'cegas-faturas'
+    assert cli.chave_servidor() == chave
+    if os.name == 'posix':
+        assert stat.S_IMODE(os.stat(chave_em).st_mode) == 0o600
+
+
+def test_cada_maquina_tem_a_sua_chave(tmp_path, monkeypatch, chave_em):
+    primeira = cli.chave_servidor(criar=True)
+    monkeypatch.setattr(config, 'caminho_chave_servidor', str(tmp_path / 'outra.chave'))
+    assert cli.chave_servidor(criar=True) != primeira
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='permissões POSIX')
+def test_chave_legivel_por_outros_e_recusada(chave_em):
+    cli.chave_servidor(criar=True)
+    os.chmod(chave_em, 0o644)
+    with pytest.raises(PermissionError):
+        cli.chave_servidor()
+
+
+def test_variavel_de_ambiente_tem_precedencia(chave_em, monkeypatch):
+    monkeypatch.setenv('CEGAS_CHAVE_SERVIDOR', 'segredo')
+    assert cli.chave_servidor(criar=True) == b'segredo'
+    assert not os.path.exists(chave_em)
+
+
+def test_servidor_recusa_chave_errada(chave_em, monkeypatch):
+    with socket.socket() as livre:
+        livre.bind(('127.0.0.1', 0))
+        endereco = livre.getsockname()
+    monkeypatch.setattr(config, 'endereco_servidor', endereco)
+    servidor = threading.Thread(target=cli.servir, daemon=True)
+    servidor.start()
+    monkeypatch.setenv('CEGAS_CHAVE_SERVIDOR', 'cegas-faturas')  # a chave fixa das versões anteriores
+    for _ in range(100):
+        resposta = cli._pelo_servidor(['relatorio'])
+        if resposta is not None:
+            break
+        threading.Event().wait(0.05)  # o servidor ainda não está ouvindo
+    codigo, saida = resposta
+    assert codigo == 1 and 'recusou' in saida
+
+    monkeypatch.delenv('CEGAS_CHAVE_SERVIDOR')
+    chave = cli.chave_servidor()
+
+    monkeypatch.setenv('CEGAS_CHAVE_SERVIDOR', chave.decode())
+    assert cli._pelo_servidor(['parar']) == (0, 'Servidor encerrado.\n')
+    servidor.join(5)
+    assert not servidor.is_alive()
+
+
+def test_comando_xml_nao_importa_pandas_nem_leitor_de_pdf(pasta):
+    # Em um interpretador novo (os módulos carregados pelos outros testes não contam), processando de fato a pasta
+    argv = ['xml', str(pasta / 'Faturas'), '--destino', str(pasta / 'Lidos'),
+            '--banco', str(pasta / 'livro.sqlite3'), '--cache', '']
+    codigo = (f'import sys, cli; cli.executar({argv!r}); '
+              'print(sorted(m for m in ("pandas", "PyPDF2", "pdfplumber", "fitz") if m in sys.modules))')
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip().splitlines()[-1] == '[]'
+    assert os.listdir(pasta / 'Lidos')
+
+
+@pytest.mark.parametrize('comandos', [('lote', 'async'), ('async', 'lote')])
+def test_servidor_alterna_lote_e_async_com_o_mesmo_cache(pasta, comandos):
+    # No servidor, o lote abre o cache na thread principal e o async (workers=1) na thread de extração
+    import lote
+
+    try:
+        for posicao, comando in enumerate(comandos):
+            argv = [comando, str(pasta / 'Faturas'), '--workers', '1', '--destino', str(pasta / 'Lidos'),
+                    '--banco', str(pasta / f'livro{posicao}.sqlite3'), '--cache', str(pasta / 'cache.sqlite3')]
+            codigo, saida = cli._atender(argv, str(pasta))
+            assert codigo == 0, saida
+            assert 'Lote concluído: 8 inseridos' in saida
+            for nome in os.listdir(pasta / 'Lidos'):
+                os.replace(pasta / 'Lidos' / nome, pasta / 'Faturas' / nome)
+    finally:
+        lote.iniciar_processo('')
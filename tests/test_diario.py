@@ -0,0 +1,102 @@
+import os
+import shutil
+
+import pytest
+
+import lote
+import lote_async
+from armazenamento import abrir_livro
+from conftest import processar
+from extratores import extrair_faturas
+
+NOMES = ['24.00_DIST_CEGAS_GN_1135_25.xml', '24.00_DIST_CEGAS_GN_1136_26.xml', '24.00_DIST_CEGAS_GN_1138_27.xml']
+pytestmark = pytest.mark.parametrize('pasta', [NOMES], indirect=True)
+
+
+def gravar_sem_mover(pasta):
+    # Execução que caiu entre o commit do lote e os movimentos
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        escritor = lote.EscritorLote(livro, str(pasta / 'Lidos'), mover=False)
+        for caminho in lote.listar_faturas(str(pasta / 'Faturas')):
+            escritor.adicionar_arquivo(extrair_faturas(caminho)[0], caminho)
+        escritor.gravar()
+        assert len(livro.movimentos_pendentes()) == len(NOMES)
+
+
+def test_lote_move_e_limpa_o_diario(pasta):
+    assert processar(pasta)['inseridos'] == 3
+    assert sorted(os.listdir(pasta / 'Lidos')) == NOMES
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert livro.movimentos_pendentes() == []
+
+
+def test_execucao_interrompida_e_retomada(pasta):
+    gravar_sem_mover(pasta)
+    assert os.listdir(pasta / 'Lidos') == []
+
+    resumo = processar(pasta)
+    # Os movimentos pendentes são feitos antes de listar a pasta: nada é lido de novo
+    assert resumo == {'inseridos': 0, 'duplicados': 0, 'falhas': 0}
+    assert sorted(os.listdir(pasta / 'Lidos')) == NOMES
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert livro.total() == 3
+        assert livro.movimentos_pendentes() == []
+
+
+def test_retomada_de_movimento_ja_feito(pasta):
+    gravar_sem_mover(pasta)
+    shutil.move(str(pasta / 'Faturas' / NOMES[0]), str(pasta / 'Lidos' / NOMES[0]))
+    processar(pasta)
+    assert sorted(os.listdir(pasta / 'Lidos')) == NOMES
+
+
+def test_desfazer_tira_do_livro_e_devolve_os_arquivos(pasta):
+    gravar_sem_mover(pasta)
+    shutil.move(str(pasta / 'Faturas' / NOMES[0]), str(pasta / 'Lidos' / NOMES[0]))
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert lote.desfazer_pendentes(livro) == 3
+        assert livro.total() == 0
+        assert livro.consultar_agregados() == []
+        assert livro.movimentos_pendentes() == []
+    assert sorted(os.listdir(pasta / 'Faturas')) == NOMES
+    # As chaves saíram do índice: a próxima execução grava as faturas de novo
+    assert processar(pasta)['inseridos'] == 3
+
+
+def test_movimento_que_falha_fica_pendente_sem_travar_o_lote(pasta, monkeypatch):
+    mover = lote.mover_arquivo
+
+    def arquivo_aberto(origem, destino):
+        if os.path.basename(origem) == NOMES[1]:
+            raise PermissionError(13, 'O arquivo está aberto em outro programa', origem)
+        mover(origem, destino)
+
+    monkeypatch.setattr(lote, 'mover_arquivo', arquivo_aberto)
+    assert processar(pasta)['inseridos'] == 3
+    assert processar(pasta) == {'inseridos': 0, 'duplicados': 0, 'falhas': 0}  # a execução seguinte não trava
+    assert os.listdir(pasta / 'Faturas') == [NOMES[1]]
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert [os.path.basename(origem) for _, origem, _ in livro.movimentos_pendentes()] == [NOMES[1]]
+
+    monkeypatch.setattr(lote, 'mover_arquivo', mover)
+    processar(pasta)
+    assert sorted(os.listdir(pasta / 'Lidos')) == NOMES
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert livro.movimentos_pendentes() == []
+
+
+def test_async_deixa_pendente_o_movimento_que_falha(pasta, monkeypatch):
+    mover = lote.mover_arquivo
+
+    def arquivo_aberto(origem, destino):
+        if os.path.basename(origem) == NOMES[0]:
+            raise PermissionError(13, 'O arquivo está aberto em outro programa', origem)
+        mover(origem, destino)
+
+    monkeypatch.setattr(lote, 'mover_arquivo', arquivo_aberto)
+    resumo = lote_async.processar_lote_assincrono(str(pasta / 'Faturas'), workers=1, diretorio_destino=str(pasta / 'Lidos'),
+                                                  caminho_banco=str(pasta / 'livro.sqlite3'), caminho_cache='')
+    assert resumo['inseridos'] == 3
+    assert sorted(os.listdir(pasta / 'Lidos')) == NOMES[1:]
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert len(livro.movimentos_pendentes()) == 1
@@ -0,0 +1,68 @@
+import os
+import re
+
+import pytest
+
+import extratores
+import main
+from armazenamento import LivroFaturas
+from conftest import RAIZ
+from duplicados import chaves_da_linha
+
+PDF_CEGAS = os.path.join(RAIZ, 'Lidos', '9nyBBzvKcrEJtqFZ7RwcJndFMV3N2p.pdf')
+XML_CEGAS = os.path.join(RAIZ, 'Faturas', '24.00_DIST_CEGAS_GN_779_24.xml')
+
+
+@pytest.fixture
+def livro(tmp_path):
+    with LivroFaturas(str(tmp_path / 'livro.sqlite3')) as livro:
+        yield livro
+
+
+@pytest.fixture
+def xml_do_pdf(tmp_path):
+    # A NF-e em XML da mesma nota do PDF: mesma chave de acesso e mesmo destinatário
+    texto = open(XML_CEGAS, encoding='utf-8').read()
+    texto = re.sub(r'Id="NFe\d+"', 'Id="NFe23241173759185000196550010004082101123634387"', texto)
+    texto = re.sub(r'(<dest><CNPJ>)\d+', r'\g<1>07206816002835', texto)
+    caminho = tmp_path / '24.00_DIST_CEGAS_GN_408210.xml'
+    caminho.write_text(texto, encoding='utf-8')
+    return str(caminho)
+
+
+def test_chave_de_acesso_lida_do_danfe():
+    fatura = extratores.extrair_fatura(PDF_CEGAS)
+    assert fatura.chave_acesso == '23241173759185000196550010004082101123634387'
+    assert 'nfe:23241173759185000196550010004082101123634387' in chaves_da_linha(fatura.linha())
+
+
+def test_chave_de_acesso_ignora_outros_numeros():
+    assert main.chave_acesso('linha digitável 2379 2367 0290 0000 1239 4240 1601 0803 1993 9003 0736') == ''
+    assert main.chave_acesso('MED2324 1273 7591 8500 0196 5500 1000 4083 1510 0608 0194 Consulta') == \
+        '23241273759185000196550010004083151006080194'
+
+
+def test_pdf_e_xml_da_mesma_nota_sao_duplicados(livro, xml_do_pdf):
+    pdf = extratores.extrair_fatura(PDF_CEGAS)
+    xml = extratores.extrair_fatura(xml_do_pdf)
+    assert livro.inserir_novas([pdf.linha()]) == [True]
+    assert livro.inserir_novas([xml.linha()]) == [False]
+    assert livro.total() == 1
+
+
+def test_xml_e_depois_pdf_tambem(livro, xml_do_pdf):
+    xml = extratores.extrair_fatura(xml_do_pdf)
+    pdf = extratores.extrair_fatura(PDF_CEGAS)
+    assert livro.inserir_novas([xml.linha(), pdf.linha()]) == [True, False]
+
+
+def test_chave_de_campos_igual_nos_dois_formatos():
+    # O PDF traz o CNPJ formatado e a data em dd/mm/aaaa; o XML, só dígitos e a data ISO
+    do_pdf = {'CNPJ': '07.206.816/0028-35', 'Data Início': '27/11/2024', 'Data Fim': '23/12/2024', 'Valor Total': 307361.67}
+    do_xml = {'CNPJ': '07206816002835', 'Data Início': '2024-11-27', 'Data Fim': '2024-12-23', 'Valor Total': 307361.670000001}
+    assert chaves_da_linha(do_pdf) == chaves_da_linha(do_xml)
+
+
+def test_duplicado_dentro_do_mesmo_lote(livro):
+    fatura = extratores.extrair_fatura(PDF_CEGAS)
+    assert livro.inserir_novas([fatura.linha(), fatura.linha()]) == [True, False]
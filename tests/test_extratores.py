@@ -0,0 +1,80 @@
+import os
+import re
+import shutil
+
+import pytest
+
+import extratores
+import metricas
+from conftest import RAIZ
+
+XML_CEGAS = os.path.join(RAIZ, 'Faturas', '24.00_DIST_CEGAS_GN_779_24.xml')
+PDF_CEGAS = os.path.join(RAIZ, 'Lidos', '9nyBBzvKcrEJtqFZ7RwcJndFMV3N2p.pdf')
+
+
+def test_formato_pelo_conteudo_e_nao_pela_extensao(tmp_path):
+    xml = str(tmp_path / 'nota.pdf')
+    pdf = str(tmp_path / 'fatura.xml')
+    shutil.copy(XML_CEGAS, xml)
+    shutil.copy(PDF_CEGAS, pdf)
+    assert extratores.extrair_fatura(xml).formato == 'nfe'
+    assert extratores.extrair_fatura(pdf).formato == 'pdf'
+
+
+def test_formato_nao_suportado(tmp_path):
+    caminho = tmp_path / 'planilha.csv'
+    caminho.write_text('CNPJ;VALOR\n')
+    assert extratores.extrair_faturas(str(caminho)) == ([], 0)
+    assert metricas.resumo()['contadores'] == {'formato_nao_suportado': 1}
+
+
+def test_so_os_formatos_pedidos():
+    assert extratores.extrair_faturas(PDF_CEGAS, formatos=('nfe',)) == ([], 0)
+    faturas, recusadas = extratores.extrair_faturas(XML_CEGAS, formatos=('nfe',))
+    assert (len(faturas), recusadas) == (1, 0)
+
+
+def test_fatura_com_campo_faltando_fica_de_fora(tmp_path):
+    caminho = tmp_path / 'nota.xml'
+    caminho.write_text(open(XML_CEGAS, encoding='utf-8').read().replace('PERIODO DE', 'REFERENTE A'), encoding='utf-8')
+    assert extratores.extrair_faturas(str(caminho)) == ([], 1)
+    assert metricas.resumo()['contadores']['campos_faltantes'] == 1
+
+
+@pytest.mark.parametrize('periodo', ['PERIODO DE 31/02/2024 A 28/03/2024', 'PERIODO DE MARCO A ABRIL'])
+def test_data_que_nao_se_converte_conta_como_campo_faltante(tmp_path, periodo):
+    caminho = tmp_path / 'nota.xml'
+    texto = open(XML_CEGAS, encoding='utf-8').read()
+    caminho.write_text(re.sub(r'PERIODO DE \S+ A \S+', periodo, texto), encoding='utf-8')
+    assert extratores.extrair_faturas(str(caminho)) == ([], 1)
+
+
+def test_conteudo_em_memoria_da_o_mesmo_resultado():
+    conteudo = open(XML_CEGAS, 'rb').read()
+    assert extratores.extrair_faturas(XML_CEGAS, conteudo=conteudo) == extratores.extrair_faturas(XML_CEGAS)
+
+
+def test_xml_que_nao_e_nfe_usa_as_regex_do_texto(tmp_path):
+    caminho = tmp_path / 'fatura.xml'
+    caminho.write_text('<fatura>sem campos</fatura>')
+    assert extratores.extrair_faturas(str(caminho)) == ([], 1)
+    assert metricas.resumo()['contadores']['campos_faltantes'] == 1
+
+
+def test_numeros_e_datas_convertidos_na_criacao():
+    assert extratores.ler_decimal('0307.361,67') == 307361.67
+    assert extratores.ler_decimal('252223.10', '.') == 252223.10
+    assert extratores.ler_decimal('') is None and extratores.ler_decimal('abc') is None
+    assert extratores.ler_data('30/11/2024') == extratores.date(2024, 11, 30)
+    assert extratores.ler_data('30.11.2024') == extratores.date(2024, 11, 30)
+    assert extratores.ler_data('2024-12-31T23:59:59-03:00') == extratores.date(2024, 12, 31)
+    assert extratores.ler_data('31/02/2024') is None
+
+
+def test_fatura_de_pdf_e_de_nfe():
+    pdf = extratores.extrair_fatura(PDF_CEGAS)
+    assert (pdf.valor_total, pdf.valor_icms, pdf.correcao_pcs) == (307361.67, 61472.33, 0.9488)
+    assert pdf.data_fim == extratores.date(2024, 12, 23)
+    nfe = extratores.extrair_fatura(XML_CEGAS)
+    assert (nfe.valor_total, nfe.volume_total, nfe.correcao_pcs) == (252223.10, 57174.0, 1.0)
+    assert not hasattr(nfe, '__dict__')
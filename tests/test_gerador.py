@@ -0,0 +1,44 @@
+import filecmp
+
+import pytest
+
+import extratores
+from benchmarks import gerador
+from duplicados import chaves_da_linha
+
+
+def _chaves(arquivos):
+    chaves = []
+    for caminho in arquivos:
+        for fatura in extratores.extrair_faturas(caminho)[0]:
+            chaves.append(tuple(chaves_da_linha(fatura.linha())))
+    return chaves
+
+
+def test_sem_duplicados_cada_nfe_e_uma_fatura_diferente(tmp_path):
+    arquivos = gerador.gerar(str(tmp_path), quantidade_xml=40)
+    chaves = _chaves(arquivos)
+    assert len(chaves) == 40
+    assert len({chave for linha in chaves for chave in linha}) == 2 * 40  # campos e chave de acesso
+
+
+def test_sem_duplicados_cada_pdf_e_uma_fatura_diferente(tmp_path):
+    pytest.importorskip('PyPDF2')
+    arquivos = gerador.gerar(str(tmp_path), quantidade_pdf=10)
+    chaves = _chaves(arquivos)
+    assert len(chaves) == 10
+    assert len({linha[0] for linha in chaves}) == 10
+    assert all(len(linha) == 2 for linha in chaves)  # a chave de acesso do texto também é lida
+
+
+def test_fracao_de_duplicados_repete_arquivos_anteriores(tmp_path):
+    arquivos = gerador.gerar(str(tmp_path), quantidade_xml=200, duplicados=0.3, semente=7)
+    repetidos = sum(any(filecmp.cmp(caminho, anterior, shallow=False) for anterior in arquivos[max(0, i - 100):i])
+                    for i, caminho in enumerate(arquivos))
+    assert 40 <= repetidos <= 80
+
+
+def test_mesma_semente_gera_os_mesmos_arquivos(tmp_path):
+    primeiro = gerador.gerar(str(tmp_path / 'a'), quantidade_xml=5, semente=3)
+    segundo = gerador.gerar(str(tmp_path / 'b'), quantidade_xml=5, semente=3)
+    assert all(filecmp.cmp(a, b, shallow=False) for a, b in zip(primeiro, segundo))
@@ -0,0 +1,70 @@
+import importlib.util
+
+import pytest
+
+import main
+from benchmarks import gerador
+from benchmarks.gerador import escrever_pdf
+
+
+@pytest.fixture
+def pdf_de_paginas(tmp_path):
+    PyPDF2 = pytest.importorskip('PyPDF2')
+
+    escritor = PyPDF2.PdfWriter()
+    for numero in range(1, 4):
+        pagina = str(tmp_path / f'pagina{numero}.pdf')
+        escrever_pdf(pagina, f'PAGINA {numero}')
+        escritor.add_page(PyPDF2.PdfReader(pagina).pages[0])
+    caminho = str(tmp_path / 'tres_paginas.pdf')
+    with open(caminho, 'wb') as saida:
+        escritor.write(saida)
+    return caminho
+
+
+def test_paginas_escolhidas_na_ordem(pdf_de_paginas):
+    assert main.extrair_texto(pdf_de_paginas) == 'PAGINA 1 PAGINA 2 PAGINA 3'
+    assert main.extrair_texto(pdf_de_paginas, paginas=[2, 0, 9]) == 'PAGINA 3 PAGINA 1'
+
+
+def test_leitura_para_quando_pedido(pdf_de_paginas):
+    vistos = []
+
+    def parar(texto):
+        vistos.append(texto)
+        return 'PAGINA 2' in texto
+
+    assert main.extrair_texto(pdf_de_paginas, parar_quando=parar) == 'PAGINA 1 PAGINA 2'
+    assert len(vistos) == 2
+
+
+def test_ler_faturas_para_na_pagina_que_completa_a_fatura(monkeypatch, tmp_path):
+    PyPDF2 = pytest.importorskip('PyPDF2')
+
+    texto, _ = gerador.modelos_pdf()[0]
+    escritor = PyPDF2.PdfWriter()
+    for numero, conteudo in enumerate([texto, 'VERSO', 'CONDIÇÕES GERAIS']):
+        pagina = str(tmp_path / f'pagina{numero}.pdf')
+        escrever_pdf(pagina, conteudo)
+        escritor.add_page(PyPDF2.PdfReader(pagina).pages[0])
+    caminho = str(tmp_path / 'fatura.pdf')
+    with open(caminho, 'wb') as saida:
+        escritor.write(saida)
+
+    lidas = []
+    paginas_texto = main.paginas_texto
+
+    def contar_paginas(*argumentos):
+        for pagina in paginas_texto(*argumentos):
+            lidas.append(pagina)
+            yield pagina
+
+    monkeypatch.setattr(main, 'paginas_texto', contar_paginas)
+    assert len(main.ler_faturas(caminho, varias=False)) == 1
+    assert len(lidas) == 1
+
+
+@pytest.mark.skipif(importlib.util.find_spec('pypdfium2') is not None, reason='pypdfium2 instalado')
+def test_backend_nao_instalado_e_avisado(pdf_de_paginas):
+    with pytest.raises(ImportError):
+        main.extrair_texto(pdf_de_paginas, backend='pypdfium2')
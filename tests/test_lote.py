@@ -0,0 +1,51 @@
+import os
+import sqlite3
+
+import pytest
+
+import lote
+from armazenamento import abrir_livro
+from conftest import copiar_pasta, processar
+
+
+@pytest.fixture(autouse=True)
+def _sem_cache():
+    yield
+    lote.iniciar_processo('')
+
+
+def test_comando_sem_cache_nao_usa_o_cache_do_anterior(tmp_path):
+    lote.iniciar_processo(str(tmp_path / 'cache.sqlite3'))
+    anterior = lote._cache
+    lote.iniciar_processo('')
+    assert lote._cache is None
+    with pytest.raises(sqlite3.ProgrammingError):
+        anterior.conexao.execute('SELECT 1')  # a conexão do comando anterior foi fechada
+
+
+def test_cada_comando_abre_o_seu_cache(tmp_path):
+    lote.iniciar_processo(str(tmp_path / 'a.sqlite3'), formatos=('nfe',))
+    lote.iniciar_processo(str(tmp_path / 'b.sqlite3'))
+    assert lote._cache.conexao.execute('PRAGMA database_list').fetchone()[2].endswith('b.sqlite3')
+    assert lote._formatos is None
+
+
+def processar_e_listar(pasta, workers):
+    resumo = processar(pasta, workers, caminho_cache=str(pasta / 'cache.sqlite3'))
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        gravado = livro.conexao.execute('SELECT nome_arquivo, cnpj, valor_total FROM faturas ORDER BY id').fetchall()
+    return resumo, gravado, sorted(os.listdir(pasta / 'Lidos')), sorted(os.listdir(pasta / 'Faturas'))
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_paralelo_igual_ao_serial(tmp_path, workers):
+    serial = processar_e_listar(copiar_pasta(tmp_path / 'serial'), workers=1)
+    paralelo = processar_e_listar(copiar_pasta(tmp_path / 'paralelo'), workers=workers)
+    assert paralelo == serial
+
+    resumo, gravado, lidos, restantes = serial
+    assert resumo['inseridos'] == len(gravado) == len(lidos)
+    assert resumo['duplicados'] > 0 and resumo['falhas'] == 1  # leia-me.txt
+    assert 'copiando.xml.part' in restantes and 'leia-me.txt' in restantes
+    # O primeiro de cada grupo de duplicados, na ordem da pasta, é o que entra
+    assert [nome for nome, _, _ in gravado] == sorted(nome for nome, _, _ in gravado)
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import lote
+import lote_async
+from armazenamento import abrir_livro
+from conftest import copiar_pasta, processar
+
+
+def gravado(pasta):
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        return livro.conexao.execute('SELECT nome_arquivo, cnpj, valor_total FROM faturas ORDER BY id').fetchall(), livro.movimentos_pendentes()
+
+
+@pytest.mark.parametrize('workers, leituras', [(1, 2), (2, 4)])
+def test_assincrono_igual_ao_lote(tmp_path, workers, leituras):
+    serial = copiar_pasta(tmp_path / 'serial')
+    assincrono = copiar_pasta(tmp_path / 'async')
+    esperado = processar(serial)
+    resumo = lote_async.processar_lote_assincrono(str(assincrono / 'Faturas'), workers=workers, leituras=leituras,
+                                                  diretorio_destino=str(assincrono / 'Lidos'),
+                                                  caminho_banco=str(assincrono / 'livro.sqlite3'), caminho_cache='')
+    assert resumo == esperado
+    assert gravado(assincrono) == gravado(serial)
+    assert gravado(assincrono)[1] == []
+    assert sorted(os.listdir(assincrono / 'Lidos')) == sorted(os.listdir(serial / 'Lidos'))
+    assert sorted(os.listdir(assincrono / 'Faturas')) == sorted(os.listdir(serial / 'Faturas'))
+
+
+def test_assincrono_retoma_os_movimentos_pendentes(pasta):
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        escritor = lote.EscritorLote(livro, str(pasta / 'Lidos'), mover=False)
+        caminho = lote.listar_faturas(str(pasta / 'Faturas'))[0]
+        escritor.adicionar_arquivo(lote.extrair_faturas(caminho)[0], caminho)
+        escritor.gravar()
+    resumo = lote_async.processar_lote_assincrono(str(pasta / 'Faturas'), workers=1, diretorio_destino=str(pasta / 'Lidos'),
+                                                  caminho_banco=str(pasta / 'livro.sqlite3'), caminho_cache='')
+    assert os.path.basename(caminho) in os.listdir(pasta / 'Lidos')
+    assert resumo['duplicados'] > 0
+    assert gravado(pasta)[1] == []
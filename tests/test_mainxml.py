@@ -0,0 +1,42 @@
+import os
+
+import mainxml
+from conftest import RAIZ
+from leitura import ArquivoEmMemoria
+
+XML_CEGAS = os.path.join(RAIZ, 'Faturas', '24.00_DIST_CEGAS_GN_779_24.xml')
+
+
+def test_campos_da_nfe():
+    fatura, = mainxml.ler_faturas_xml(XML_CEGAS)
+    assert fatura == {
+        'chave_acesso': 'NFe23241273759185000196550010004100491054490606', 'cnpj': '07206816000115',
+        'valor_total': '252223.10', 'volume_total': '57174.0000', 'data_emissao': '2024-12-31',
+        'data_inicio': '25/12/2024', 'data_fim': '31/12/2024', 'numero_fatura': '410049', 'valor_icms': '50444.62',
+        'correcao_pcs': '1,000', 'distribuidora': 'Cegás',
+    }
+
+
+def test_so_o_primeiro_det_e_lido(tmp_path):
+    texto = open(XML_CEGAS, encoding='utf-8').read()
+    inicio, fim = texto.index('<det '), texto.index('</det>') + len('</det>')
+    segundo = texto[inicio:fim].replace('<qCom>57174.0000</qCom>', '<qCom>1.0000</qCom>').replace('nItem="1"', 'nItem="2"')
+    caminho = tmp_path / 'nota.xml'
+    caminho.write_text(texto[:fim] + segundo + texto[fim:], encoding='utf-8')
+    fatura, = mainxml.ler_faturas_xml(str(caminho))
+    assert fatura['volume_total'] == '57174.0000'
+
+
+def test_assinatura_e_protocolo_nao_sao_analisados():
+    blocos = b''.join(mainxml._blocos_relevantes(open(XML_CEGAS, 'rb'), 64))
+    assert b'<Signature' not in blocos and b'<protNFe' not in blocos
+    assert b'<infNFe' in blocos and b'</infNFe>' in blocos
+
+
+def test_le_da_memoria():
+    conteudo = open(XML_CEGAS, 'rb').read()
+    assert mainxml.ler_faturas_xml(ArquivoEmMemoria(XML_CEGAS, conteudo)) == mainxml.ler_faturas_xml(XML_CEGAS)
+
+
+def test_xml_quebrado_devolve_lista_vazia():
+    assert mainxml.ler_faturas_xml(ArquivoEmMemoria('quebrado.xml', b'<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe"><NFe>')) == []
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import metricas
+from conftest import RAIZ, processar
+
+# As seis primeiras NF-e de exemplo, três delas repetidas
+SEIS_NFE = pytest.mark.parametrize('pasta', [sorted(os.listdir(os.path.join(RAIZ, 'Faturas')))[:6]], indirect=True)
+
+
+@pytest.fixture
+def juntados(monkeypatch):
+    # Quantas medições cada resultado mandou para o processo principal juntar
+    tamanhos = []
+    juntar = metricas.juntar
+
+    def contar_juntados(medido):
+        tamanhos.append(sum(len(medida[3]) for medida in medido['tempos'].values()))
+        juntar(medido)
+
+    monkeypatch.setattr(metricas, 'juntar', contar_juntados)
+    return tamanhos
+
+
+@SEIS_NFE
+def test_um_processo_nao_junta_as_proprias_medicoes(pasta, juntados):
+    metricas.contar('antes')
+    with metricas.medir('antes'):
+        pass
+    resumo = processar(pasta, workers=1)
+    assert (resumo['inseridos'], resumo['duplicados']) == (3, 3)  # a pasta de exemplo repete três NF-e
+    assert juntados == [0] * 6
+    medido = metricas.resumo()
+    assert medido['etapas']['leitura_xml']['chamadas'] == 6
+    assert medido['etapas']['antes']['chamadas'] == 1
+    assert medido['contadores']['extraidos_nfe'] == 6
+    assert len(medido['mais_lentos']) == 6
+
+
+@SEIS_NFE
+def test_processos_de_trabalho_mandam_o_que_mediram(pasta, juntados):
+    resumo = processar(pasta, workers=2)
+    assert (resumo['inseridos'], resumo['duplicados']) == (3, 3)
+    assert sum(juntados) > 0
+    medido = metricas.resumo()
+    assert medido['etapas']['leitura_xml']['chamadas'] == 6
+    assert medido['contadores']['extraidos_nfe'] == 6
+
+
+def test_juntar_amostra_parcial():
+    metricas.juntar({'tempos': {'regex': [3, 0.6, 0.3, [0.1, 0.2]]}, 'contadores': {'x': 2}})
+    etapa = metricas.resumo()['etapas']['regex']
+    assert etapa['chamadas'] == 3
+    assert etapa['total_s'] == pytest.approx(0.6)
+    assert etapa['max_ms'] == pytest.approx(300)
+    assert metricas.resumo()['contadores'] == {'x': 2}
+
+
+@SEIS_NFE
+def test_cprofile_so_dos_arquivos_mais_lentos(pasta):
+    processar(pasta, pasta_cprofile=str(pasta / 'cprofile'))
+    lentos = {nome for _, nome in metricas._mais_lentos}
+    gravados = set(os.listdir(pasta / 'cprofile'))
+    assert gravados == {nome + '.prof' for nome in lentos} | {nome + '.txt' for nome in lentos}
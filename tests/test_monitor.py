@@ -0,0 +1,53 @@
+import os
+import json
+import shutil
+
+import pytest
+
+import config
+import monitor
+from armazenamento import abrir_livro
+from cache import CacheExtracao
+
+NOMES = ['24.00_DIST_CEGAS_GN_1135_25.xml', '24.00_DIST_CEGAS_GN_1136_26.xml']
+pytestmark = pytest.mark.parametrize('pasta', [NOMES], indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def _config(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'caminho_cache', str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(config, 'monitor_estabilidade', 0)
+
+
+def monitorar(pasta, rodadas):
+    monitor.monitorar(str(pasta / 'Faturas'), str(pasta / 'Lidos'), str(pasta / 'livro.sqlite3'),
+                      str(pasta / 'estado.json'), intervalo=0.01, rodadas=rodadas)
+
+
+def entradas_do_cache():
+    with CacheExtracao(config.caminho_cache, config.cache_limite_bytes) as cache:
+        return cache.conexao.execute('SELECT COUNT(*) FROM extracoes').fetchone()[0]
+
+
+def test_arquivo_estavel_e_lido_e_movido(pasta):
+    monitorar(pasta, rodadas=2)  # primeira rodada vê os arquivos, a segunda os lê
+    assert sorted(os.listdir(pasta / 'Lidos')) == NOMES
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert livro.total() == 2
+
+
+def test_recusado_nao_e_lido_de_novo_depois_de_reiniciar(pasta):
+    shutil.copy(pasta / 'Faturas' / NOMES[0], pasta / 'Faturas' / 'copia_GN_CEGAS_1.xml')
+    monitorar(pasta, rodadas=2)
+    assert os.listdir(pasta / 'Faturas') == ['copia_GN_CEGAS_1.xml']  # duplicado: fica na pasta
+    assert list(json.load(open(pasta / 'estado.json'))) == ['copia_GN_CEGAS_1.xml']
+
+    monitorar(pasta, rodadas=2)
+    with abrir_livro(str(pasta / 'livro.sqlite3')) as livro:
+        assert livro.total() == 2
+
+
+def test_cache_podado_a_cada_rodada(pasta, monkeypatch):
+    monkeypatch.setattr(config, 'cache_limite_bytes', 1)
+    monitorar(pasta, rodadas=2)
+    assert entradas_do_cache() == 0
@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import config
+import extratores
+import ocr
+from cache import CacheExtracao
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with CacheExtracao(str(tmp_path / 'cache.sqlite3'), 1024 * 1024) as cache:
+        yield cache
+
+
+def chaves_ocr(cache):
+    return [chave for (chave,) in cache.conexao.execute('SELECT chave FROM extracoes') if ':ocr:' in chave]
+
+
+def test_ocr_sem_instalacao_nao_vai_para_o_cache(monkeypatch, cache, pdf_sem_texto):
+    def sem_pdf2image(caminho):
+        raise ImportError("No module named 'pdf2image'")
+
+    monkeypatch.setattr(config, 'usar_ocr', True)
+    monkeypatch.setattr(ocr, '_total_paginas', sem_pdf2image)
+    assert extratores.extrair_faturas(pdf_sem_texto, cache) == ([], 1)
+    assert chaves_ocr(cache) == []
+
+
+def test_ocr_desligado_nao_vai_para_o_cache(monkeypatch, cache, pdf_sem_texto):
+    monkeypatch.setattr(config, 'usar_ocr', False)
+    assert extratores.extrair_faturas(pdf_sem_texto, cache) == ([], 1)
+    assert chaves_ocr(cache) == []
+
+
+def test_pdf_e_lido_de_novo_quando_o_ocr_fica_disponivel(monkeypatch, cache, pdf_sem_texto):
+    monkeypatch.setattr(config, 'usar_ocr', False)
+    extratores.extrair_faturas(pdf_sem_texto, cache)
+
+    lidos = {
+        'cnpj': '07.206.816/0028-35', 'valor_total': '1.234,56', 'volume_total': '100', 'data_emissao': '30/11/2024',
+        'data_inicio': '01/11/2024', 'data_fim': '30/11/2024', 'numero_fatura': '000.408.210', 'valor_icms': '246,91',
+        'correcao_pcs': '0.9488',
+    }
+    monkeypatch.setattr(config, 'usar_ocr', True)
+    monkeypatch.setattr(extratores, 'extrair_informacoes_ocr', lambda caminho, corte, extrator: dict(lidos))
+    faturas, _ = extratores.extrair_faturas(pdf_sem_texto, cache)
+    assert [fatura.formato for fatura in faturas] == ['ocr']
+    assert faturas[0].valor_total == 1234.56
+    assert len(chaves_ocr(cache)) == 1
+
+
+# OCR simulado: a página rasterizada é uma ImagemFalsa, cada recorte guarda a página e a caixa,
+# e o "Tesseract" devolve o texto combinado para aquela caixa naquela página
+CNPJ, CNPJ_AJUSTADO, VALOR, VALOR_AJUSTADO = (0, 0, 10, 10), (0, 0, 20, 20), (5, 5, 15, 15), (5, 5, 25, 25)
+CORTE = {'cnpj_ajustado': CNPJ_AJUSTADO, 'cnpj': CNPJ, 'cnpj_ajustado2': (),
+         'valor_total': VALOR, 'valor_total_ajustado': VALOR_AJUSTADO}
+
+
+class ImagemFalsa:
+    def __init__(self, pagina):
+        self.pagina = pagina
+
+    def crop(self, caixa):
+        return (self.pagina, caixa)
+
+
+@pytest.fixture
+def ocr_simulado(monkeypatch):
+    # textos[(página, caixa)] -> texto do recorte; devolve os registros de rasterizações e recortes lidos
+    textos = {}
+    rasterizadas = []
+    lidos = []
+
+    def rasterizar(caminho, pagina):
+        rasterizadas.append(pagina)
+        return ImagemFalsa(pagina)
+
+    def ler(recorte, psm=6):
+        if isinstance(recorte, ImagemFalsa):  # página inteira
+            return ''
+        lidos.append(recorte)
+        return textos.get(recorte, '')
+
+    monkeypatch.setattr(ocr, '_total_paginas', lambda caminho: 3)
+    monkeypatch.setattr(ocr, '_rasterizar', rasterizar)
+    monkeypatch.setattr(ocr, '_ocr', ler)
+    return textos, rasterizadas, lidos
+
+
+def test_coordenada_padrao_vem_antes_das_ajustadas():
+    coordenadas = ocr.coordenadas_por_campo(CORTE)
+    assert coordenadas['cnpj'] == [CNPJ, CNPJ_AJUSTADO]  # a vazia fica de fora
+    assert coordenadas['valor_total'] == [VALOR, VALOR_AJUSTADO]
+    assert coordenadas['data_fim'] == []
+
+
+def test_ajustada_so_para_o_campo_que_falhou(ocr_simulado):
+    textos, rasterizadas, lidos = ocr_simulado
+    textos[(1, VALOR)] = 'R$ 1.234,56'
+    textos[(1, CNPJ_AJUSTADO)] = 'CNPJ 07.206.816/0028-35'
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        informacoes = ocr.ler_recortes(ImagemFalsa(1), ocr.coordenadas_por_campo(CORTE), executor)
+    assert informacoes == {'cnpj': '07.206.816/0028-35', 'valor_total': '1.234,56'}
+    # Primeira rodada: as padrão dos dois campos (em paralelo); segunda: só a ajustada do CNPJ
+    assert set(lidos[:2]) == {(1, CNPJ), (1, VALOR)}
+    assert lidos[2:] == [(1, CNPJ_AJUSTADO)]
+
+
+def test_cada_pagina_rasterizada_uma_vez(ocr_simulado):
+    textos, rasterizadas, lidos = ocr_simulado
+    textos[(1, VALOR)] = '1.234,56'
+    textos[(2, CNPJ)] = '07.206.816/0028-35'
+    informacoes = ocr.extrair_informacoes_ocr('escaneada.pdf', CORTE)
+    assert informacoes == {'cnpj': '07.206.816/0028-35', 'valor_total': '1.234,56'}
+    assert rasterizadas == [1, 2, 3]
+    # Na página 2 só o CNPJ ainda faltava; na 3, nenhum campo com coordenada
+    assert [recorte for recorte in lidos if recorte[0] > 1] == [(2, CNPJ)]
+
+
+def test_para_na_pagina_que_completa_os_campos(ocr_simulado):
+    textos, rasterizadas, lidos = ocr_simulado
+    textos[(1, CNPJ)] = '07.206.816/0028-35'
+    textos[(2, VALOR)] = '1.234,56'
+    extrator = SimpleNamespace(regexes={'cnpj': [], 'valor_total': []}, extrair_informacoes=lambda texto: {})
+    informacoes = ocr.extrair_informacoes_ocr('escaneada.pdf', CORTE, extrator)
+    assert informacoes == {'cnpj': '07.206.816/0028-35', 'valor_total': '1.234,56'}
+    assert rasterizadas == [1, 2]
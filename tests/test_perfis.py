@@ -0,0 +1,61 @@
+import os
+import shutil
+
+import pytest
+
+import config
+import extratores
+import perfis
+from conftest import RAIZ
+
+XML_CEGAS = os.path.join(RAIZ, 'Faturas', '24.00_DIST_CEGAS_GN_779_24.xml')
+PDF_CEGAS = os.path.join(RAIZ, 'Lidos', '9nyBBzvKcrEJtqFZ7RwcJndFMV3N2p.pdf')
+
+
+@pytest.mark.parametrize('nome, esperado', [
+    ('24.00_DIST_CEGAS_GN_779_24.xml', 'CEGAS'),
+    ('FATURA_GN_COMGÁS_2024_11.pdf', 'COMGAS'),
+    ('FATURA_GN_OUTRA_2024.pdf', None),
+    ('9nyBBzvKcrEJtqFZ7RwcJndFMV3N2p.pdf', None),
+])
+def test_perfil_pelo_nome_do_arquivo(nome, esperado):
+    perfil = perfis.do_arquivo(nome)
+    assert (perfil.nome if perfil else None) == esperado
+
+
+def test_perfil_pelo_cnpj_do_emitente():
+    assert perfis.do_cnpj('73.759.185/0001-96') is perfis.CEGAS
+    assert perfis.do_cnpj('61856571000117') is perfis.COMGAS
+    assert perfis.do_cnpj('07.206.816/0028-35') is None  # cliente, não distribuidora
+    assert perfis.do_texto('CLIENTE - 07.206.816/0028-35 COMPANHIA DE GAS - 61.856.571/0001-17') is perfis.COMGAS
+
+
+def test_xml_sem_distribuidora_no_nome_usa_o_emitente(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'perfil_padrao', 'COMGAS')
+    caminho = str(tmp_path / 'nota.xml')
+    shutil.copy(XML_CEGAS, caminho)
+    fatura = extratores.extrair_fatura(caminho)
+    assert fatura.distribuidora == 'Cegás'
+
+
+def test_pdf_sem_distribuidora_no_nome_usa_o_cnpj_do_texto(monkeypatch):
+    monkeypatch.setattr(config, 'perfil_padrao', 'COMGAS')
+    fatura = extratores.extrair_fatura(PDF_CEGAS)
+    assert fatura.distribuidora == 'Cegás'
+    assert fatura.correcao_pcs == pytest.approx(0.9488)  # divisor de PCS do perfil da Cegás
+
+
+def test_nome_do_arquivo_tem_precedencia(tmp_path):
+    caminho = str(tmp_path / 'FATURA_GN_COMGAS_1.xml')
+    shutil.copy(XML_CEGAS, caminho)
+    fatura = extratores.extrair_fatura(caminho)
+    assert fatura.distribuidora == 'Comgás'
+
+
+def test_sem_nome_nem_cnpj_vale_o_perfil_padrao(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'nota.xml')
+    texto = open(XML_CEGAS, encoding='utf-8').read().replace('<CNPJ>73759185000196</CNPJ>', '<CNPJ>11111111000111</CNPJ>', 1)
+    open(caminho, 'w', encoding='utf-8').write(texto)
+    monkeypatch.setattr(config, 'perfil_padrao', 'COMGAS')
+    fatura = extratores.extrair_fatura(caminho)
+    assert fatura.distribuidora == 'Comgás'
@@ -0,0 +1,51 @@
+import glob
+import os
+import re
+import time
+
+import pytest
+
+import main
+import perfis
+from conftest import RAIZ
+
+VALOR_TOTAL_ANTERIOR = re.compile(r'-?(\d+\.?\d+\,\d{2})\s\d{2}\/\d{2}\/\d{4}')
+
+
+@pytest.fixture(scope='module')
+def textos():
+    return [main.extrair_texto(caminho) for caminho in sorted(glob.glob(os.path.join(RAIZ, 'Lidos', '*.pdf')))]
+
+
+def test_padroes_compilados_uma_vez():
+    assert main.PADROES is perfis.CEGAS.padroes
+    assert main.ExtratorFaturas().regexes is main.ExtratorFaturas().regexes
+    assert all(isinstance(padrao, re.Pattern) for lista in main.PADROES.values() for padrao in lista)
+
+
+def test_mesmo_resultado_das_regex_sem_compilar(textos):
+    for texto in textos:
+        esperado = {}
+        for campo, lista in main.REGEXES.items():
+            for regex in lista:
+                encontrado = re.search(regex, texto)
+                if encontrado:
+                    esperado[campo] = encontrado.group(1)
+                    break
+        esperado['correcao_pcs'] = f"{float(esperado['correcao_pcs']) / 9400:.4f}"
+        assert main.ExtratorFaturas().extrair_informacoes(texto) == esperado
+
+
+@pytest.mark.parametrize('texto', ['0307.361,67 23/12/2024', 'R$ 1234,56 01/01/2025', '-12,00 31/12/2024', 'x 9.999,99 01/02/2024'])
+def test_valor_total_equivale_a_expressao_anterior(texto):
+    atual = main.PADROES['valor_total'][0].search(texto)
+    anterior = VALOR_TOTAL_ANTERIOR.search(texto)
+    assert (atual and atual.group(1)) == (anterior and anterior.group(1))
+
+
+def test_valor_total_em_sequencia_longa_de_digitos():
+    # A expressão anterior leva mais de um minuto neste texto (retrocesso sobre os dígitos do boleto)
+    texto = '1' * 4000 + ' sem data'
+    inicio = time.perf_counter()
+    assert main.PADROES['valor_total'][0].search(texto) is None
+    assert time.perf_counter() - inicio < 1
@@ -0,0 +1,145 @@
+import os
+import re
+import random
+import contextlib
+import io
+from functools import partial
+
+import pytest
+
+import config
+import extratores
+import lote
+import main
+import mainxml
+from armazenamento import abrir_livro
+from benchmarks import gerador
+from conftest import RAIZ
+
+XMLS = ['24.00_DIST_CEGAS_GN_1135_25.xml', '24.00_DIST_CEGAS_GN_1136_26.xml', '24.00_DIST_CEGAS_GN_1138_27.xml']
+
+
+@pytest.fixture
+def lote_nfe(tmp_path):
+    # Lote enviNFe com três NF-e (cada uma com assinatura) em um só arquivo
+    documentos = []
+    for nome in XMLS:
+        texto = open(os.path.join(RAIZ, 'Faturas', nome), encoding='utf-8').read()
+        documentos.append(re.search(r'<NFe\b.*?</NFe>', texto, re.S).group(0))
+    caminho = tmp_path / 'LOTE_DIST_CEGAS_1.xml'
+    caminho.write_text('<?xml version="1.0" encoding="UTF-8"?><enviNFe xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">'
+                       '<idLote>1</idLote><indSinc>1</indSinc>' + ''.join(documentos) + '</enviNFe>', encoding='utf-8')
+    return str(caminho)
+
+
+def pdf_de_paginas(pasta, nome, textos):
+    # PDF com uma página por texto
+    PyPDF2 = pytest.importorskip('PyPDF2')
+
+    escritor = PyPDF2.PdfWriter()
+    for posicao, texto in enumerate(textos):
+        pagina = str(pasta / f'pagina{posicao}.pdf')
+        gerador.escrever_pdf(pagina, texto)
+        escritor.add_page(PyPDF2.PdfReader(pagina).pages[0])
+        os.remove(pagina)
+    caminho = str(pasta / nome)
+    with open(caminho, 'wb') as saida:
+        escritor.write(saida)
+    return caminho
+
+
+@pytest.fixture
+def pdf_com_tres_faturas(tmp_path):
+    modelo = gerador.modelos_pdf()[0]
+    sorteio = random.Random(1)
+    textos = [gerador.gerar_texto_pdf(modelo, numero, sorteio) for numero in (1, 2, 3)] + ['VERSO SEM FATURA']
+    return pdf_de_paginas(tmp_path, 'FATURAS_GN_CEGAS_1.pdf', textos)
+
+
+def test_lote_de_nfe_vira_uma_fatura_por_infnfe(lote_nfe):
+    faturas = mainxml.ler_faturas_xml(lote_nfe)
+    assert len(faturas) == 3
+    assert len({fatura['numero_fatura'] for fatura in faturas}) == 3
+    assert len({fatura['chave_acesso'] for fatura in faturas}) == 3
+    assert len({fatura['cnpj'] for fatura in faturas}) == 3
+
+
+@pytest.mark.parametrize('tamanho_bloco', [7, 33, 64, 1000])
+def test_blocos_pequenos_dao_o_mesmo_resultado(lote_nfe, monkeypatch, tamanho_bloco):
+    esperado = mainxml.ler_faturas_xml(lote_nfe)
+    monkeypatch.setattr(mainxml, '_eventos_xml', partial(mainxml._eventos_xml, tamanho_bloco=tamanho_bloco))
+    assert mainxml.ler_faturas_xml(lote_nfe) == esperado
+
+
+@pytest.fixture
+def lote_com_nfe_quebrada(tmp_path, lote_nfe):
+    # O mesmo lote com o vNF da primeira NF-e ilegível
+    texto = open(lote_nfe, encoding='utf-8').read()
+    caminho = tmp_path / 'LOTE_DIST_CEGAS_2.xml'
+    caminho.write_text(texto.replace('<vNF>', '<vNFx>', 1).replace('</vNF>', '</vNFx>', 1), encoding='utf-8')
+    os.remove(lote_nfe)
+    return str(caminho)
+
+
+def test_nfe_que_falha_e_recusada_sem_derrubar_as_outras(lote_com_nfe_quebrada):
+    assert [fatura['valor_total'] != '' for fatura in mainxml.ler_faturas_xml(lote_com_nfe_quebrada)] == [False, True, True]
+    faturas, recusadas = extratores.extrair_faturas(lote_com_nfe_quebrada)
+    assert (len(faturas), recusadas) == (2, 1)
+
+
+def test_arquivo_com_fatura_recusada_fica_em_faturas(tmp_path, lote_com_nfe_quebrada):
+    for pasta in ('Lidos', 'banco'):
+        (tmp_path / pasta).mkdir()
+    banco = str(tmp_path / 'banco' / 'livro.sqlite3')
+    processar = partial(lote.processar_lote, str(tmp_path), workers=1, diretorio_destino=str(tmp_path / 'Lidos'),
+                        caminho_banco=banco, caminho_cache='')
+    assert processar() == {'inseridos': 2, 'duplicados': 0, 'falhas': 1}
+    assert os.path.exists(lote_com_nfe_quebrada) and os.listdir(tmp_path / 'Lidos') == []
+    with abrir_livro(banco) as livro:
+        assert livro.total() == 2
+        assert livro.movimentos_pendentes() == []
+
+    # Na execução seguinte as válidas já estão no livro e o arquivo continua esperando a correção
+    assert processar() == {'inseridos': 0, 'duplicados': 2, 'falhas': 1}
+    assert os.path.exists(lote_com_nfe_quebrada)
+
+
+def test_pdf_com_varias_faturas(pdf_com_tres_faturas):
+    with contextlib.redirect_stdout(io.StringIO()):
+        uma = main.ler_faturas(pdf_com_tres_faturas, varias=False)
+        varias = main.ler_faturas(pdf_com_tres_faturas, varias=True)
+    assert len(uma) == 1
+    assert len(varias) == 3  # o verso no fim não completa uma fatura e fica de fora
+    assert uma[0] == varias[0]
+    assert len({fatura['numero_fatura'] for fatura in varias}) == 3
+    assert len({fatura['chave_acesso'] for fatura in varias}) == 3
+
+
+def test_pdf_cortado_no_fim_tem_a_fatura_incompleta_recusada(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'varias_faturas_por_pdf', True)
+    modelo = gerador.modelos_pdf()[0]
+    sorteio = random.Random(1)
+    completa, cortada = (gerador.gerar_texto_pdf(modelo, numero, sorteio) for numero in (1, 2))
+    # A segunda fatura perde tudo depois do CNPJ: a última página não completa os campos
+    fim_cnpj = main.PADROES['cnpj'][0].search(cortada).end()
+    caminho = pdf_de_paginas(tmp_path, 'FATURAS_GN_CEGAS_2.pdf', [completa, cortada[:fim_cnpj]])
+    with contextlib.redirect_stdout(io.StringIO()):
+        faturas, recusadas = extratores.extrair_faturas(caminho)
+    assert (len(faturas), recusadas) == (1, 1)
+
+
+def test_lote_grava_cada_fatura_e_move_o_arquivo_uma_vez(tmp_path, pdf_com_tres_faturas, lote_nfe, monkeypatch):
+    monkeypatch.setattr(config, 'varias_faturas_por_pdf', True)
+    (tmp_path / 'Lidos').mkdir()
+    entrada = tmp_path / 'entrada'
+    entrada.mkdir()
+    for caminho in (pdf_com_tres_faturas, lote_nfe):
+        os.replace(caminho, entrada / os.path.basename(caminho))
+
+    resumo = lote.processar_lote(str(entrada), workers=1, diretorio_destino=str(tmp_path / 'Lidos'),
+                                 caminho_banco=str(tmp_path / 'livro.sqlite3'), caminho_cache='')
+    assert resumo == {'inseridos': 6, 'duplicados': 0, 'falhas': 0}
+    assert sorted(os.listdir(tmp_path / 'Lidos')) == ['FATURAS_GN_CEGAS_1.pdf', 'LOTE_DIST_CEGAS_1.xml']
+    with abrir_livro(str(tmp_path / 'livro.sqlite3')) as livro:
+        assert livro.total() == 6
+        assert livro.movimentos_pendentes() == []